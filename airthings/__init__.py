@@ -1,29 +1,67 @@
 import logging
 import struct
 import sys
-import time
+import threading
 
 import bluepy.btle as btle
 
+from .backends import get_backend, get_clock, set_backend
 from .constants import (
     DEFAULT_BEFORE_FETCH_SLEEP,
     DEFAULT_BLUETOOTH_ADDRESS_TYPE,
     DEFAULT_BLUETOOTH_INTERFACE,
     DEFAULT_CONNECT_ATTEMPTS,
     DEFAULT_FETCH_ATTEMPTS,
+    DEFAULT_KEEP_ALIVE,
     DEFAULT_NEXT_CONNECT_SLEEP,
     DEFAULT_RECONNECT_SLEEP,
     DEFAULT_REFETCH_SLEEP,
     DEFAULT_RESCAN_SLEEP,
     DEFAULT_SCAN_ATTEMPTS,
     DEFAULT_SCAN_TIMEOUT,
+    DEVICE_CONNECTION_STATE_CONNECTED,
+    SLEEP_BEFORE_FETCH,
+    SLEEP_NEXT_CONNECT,
+    SLEEP_RECONNECT,
+    SLEEP_RESCAN,
 )
 from .exceptions import OutOfConnectAttemptsException, OutOfScanAttemptsException
-from .models import Device
+from .exporter import MetricsExporter, MetricsStore
+from .handle_cache import CharacteristicHandleCache, get_handle_cache, set_handle_cache
+from .history import DeviceHistory, HistoryStore
+from .identity_registry import (
+    IdentityRegistry,
+    get_identity_registry,
+    set_identity_registry,
+)
+from .measurement_cache import (
+    MeasurementCache,
+    get_cached_device,
+    get_measurement_cache,
+    set_measurement_cache,
+)
+from .models import (
+    Device,
+    DiscoveryResult,
+    FetchFailure,
+    FetchResult,
+    FetchResults,
+    get_kept_alive_device,
+)
+from .recorder import (
+    PayloadRecorder,
+    get_payload_recorder,
+    read_payload_log,
+    set_payload_recorder,
+)
+from .scanner import AirthingsScanDelegate, AirthingsScanner
+from .scheduler import DeviceSchedule, PollingScheduler
 from .utils import (
+    determine_bluetooth_interfaces,
     determine_device,
     determine_device_class_from_serial_number,
     determine_device_from_mac_address,
+    determine_devices,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -60,36 +98,14 @@ def discover_devices(
     else:
         _LOGGER.debug("We are automatically discovering all nearby Airthings devices")
 
-    airthings_devices = []
     current_retries = 0
     while True:
         try:
-            scanner = btle.Scanner(iface=iface)
+            scanner = get_backend().create_scanner(iface)
             devices = scanner.scan(scan_timeout)
-            for dev in devices:
-                device = determine_device(dev)
-                if device:
-                    if mac_addresses and device.mac_address not in mac_addresses:
-                        # MAC addresses are set, and the device MAC address does not
-                        # match any in the list.
-                        _LOGGER.debug(
-                            "MAC address: {} is not in our mac_addresses list, ignoring it".format(
-                                device.mac_address
-                            )
-                        )
-                        continue
-                    elif serial_numbers and device.serial_number not in serial_numbers:
-                        # Serial numbers are set, and the device serial number does not match
-                        # any in the list.
-                        _LOGGER.debug(
-                            "Serial number: {} is not in our serial_numbers list, ignoring it".format(
-                                device.serial_number
-                            )
-                        )
-                        continue
-
-                    # Device is an Airthings device
-                    airthings_devices.append(device)
+            airthings_devices = determine_devices(
+                devices, mac_addresses=mac_addresses, serial_numbers=serial_numbers
+            )
             break
         except btle.BTLEException as e:
             if current_retries == scan_attempts:
@@ -106,7 +122,7 @@ def discover_devices(
                 )
             )
 
-            time.sleep(rescan_sleep)
+            get_clock().sleep(rescan_sleep, SLEEP_RESCAN)
 
     _LOGGER.debug("discover_devices discovered the following Airthings devices:")
     _LOGGER.debug(airthings_devices)
@@ -114,6 +130,142 @@ def discover_devices(
     return airthings_devices
 
 
+def iter_discover_devices(
+    mac_addresses=None,
+    serial_numbers=None,
+    scan_timeout=None,
+    scan_attempts=DEFAULT_SCAN_ATTEMPTS,
+    rescan_sleep=DEFAULT_RESCAN_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+):
+    """
+    Continuously discover Airthings devices with one long-lived scanner, and yield every
+    device (once per MAC address) the moment its advertisement has been parsed.
+    Scans forever if scan_timeout is None.
+    """
+    _LOGGER.debug(
+        "Starting to continuously scan for Airthings devices. Scan timeout = {} seconds, Iface = {}".format(
+            scan_timeout, iface
+        )
+    )
+    scanner = AirthingsScanner(
+        mac_addresses=mac_addresses, serial_numbers=serial_numbers, iface=iface
+    )
+    deadline = None if scan_timeout is None else get_clock().monotonic() + scan_timeout
+    current_retries = 0
+    try:
+        while True:
+            remaining = None if deadline is None else deadline - get_clock().monotonic()
+            if remaining is not None and remaining <= 0:
+                return
+            try:
+                for device in scanner.iter_devices(timeout=remaining):
+                    current_retries = 0
+                    yield device
+                return
+            except btle.BTLEException as e:
+                scanner.stop()
+                if current_retries == scan_attempts:
+                    raise OutOfScanAttemptsException(
+                        scan_attempts, scan_timeout, rescan_sleep
+                    )
+
+                current_retries += 1
+
+                _LOGGER.debug(e)
+                _LOGGER.debug(
+                    "iter_discover_devices scan failed, restarting the scanner in {} seconds... Current retries = {} out of {}".format(
+                        rescan_sleep, current_retries, scan_attempts
+                    )
+                )
+
+                get_clock().sleep(rescan_sleep, SLEEP_RESCAN)
+    finally:
+        scanner.stop()
+
+
+def find_devices(
+    mac_addresses=None,
+    serial_numbers=None,
+    scan_attempts=DEFAULT_SCAN_ATTEMPTS,
+    scan_timeout=DEFAULT_SCAN_TIMEOUT,
+    rescan_sleep=DEFAULT_RESCAN_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+):
+    """
+    Find Airthings devices by MAC addresses or serial numbers. The scan ends the moment
+    every requested device has been seen, or when scan_timeout expires.
+    Returns a DiscoveryResult with the devices found and the ones still missing.
+    """
+    if mac_addresses:
+        targets = {mac_address.lower(): mac_address for mac_address in mac_addresses}
+        target_key = lambda device: device.mac_address.lower()
+    elif serial_numbers:
+        targets = {
+            str(serial_number): serial_number for serial_number in serial_numbers
+        }
+        target_key = lambda device: device.serial_number
+    else:
+        raise ValueError("Either mac_addresses or serial_numbers must be set")
+
+    outstanding = set(targets)
+    airthings_devices = []
+    scan = iter_discover_devices(
+        mac_addresses=list(targets) if mac_addresses else None,
+        serial_numbers=list(targets) if serial_numbers else None,
+        scan_timeout=scan_timeout,
+        scan_attempts=scan_attempts,
+        rescan_sleep=rescan_sleep,
+        iface=iface,
+    )
+    try:
+        for device in scan:
+            key = target_key(device)
+            if key not in outstanding:
+                continue
+            outstanding.discard(key)
+            airthings_devices.append(device)
+            if not outstanding:
+                _LOGGER.debug("Found every requested device, ending the scan early")
+                break
+    finally:
+        scan.close()
+
+    missing = [target for key, target in targets.items() if key in outstanding]
+    if missing:
+        _LOGGER.debug(
+            "The scan timed out before finding the following devices: {}".format(
+                missing
+            )
+        )
+
+    return DiscoveryResult(airthings_devices, missing)
+
+
+def _discover_devices(
+    serial_numbers, scan_attempts, scan_timeout, rescan_sleep, iface, address_type,
+):
+    """
+    discover_devices, but a scan for serial numbers ends the moment every one of them has
+    been seen, see find_devices
+    """
+    if serial_numbers:
+        return find_devices(
+            serial_numbers=serial_numbers,
+            scan_attempts=scan_attempts,
+            scan_timeout=scan_timeout,
+            rescan_sleep=rescan_sleep,
+            iface=iface,
+        ).devices
+    return discover_devices(
+        scan_attempts=scan_attempts,
+        scan_timeout=scan_timeout,
+        rescan_sleep=rescan_sleep,
+        iface=iface,
+        address_type=address_type,
+    )
+
+
 def find_devices_by_mac_addresses(
     mac_addresses,
     scan_attempts=DEFAULT_SCAN_ATTEMPTS,
@@ -124,15 +276,15 @@ def find_devices_by_mac_addresses(
 ):
     """
     Find Airthings devices by using a list of MAC addresses.
+    Scanning stops as soon as every device has been found.
     """
-    return discover_devices(
+    return find_devices(
         mac_addresses=mac_addresses,
         scan_attempts=scan_attempts,
         scan_timeout=scan_timeout,
         rescan_sleep=rescan_sleep,
         iface=iface,
-        address_type=address_type,
-    )
+    ).devices
 
 
 def find_device_by_mac_address(
@@ -166,14 +318,15 @@ def find_devices_by_serial_numbers(
 ):
     """
     Find Airthings devices by using a list of serial numbers (6 digits).
+    Scanning stops as soon as every device has been found.
     """
-    return discover_devices(
+    return find_devices(
         serial_numbers=serial_numbers,
         scan_attempts=scan_attempts,
         scan_timeout=scan_timeout,
         rescan_sleep=rescan_sleep,
         iface=iface,
-    )
+    ).devices
 
 
 def find_device_by_serial_number(
@@ -196,8 +349,60 @@ def find_device_by_serial_number(
     return devices[0] if devices else None
 
 
-def fetch_measurements_from_devices(
-    devices,
+def identify_device_by_mac_address(
+    mac_address,
+    connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+    reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+    next_connect_sleep=DEFAULT_NEXT_CONNECT_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    use_identity_registry=True,
+):
+    """
+    Identify which Airthings model a MAC address belongs to.
+    Known MAC addresses are created from the identity registry without connecting to them,
+    and a device whose connection is kept alive is returned as it is.
+    """
+    kept_alive_device = get_kept_alive_device(mac_address)
+    if use_identity_registry and kept_alive_device is not None:
+        _LOGGER.debug("{} has a kept alive connection".format(mac_address))
+        return kept_alive_device
+
+    identity_registry = get_identity_registry()
+    if use_identity_registry and identity_registry is not None:
+        device = identity_registry.create_device(mac_address)
+        if device is not None:
+            _LOGGER.debug(
+                "Identified {} from the identity registry".format(mac_address)
+            )
+            return device
+
+    current_retries = 0
+    while True:
+        try:
+            return determine_device_from_mac_address(
+                mac_address, iface=iface, address_type=address_type
+            )
+        except btle.BTLEDisconnectError as e:
+            if current_retries == connect_attempts:
+                raise OutOfConnectAttemptsException(
+                    connect_attempts, reconnect_sleep, next_connect_sleep
+                )
+
+            current_retries += 1
+
+            _LOGGER.debug(e)
+            _LOGGER.debug(
+                "determine_device_from_mac_address failed, retrying connect in {} seconds... Current retries = {} out of {}".format(
+                    reconnect_sleep, current_retries, connect_attempts
+                )
+            )
+
+            get_clock().sleep(reconnect_sleep, SLEEP_RECONNECT)
+
+
+def fetch_result_from_device(
+    device,
     connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
     reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
     next_connect_sleep=DEFAULT_NEXT_CONNECT_SLEEP,
@@ -205,48 +410,366 @@ def fetch_measurements_from_devices(
     fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
     refetch_sleep=DEFAULT_REFETCH_SLEEP,
     address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    max_age=None,
 ):
     """
-    Fetch measurements from a list of Airthings devices.
+    Fetch measurements from a single Airthings device, retrying on disconnects.
+    Never raises, returns a FetchResult (a FetchFailure if it failed) whose device is a new
+    device if it had to be identified again as another model.
+    If max_age is set and the device has fresh enough cached measurements, the cached device
+    is returned without connecting to it.
     """
-    for device in devices:
-        current_retries = 0
-        while True:
+    cached_device = get_cached_device(max_age, serial_number=device.serial_number)
+    if cached_device is not None:
+        _LOGGER.debug("Using the cached measurements of {}".format(device.mac_address))
+        return FetchResult(
+            cached_device.mac_address, device=cached_device, attempts=0, duration=0.0
+        )
+
+    started = get_clock().monotonic()
+    attempts = 0
+    current_retries = 0
+    refreshed_identity = False
+
+    def failure(exception):
+        _LOGGER.debug(
+            "Failed to fetch measurements from {}: {}".format(
+                device.mac_address, exception
+            )
+        )
+        return FetchFailure(
+            device.mac_address,
+            exception,
+            device=device,
+            attempts=attempts,
+            duration=get_clock().monotonic() - started,
+        )
+
+    while True:
+        attempts += 1
+        try:
+            device.fetch_and_set_measurements(
+                connect_attempts=connect_attempts,
+                reconnect_sleep=reconnect_sleep,
+                iface=iface,
+                fetch_attempts=fetch_attempts,
+                refetch_sleep=refetch_sleep,
+                address_type=address_type,
+                keep_alive=keep_alive,
+            )
+            return FetchResult(
+                device.mac_address,
+                device=device,
+                attempts=attempts,
+                duration=get_clock().monotonic() - started,
+            )
+        except (ValueError, struct.error) as e:
+            # The data characteristic is missing or has the wrong format,
+            # the MAC address might belong to another model than we remember
+            identity_registry = get_identity_registry()
+            if (
+                refreshed_identity
+                or identity_registry is None
+                or device.mac_address not in identity_registry
+            ):
+                return failure(e)
+
+            _LOGGER.warning(
+                "Failed to fetch measurements from {} as a {}, identifying it again".format(
+                    device.mac_address, device.label
+                )
+            )
+            _LOGGER.debug(e)
+            refreshed_identity = True
+            identity_registry.invalidate(device.mac_address)
+            # A kept alive connection would keep the adapter from connecting again
+            device.close()
             try:
-                device.fetch_and_set_measurements(
+                identified_device = identify_device_by_mac_address(
+                    device.mac_address,
                     connect_attempts=connect_attempts,
                     reconnect_sleep=reconnect_sleep,
+                    next_connect_sleep=next_connect_sleep,
                     iface=iface,
-                    fetch_attempts=fetch_attempts,
-                    refetch_sleep=refetch_sleep,
                     address_type=address_type,
+                    use_identity_registry=False,
                 )
-                break
-            except btle.BTLEDisconnectError as e:
-                if current_retries == connect_attempts:
-                    raise OutOfConnectAttemptsException(
+            except Exception as identify_exception:
+                return failure(identify_exception)
+            if type(identified_device) is type(device):
+                return failure(e)
+
+            device = identified_device
+        except btle.BTLEDisconnectError as e:
+            if current_retries == connect_attempts:
+                return failure(
+                    OutOfConnectAttemptsException(
                         connect_attempts, reconnect_sleep, next_connect_sleep
                     )
+                )
 
-                current_retries += 1
+            current_retries += 1
 
-                _LOGGER.debug(e)
-                _LOGGER.debug(
-                    "fetch_measurements_from_devices scan failed, retrying connect in {} seconds... Current retries = {} out of {}".format(
-                        reconnect_sleep, current_retries, connect_attempts
-                    )
+            _LOGGER.debug(e)
+            _LOGGER.debug(
+                "fetch_result_from_device failed, retrying connect in {} seconds... Current retries = {} out of {}".format(
+                    reconnect_sleep, current_retries, connect_attempts
                 )
+            )
+
+            get_clock().sleep(reconnect_sleep, SLEEP_RECONNECT)
+        except Exception as e:
+            return failure(e)
+
+
+def _fetch_result_from_mac_address(
+    mac_address,
+    connect_attempts,
+    reconnect_sleep,
+    next_connect_sleep,
+    iface,
+    fetch_attempts,
+    refetch_sleep,
+    address_type,
+    keep_alive,
+    max_age,
+):
+    """
+    Identify the device at mac_address on iface, and fetch its measurements over the
+    connection it was identified over. Never raises, like fetch_result_from_device.
+    """
+    try:
+        device = identify_device_by_mac_address(
+            mac_address,
+            connect_attempts=connect_attempts,
+            reconnect_sleep=reconnect_sleep,
+            next_connect_sleep=next_connect_sleep,
+            iface=iface,
+            address_type=address_type,
+        )
+    except Exception as e:
+        _LOGGER.debug("Failed to identify {}: {}".format(mac_address, e))
+        return FetchFailure(mac_address, e)
+
+    return fetch_result_from_device(
+        device,
+        connect_attempts=connect_attempts,
+        reconnect_sleep=reconnect_sleep,
+        next_connect_sleep=next_connect_sleep,
+        iface=iface,
+        fetch_attempts=fetch_attempts,
+        refetch_sleep=refetch_sleep,
+        address_type=address_type,
+        keep_alive=keep_alive,
+        max_age=max_age,
+    )
+
+
+def fetch_measurements_from_device(
+    device,
+    connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+    reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+    next_connect_sleep=DEFAULT_NEXT_CONNECT_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+    fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
+    refetch_sleep=DEFAULT_REFETCH_SLEEP,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    max_age=None,
+):
+    """
+    Fetch measurements from a single Airthings device, retrying on disconnects.
+    Returns the device, which is a new device if it had to be identified again as another model.
+    """
+    result = fetch_result_from_device(
+        device,
+        connect_attempts=connect_attempts,
+        reconnect_sleep=reconnect_sleep,
+        next_connect_sleep=next_connect_sleep,
+        iface=iface,
+        fetch_attempts=fetch_attempts,
+        refetch_sleep=refetch_sleep,
+        address_type=address_type,
+        keep_alive=keep_alive,
+        max_age=max_age,
+    )
+    if result.failed:
+        raise result.exception
+    return result.device
+
+
+def fetch_measurements_from_devices(
+    devices,
+    connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+    reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+    next_connect_sleep=DEFAULT_NEXT_CONNECT_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+    fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
+    refetch_sleep=DEFAULT_REFETCH_SLEEP,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    max_age=None,
+):
+    """
+    Fetch measurements from a list of Airthings devices.
+    If keep_alive is set, the devices keep their connection open between fetches.
+    A device that fails does not stop the others. Returns FetchResults with the devices that
+    were fetched, every device's FetchResult (including the failures) is in its results.
+    devices can also hold MAC addresses, which are identified first, on iface, and fetched over
+    the connection they were identified over. devices itself is left as is, the identified
+    devices are in the results.
+    """
+    results = []
+    for device in devices:
+        fetch_result = (
+            _fetch_result_from_mac_address
+            if isinstance(device, str)
+            else fetch_result_from_device
+        )
+        result = fetch_result(
+            device,
+            connect_attempts=connect_attempts,
+            reconnect_sleep=reconnect_sleep,
+            next_connect_sleep=next_connect_sleep,
+            iface=iface,
+            fetch_attempts=fetch_attempts,
+            refetch_sleep=refetch_sleep,
+            address_type=address_type,
+            keep_alive=keep_alive,
+            max_age=max_age,
+        )
+        results.append(result)
+
+        _LOGGER.debug(
+            "Sleeping {} seconds before fetching and settings measurements from the next Airthings device".format(
+                next_connect_sleep
+            )
+        )
+        get_clock().sleep(next_connect_sleep, SLEEP_NEXT_CONNECT)
+
+    return FetchResults(results)
+
+
+def iter_measurements_from_devices(
+    devices,
+    connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+    reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+    next_connect_sleep=DEFAULT_NEXT_CONNECT_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+    fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
+    refetch_sleep=DEFAULT_REFETCH_SLEEP,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    max_age=None,
+    on_measurement=None,
+):
+    """
+    Fetch measurements from Airthings devices, and yield every device as soon as its
+    measurements are fetched. A device that fails is yielded as a FetchFailure instead of
+    aborting the others. on_measurement, if set, is called with every yielded item.
+    """
+    for device in devices:
+        result = fetch_result_from_device(
+            device,
+            connect_attempts=connect_attempts,
+            reconnect_sleep=reconnect_sleep,
+            next_connect_sleep=next_connect_sleep,
+            iface=iface,
+            fetch_attempts=fetch_attempts,
+            refetch_sleep=refetch_sleep,
+            address_type=address_type,
+            keep_alive=keep_alive,
+            max_age=max_age,
+        )
+        if result.ok:
+            result = result.device
 
-                time.sleep(reconnect_sleep)
+        if on_measurement is not None:
+            on_measurement(result)
+        yield result
 
         _LOGGER.debug(
             "Sleeping {} seconds before fetching and settings measurements from the next Airthings device".format(
                 next_connect_sleep
             )
         )
-        time.sleep(next_connect_sleep)
+        get_clock().sleep(next_connect_sleep, SLEEP_NEXT_CONNECT)
+
+
+def fetch_measurements_from_devices_sharded(
+    devices,
+    ifaces=None,
+    connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+    reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+    next_connect_sleep=DEFAULT_NEXT_CONNECT_SLEEP,
+    fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
+    refetch_sleep=DEFAULT_REFETCH_SLEEP,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    max_age=None,
+):
+    """
+    Fetch measurements from a list of Airthings devices, spread across multiple Bluetooth interfaces.
+    Each interface gets its own share of the devices and is driven by its own worker thread.
+    If ifaces is not set, all the local Bluetooth adapters are used.
+    Returns FetchResults in the same order as devices, like fetch_measurements_from_devices.
+    """
+    if ifaces is None:
+        ifaces = determine_bluetooth_interfaces()
+    if not ifaces:
+        _LOGGER.debug(
+            "No Bluetooth interfaces found, falling back to iface = {}".format(
+                DEFAULT_BLUETOOTH_INTERFACE
+            )
+        )
+        ifaces = [DEFAULT_BLUETOOTH_INTERFACE]
+
+    # Assign the devices round-robin, so every interface gets a similar amount of devices
+    shards = [
+        (iface, list(range(index, len(devices), len(ifaces))))
+        for index, iface in enumerate(ifaces)
+    ]
+
+    results = [None] * len(devices)
+
+    def worker(iface, shard):
+        _LOGGER.debug(
+            "Fetching measurements from {} Airthings devices on iface = {}".format(
+                len(shard), iface
+            )
+        )
+        shard_results = fetch_measurements_from_devices(
+            devices=[devices[index] for index in shard],
+            connect_attempts=connect_attempts,
+            reconnect_sleep=reconnect_sleep,
+            next_connect_sleep=next_connect_sleep,
+            iface=iface,
+            fetch_attempts=fetch_attempts,
+            refetch_sleep=refetch_sleep,
+            address_type=address_type,
+            keep_alive=keep_alive,
+            max_age=max_age,
+        )
+        for index, result in zip(shard, shard_results.results):
+            results[index] = result
 
-    return devices
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(iface, shard),
+            name="airthings-hci{}".format(iface),
+            daemon=True,
+        )
+        for iface, shard in shards
+        if shard
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return FetchResults(results)
 
 
 def fetch_measurements(
@@ -263,9 +786,16 @@ def fetch_measurements(
     fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
     refetch_sleep=DEFAULT_REFETCH_SLEEP,
     address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    ifaces=None,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    max_age=None,
 ):
     """
     Fetch measurements from Airthings devices either automatically, by MAC addresses or by serial numbers
+    If ifaces is set, the measurements are fetched in parallel across those Bluetooth interfaces.
+    A device that fails does not stop the others, see fetch_measurements_from_devices.
+    If max_age is set, devices with cached measurements no older than max_age seconds, that
+    the device has not updated since, are served from the measurement cache.
     """
 
     _LOGGER.debug("Starting to fetch measurements from Airthings devices")
@@ -319,39 +849,53 @@ def fetch_measurements(
         discovery.
         """
         _LOGGER.debug("Skipping discovering as MAC addresses are set")
-        airthings_devices = []
+        identity_registry = get_identity_registry()
+        results = []
+        pending = []
         for mac_address in mac_addresses:
-            current_retries = 0
-            while True:
-                try:
-                    device = determine_device_from_mac_address(
-                        mac_address, iface=iface, address_type=address_type
-                    )
-                except btle.BTLEDisconnectError as e:
-                    if current_retries == connect_attempts:
-                        raise OutOfConnectAttemptsException(
-                            connect_attempts, reconnect_sleep, next_connect_sleep
-                        )
+            cached_device = get_cached_device(max_age, mac_address=mac_address)
+            if cached_device is not None:
+                _LOGGER.debug("Using the cached measurements of {}".format(mac_address))
+                results.append(FetchResult(mac_address, device=cached_device))
+                continue
 
-                    current_retries += 1
-
-                    _LOGGER.debug(e)
+            # Reuse the device of an earlier call if it kept its connection alive
+            device = get_kept_alive_device(mac_address)
+            if device is None and identity_registry is not None:
+                device = identity_registry.create_device(mac_address)
+                if device is not None:
                     _LOGGER.debug(
-                        "determine_device_from_mac_address failed, retrying connect in {} seconds... Current retries = {} out of {}".format(
-                            reconnect_sleep, current_retries, connect_attempts
-                        )
+                        "Identified {} from the identity registry".format(mac_address)
                     )
-
-                    time.sleep(reconnect_sleep)
-
-            airthings_devices.append(device)
+            # Unknown MAC addresses are identified by the fetch, on the interface that fetches
+            # them, and read over the connection they were identified over
+            pending.append((len(results), mac_address if device is None else device))
+            results.append(None)
     else:
+        results = []
+        if serial_numbers and max_age is not None:
+            # Only discover the devices that are not cached
+            uncached_serial_numbers = []
+            for serial_number in serial_numbers:
+                cached_device = get_cached_device(max_age, serial_number=serial_number)
+                if cached_device is None:
+                    uncached_serial_numbers.append(serial_number)
+                    continue
+                _LOGGER.debug(
+                    "Using the cached measurements of {}".format(serial_number)
+                )
+                results.append(
+                    FetchResult(cached_device.mac_address, device=cached_device)
+                )
+            if not uncached_serial_numbers:
+                return FetchResults(results)
+            serial_numbers = uncached_serial_numbers
+
         # Discover the devices automatically
         _LOGGER.debug(
             "MAC addresses are not set, automatically discovering nearby Airthings devices"
         )
-        airthings_devices = discover_devices(
-            mac_addresses=mac_addresses,
+        airthings_devices = _discover_devices(
             serial_numbers=serial_numbers,
             scan_timeout=scan_timeout,
             scan_attempts=scan_attempts,
@@ -359,23 +903,144 @@ def fetch_measurements(
             iface=iface,
             address_type=address_type,
         )
+        pending = []
+        for device in airthings_devices:
+            # Reuse the device of an earlier call if it kept its connection alive
+            kept_alive_device = get_kept_alive_device(device.mac_address)
+            if type(kept_alive_device) is type(device):
+                device = kept_alive_device
+            pending.append((len(results) + len(pending), device))
+        results.extend([None] * len(airthings_devices))
 
-    _LOGGER.debug(
-        "Sleeping {} seconds before fetching measurements from Airthings devices".format(
-            before_fetch_sleep
+    if not pending:
+        return FetchResults(results)
+
+    # MAC addresses identified over the radio, and kept alive connections, are read right
+    # away, without sleeping
+    if any(
+        not isinstance(device, str)
+        and device.connection_state != DEVICE_CONNECTION_STATE_CONNECTED
+        for _, device in pending
+    ):
+        _LOGGER.debug(
+            "Sleeping {} seconds before fetching measurements from Airthings devices".format(
+                before_fetch_sleep
+            )
+        )
+        get_clock().sleep(before_fetch_sleep, SLEEP_BEFORE_FETCH)
+
+    pending_devices = [device for _, device in pending]
+    if ifaces:
+        pending_results = fetch_measurements_from_devices_sharded(
+            devices=pending_devices,
+            ifaces=ifaces,
+            connect_attempts=connect_attempts,
+            reconnect_sleep=reconnect_sleep,
+            next_connect_sleep=next_connect_sleep,
+            fetch_attempts=fetch_attempts,
+            refetch_sleep=refetch_sleep,
+            address_type=address_type,
+            keep_alive=keep_alive,
+            max_age=max_age,
+        )
+    else:
+        pending_results = fetch_measurements_from_devices(
+            devices=pending_devices,
+            connect_attempts=connect_attempts,
+            reconnect_sleep=reconnect_sleep,
+            next_connect_sleep=next_connect_sleep,
+            iface=iface,
+            fetch_attempts=fetch_attempts,
+            refetch_sleep=refetch_sleep,
+            address_type=address_type,
+            keep_alive=keep_alive,
+            max_age=max_age,
         )
-    )
-    time.sleep(before_fetch_sleep)
 
-    return fetch_measurements_from_devices(
-        devices=airthings_devices,
+    for (index, _), result in zip(pending, pending_results.results):
+        results[index] = result
+
+    return FetchResults(results)
+
+
+def iter_measurements(
+    mac_addresses=None,
+    serial_numbers=None,
+    scan_attempts=DEFAULT_SCAN_ATTEMPTS,
+    scan_timeout=DEFAULT_SCAN_TIMEOUT,
+    rescan_sleep=DEFAULT_RESCAN_SLEEP,
+    connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+    reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+    next_connect_sleep=DEFAULT_NEXT_CONNECT_SLEEP,
+    before_fetch_sleep=DEFAULT_BEFORE_FETCH_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+    fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
+    refetch_sleep=DEFAULT_REFETCH_SLEEP,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    max_age=None,
+    on_measurement=None,
+):
+    """
+    Same as fetch_measurements, but yields every device as soon as its measurements are fetched.
+    A device that fails is yielded as a FetchFailure instead of aborting the others.
+    on_measurement, if set, is called with every yielded item.
+    """
+    fetch_options = dict(
         connect_attempts=connect_attempts,
         reconnect_sleep=reconnect_sleep,
+        next_connect_sleep=next_connect_sleep,
         iface=iface,
         fetch_attempts=fetch_attempts,
         refetch_sleep=refetch_sleep,
         address_type=address_type,
+        keep_alive=keep_alive,
+        max_age=max_age,
+        on_measurement=on_measurement,
+    )
+
+    if mac_addresses:
+        # Identify and fetch one device at a time, so the first one is yielded right away
+        for mac_address in mac_addresses:
+            try:
+                device = identify_device_by_mac_address(
+                    mac_address,
+                    connect_attempts=connect_attempts,
+                    reconnect_sleep=reconnect_sleep,
+                    next_connect_sleep=next_connect_sleep,
+                    iface=iface,
+                    address_type=address_type,
+                )
+            except Exception as e:
+                _LOGGER.debug("Failed to identify {}: {}".format(mac_address, e))
+                failure = FetchFailure(mac_address, e)
+                if on_measurement is not None:
+                    on_measurement(failure)
+                yield failure
+                continue
+
+            yield from iter_measurements_from_devices([device], **fetch_options)
+        return
+
+    airthings_devices = _discover_devices(
+        serial_numbers=serial_numbers,
+        scan_timeout=scan_timeout,
+        scan_attempts=scan_attempts,
+        rescan_sleep=rescan_sleep,
+        iface=iface,
+        address_type=address_type,
+    )
+    if not airthings_devices:
+        return
+
+    _LOGGER.debug(
+        "Sleeping {} seconds before fetching measurements from Airthings devices".format(
+            before_fetch_sleep
+        )
     )
+    get_clock().sleep(before_fetch_sleep, SLEEP_BEFORE_FETCH)
+
+    yield from iter_measurements_from_devices(airthings_devices, **fetch_options)
 
 
 def fetch_measurements_from_serial_numbers(
@@ -391,6 +1056,7 @@ def fetch_measurements_from_serial_numbers(
     fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
     refetch_sleep=DEFAULT_REFETCH_SLEEP,
     address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    max_age=None,
 ):
     """
     Fetch measurements from a list of Airthings device serial numbers.
@@ -409,6 +1075,7 @@ def fetch_measurements_from_serial_numbers(
         fetch_attempts=fetch_attempts,
         refetch_sleep=refetch_sleep,
         address_type=address_type,
+        max_age=max_age,
     )
 
 
@@ -425,6 +1092,7 @@ def fetch_measurements_from_serial_number(
     fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
     refetch_sleep=DEFAULT_REFETCH_SLEEP,
     address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    max_age=None,
 ):
     """
     Fetch measurements from a specific Airthings device serial number.
@@ -442,7 +1110,10 @@ def fetch_measurements_from_serial_number(
         fetch_attempts=fetch_attempts,
         refetch_sleep=refetch_sleep,
         address_type=address_type,
+        max_age=max_age,
     )
+    if devices.has_failures:
+        raise devices.failures[0].exception
     return devices[0] if devices else None
 
 
@@ -459,6 +1130,7 @@ def fetch_measurements_from_mac_addresses(
     fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
     refetch_sleep=DEFAULT_REFETCH_SLEEP,
     address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    max_age=None,
 ):
     """
     Fetch measurements from a list of Airthings device MAC addresses.
@@ -476,6 +1148,7 @@ def fetch_measurements_from_mac_addresses(
         fetch_attempts=fetch_attempts,
         refetch_sleep=refetch_sleep,
         address_type=address_type,
+        max_age=max_age,
     )
 
 
@@ -492,6 +1165,7 @@ def fetch_measurements_from_mac_address(
     fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
     refetch_sleep=DEFAULT_REFETCH_SLEEP,
     address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    max_age=None,
 ):
     """
     Fetch measurements from a specific Airthings device MAC address.
@@ -509,5 +1183,8 @@ def fetch_measurements_from_mac_address(
         fetch_attempts=fetch_attempts,
         refetch_sleep=refetch_sleep,
         address_type=address_type,
+        max_age=max_age,
     )
+    if devices.has_failures:
+        raise devices.failures[0].exception
     return devices[0] if devices else None
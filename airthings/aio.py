@@ -0,0 +1,495 @@
+"""
+Asyncio variants of the discovery and measurement functions.
+
+The blocking bluepy calls are run in the default executor, and every wait
+(retries, before_fetch_sleep and next_connect_sleep) is an asyncio.sleep, so
+the event loop is never blocked and every call can be cancelled.
+"""
+import asyncio
+import functools
+import logging
+
+import bluepy.btle as btle
+
+from .backends import get_backend, get_clock
+from .constants import (
+    DEFAULT_BEFORE_FETCH_SLEEP,
+    DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    DEFAULT_BLUETOOTH_INTERFACE,
+    DEFAULT_CONNECT_ATTEMPTS,
+    DEFAULT_FETCH_ATTEMPTS,
+    DEFAULT_MAX_CONCURRENT_FETCHES,
+    DEFAULT_NEXT_CONNECT_SLEEP,
+    DEFAULT_RECONNECT_SLEEP,
+    DEFAULT_REFETCH_SLEEP,
+    DEFAULT_RESCAN_SLEEP,
+    DEFAULT_SCAN_ATTEMPTS,
+    DEFAULT_SCAN_TIMEOUT,
+    DEVICE_CONNECTION_STATE_CONNECTED,
+    DEVICE_CONNECTION_STATE_CONNECTING,
+    DEVICE_CONNECTION_STATE_DISCONNECTED,
+)
+from .exceptions import (
+    OutOfConnectAttemptsException,
+    OutOfFetchAttemptsException,
+    OutOfScanAttemptsException,
+)
+from .identity_registry import get_identity_registry
+from .measurement_cache import get_cached_device
+from .models import FetchFailure, FetchResult, FetchResults
+from .utils import (
+    determine_device_class_from_serial_number,
+    determine_device_from_mac_address,
+    determine_devices,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def _run(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+def _scan(iface, scan_timeout):
+    scanner = get_backend().create_scanner(iface)
+    return list(scanner.scan(scan_timeout))
+
+
+def _disconnect_peripheral(future):
+    # The connect was cancelled, but the executor still finished connecting
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        future.result().disconnect()
+    except Exception as e:
+        _LOGGER.debug(e)
+
+
+def _close_device(future):
+    # The identification was cancelled, but the executor still identified the device over
+    # a connection it left open
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        future.result().close()
+    except Exception as e:
+        _LOGGER.debug(e)
+
+
+async def _connect(device):
+    if await _run(device._verify_connection):
+        return
+    current_retries = 0
+    while True:
+        device._set_connection_state(DEVICE_CONNECTION_STATE_CONNECTING)
+        future = asyncio.ensure_future(_run(device._open_peripheral))
+        try:
+            device._set_peripheral(await asyncio.shield(future))
+            return
+        except asyncio.CancelledError:
+            device._set_connection_state(DEVICE_CONNECTION_STATE_DISCONNECTED)
+            future.add_done_callback(_disconnect_peripheral)
+            raise
+        except btle.BTLEException as e:
+            device._set_connection_state(DEVICE_CONNECTION_STATE_DISCONNECTED)
+            if current_retries == device._connect_attempts:
+                raise OutOfConnectAttemptsException(
+                    device._connect_attempts, device._reconnect_sleep
+                )
+
+            current_retries += 1
+
+            _LOGGER.debug(e)
+            _LOGGER.debug(
+                "aio._connect failed, retrying connect in {} seconds... Current retries = {} out of {}".format(
+                    device._reconnect_sleep, current_retries, device._connect_attempts
+                )
+            )
+
+            await asyncio.sleep(device._reconnect_sleep)
+
+
+async def _fetch_characteristic(device, uuid):
+    current_retries = 0
+    while True:
+        try:
+            return await _run(device._read_characteristic, device._peripheral, uuid)
+        except btle.BTLEException as e:
+            if current_retries == device._fetch_attempts:
+                raise OutOfFetchAttemptsException(
+                    device._fetch_attempts, device._refetch_sleep
+                )
+
+            current_retries += 1
+
+            _LOGGER.debug(e)
+            _LOGGER.debug(
+                "aio._fetch_characteristic(uuid={}) failed, retrying in {} seconds... Current retries = {} out of {}".format(
+                    uuid, device._refetch_sleep, current_retries, device._fetch_attempts
+                )
+            )
+
+            await asyncio.sleep(device._refetch_sleep)
+
+            if isinstance(e, btle.BTLEDisconnectError):
+                _LOGGER.debug(
+                    "Exception is a disconnect error, attempting a hard reconnect"
+                )
+                await _run(device._close_peripheral)
+                await _connect(device)
+
+
+async def fetch_device(
+    device,
+    connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+    reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+    fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
+    refetch_sleep=DEFAULT_REFETCH_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+):
+    """
+    Fetch and set the measurements of a single Airthings device, same as Device.fetch
+    """
+    _LOGGER.debug("Fetching measurements from device:")
+    _LOGGER.debug(device)
+    device._set_fetch_options(
+        connect_attempts=connect_attempts,
+        reconnect_sleep=reconnect_sleep,
+        fetch_attempts=fetch_attempts,
+        refetch_sleep=refetch_sleep,
+        iface=iface,
+        address_type=address_type,
+    )
+    try:
+        await _connect(device)
+        raw_data = device._allocate_raw_data()
+        length = 0
+        for uuid in device.RAW_DATA_UUIDS:
+            length = device._write_raw_data(
+                raw_data, length, await _fetch_characteristic(device, uuid)
+            )
+    finally:
+        # Shielded, so the device is disconnected even if we are cancelled
+        await asyncio.shield(_run(device._close_peripheral))
+
+    device._set_measurements(memoryview(raw_data)[:length])
+    return device
+
+
+async def discover_devices(
+    mac_addresses=None,
+    serial_numbers=None,
+    scan_attempts=DEFAULT_SCAN_ATTEMPTS,
+    scan_timeout=DEFAULT_SCAN_TIMEOUT,
+    rescan_sleep=DEFAULT_RESCAN_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+):
+    """
+    Discover Airthings devices either automatically, by MAC addresses or by serial_number
+    """
+    _LOGGER.debug("Starting to scan and discover Airthings devices.")
+    current_retries = 0
+    while True:
+        try:
+            scan_entries = await _run(_scan, iface, scan_timeout)
+            break
+        except btle.BTLEException as e:
+            if current_retries == scan_attempts:
+                raise OutOfScanAttemptsException(
+                    scan_attempts, scan_timeout, rescan_sleep
+                )
+
+            current_retries += 1
+
+            _LOGGER.debug(e)
+            _LOGGER.debug(
+                "aio.discover_devices scan failed, retrying in {} seconds... Current retries = {} out of {}".format(
+                    rescan_sleep, current_retries, scan_attempts
+                )
+            )
+
+            await asyncio.sleep(rescan_sleep)
+
+    airthings_devices = determine_devices(
+        scan_entries, mac_addresses=mac_addresses, serial_numbers=serial_numbers
+    )
+
+    _LOGGER.debug("aio.discover_devices discovered the following Airthings devices:")
+    _LOGGER.debug(airthings_devices)
+
+    return airthings_devices
+
+
+async def identify_device_by_mac_address(
+    mac_address,
+    connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+    reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+):
+    """
+    Identify which Airthings model a MAC address belongs to.
+    Known MAC addresses are created from the identity registry without connecting to them.
+    """
+    identity_registry = get_identity_registry()
+    if identity_registry is not None:
+        device = identity_registry.create_device(mac_address)
+        if device is not None:
+            return device
+
+    current_retries = 0
+    while True:
+        future = asyncio.ensure_future(
+            _run(
+                determine_device_from_mac_address,
+                mac_address,
+                iface=iface,
+                address_type=address_type,
+            )
+        )
+        try:
+            device = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(_close_device)
+            raise
+        except btle.BTLEDisconnectError as e:
+            if current_retries == connect_attempts:
+                raise OutOfConnectAttemptsException(connect_attempts, reconnect_sleep)
+
+            current_retries += 1
+
+            _LOGGER.debug(e)
+            _LOGGER.debug(
+                "aio.determine_device_from_mac_address failed, retrying connect in {} seconds... Current retries = {} out of {}".format(
+                    reconnect_sleep, current_retries, connect_attempts
+                )
+            )
+
+            await asyncio.sleep(reconnect_sleep)
+        else:
+            return device
+
+
+async def fetch_measurements_from_devices(
+    devices,
+    connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+    reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+    next_connect_sleep=DEFAULT_NEXT_CONNECT_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+    fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
+    refetch_sleep=DEFAULT_REFETCH_SLEEP,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    max_concurrency=DEFAULT_MAX_CONCURRENT_FETCHES,
+    max_age=None,
+):
+    """
+    Fetch measurements from a list of Airthings devices, at most max_concurrency devices at a time.
+    A device that fails does not stop the others, returns FetchResults like the blocking variant.
+    Unlike the blocking variant, a device whose data does not parse is not identified again.
+    devices can also hold MAC addresses, which are identified first, in the connection slot they
+    are fetched in, and fetched over the connection they were identified over.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(device):
+        if isinstance(device, str):
+            cached_device = get_cached_device(max_age, mac_address=device)
+        else:
+            cached_device = get_cached_device(
+                max_age, serial_number=device.serial_number
+            )
+        if cached_device is not None:
+            return FetchResult(
+                cached_device.mac_address,
+                device=cached_device,
+                attempts=0,
+                duration=0.0,
+            )
+
+        async with semaphore:
+            if isinstance(device, str):
+                mac_address = device
+                try:
+                    device = await identify_device_by_mac_address(
+                        mac_address,
+                        connect_attempts=connect_attempts,
+                        reconnect_sleep=reconnect_sleep,
+                        iface=iface,
+                        address_type=address_type,
+                    )
+                except Exception as e:
+                    _LOGGER.debug("Failed to identify {}: {}".format(mac_address, e))
+                    await asyncio.sleep(next_connect_sleep)
+                    return FetchFailure(mac_address, e)
+
+            started = get_clock().monotonic()
+            attempts = 0
+            current_retries = 0
+            while True:
+                attempts += 1
+                try:
+                    await fetch_device(
+                        device,
+                        connect_attempts=connect_attempts,
+                        reconnect_sleep=reconnect_sleep,
+                        fetch_attempts=fetch_attempts,
+                        refetch_sleep=refetch_sleep,
+                        iface=iface,
+                        address_type=address_type,
+                    )
+                    result = FetchResult(
+                        device.mac_address,
+                        device=device,
+                        attempts=attempts,
+                        duration=get_clock().monotonic() - started,
+                    )
+                    break
+                except btle.BTLEDisconnectError as e:
+                    if current_retries == connect_attempts:
+                        result = FetchFailure(
+                            device.mac_address,
+                            OutOfConnectAttemptsException(
+                                connect_attempts, reconnect_sleep, next_connect_sleep
+                            ),
+                            device=device,
+                            attempts=attempts,
+                            duration=get_clock().monotonic() - started,
+                        )
+                        break
+
+                    current_retries += 1
+
+                    _LOGGER.debug(e)
+                    _LOGGER.debug(
+                        "aio.fetch_measurements_from_devices failed, retrying connect in {} seconds... Current retries = {} out of {}".format(
+                            reconnect_sleep, current_retries, connect_attempts
+                        )
+                    )
+
+                    await asyncio.sleep(reconnect_sleep)
+                except Exception as e:
+                    _LOGGER.debug(
+                        "Failed to fetch measurements from {}: {}".format(
+                            device.mac_address, e
+                        )
+                    )
+                    result = FetchFailure(
+                        device.mac_address,
+                        e,
+                        device=device,
+                        attempts=attempts,
+                        duration=get_clock().monotonic() - started,
+                    )
+                    break
+
+            _LOGGER.debug(
+                "Sleeping {} seconds before releasing the connection slot to the next Airthings device".format(
+                    next_connect_sleep
+                )
+            )
+            await asyncio.sleep(next_connect_sleep)
+            return result
+
+    tasks = [asyncio.ensure_future(fetch(device)) for device in devices]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        # Cancelled, do not leave the others running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    return FetchResults(results)
+
+
+async def fetch_measurements(
+    mac_addresses=None,
+    serial_numbers=None,
+    scan_attempts=DEFAULT_SCAN_ATTEMPTS,
+    scan_timeout=DEFAULT_SCAN_TIMEOUT,
+    rescan_sleep=DEFAULT_RESCAN_SLEEP,
+    connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+    reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+    next_connect_sleep=DEFAULT_NEXT_CONNECT_SLEEP,
+    before_fetch_sleep=DEFAULT_BEFORE_FETCH_SLEEP,
+    iface=DEFAULT_BLUETOOTH_INTERFACE,
+    fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
+    refetch_sleep=DEFAULT_REFETCH_SLEEP,
+    address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    max_concurrency=DEFAULT_MAX_CONCURRENT_FETCHES,
+    max_age=None,
+):
+    """
+    Fetch measurements from Airthings devices either automatically, by MAC addresses or by serial numbers
+    A device that fails does not stop the others, returns FetchResults.
+    If max_age is set, fresh enough cached measurements are served without connecting,
+    see airthings.fetch_measurements.
+    """
+    if serial_numbers:
+        # Raises if any of the serial numbers are not valid Airthings serial numbers
+        for serial_number in serial_numbers:
+            determine_device_class_from_serial_number(serial_number)
+
+    if mac_addresses:
+        _LOGGER.debug("Skipping discovering as MAC addresses are set")
+        identity_registry = get_identity_registry()
+        results = []
+        pending = []
+        for mac_address in mac_addresses:
+            cached_device = get_cached_device(max_age, mac_address=mac_address)
+            if cached_device is not None:
+                results.append(FetchResult(mac_address, device=cached_device))
+                continue
+
+            device = (
+                identity_registry.create_device(mac_address)
+                if identity_registry is not None
+                else None
+            )
+            # Unknown MAC addresses are identified in the connection slot they are fetched in
+            pending.append((len(results), mac_address if device is None else device))
+            results.append(None)
+    else:
+        airthings_devices = await discover_devices(
+            serial_numbers=serial_numbers,
+            scan_attempts=scan_attempts,
+            scan_timeout=scan_timeout,
+            rescan_sleep=rescan_sleep,
+            iface=iface,
+            address_type=address_type,
+        )
+        pending = list(enumerate(airthings_devices))
+        results = [None] * len(airthings_devices)
+
+    if not pending:
+        return FetchResults(results)
+
+    # MAC addresses identified over the radio are read right after, without sleeping
+    if any(not isinstance(device, str) for _, device in pending):
+        _LOGGER.debug(
+            "Sleeping {} seconds before fetching measurements from Airthings devices".format(
+                before_fetch_sleep
+            )
+        )
+        await asyncio.sleep(before_fetch_sleep)
+
+    pending_results = await fetch_measurements_from_devices(
+        devices=[device for _, device in pending],
+        connect_attempts=connect_attempts,
+        reconnect_sleep=reconnect_sleep,
+        next_connect_sleep=next_connect_sleep,
+        iface=iface,
+        fetch_attempts=fetch_attempts,
+        refetch_sleep=refetch_sleep,
+        address_type=address_type,
+        max_concurrency=max_concurrency,
+        max_age=max_age,
+    )
+    for (index, _), result in zip(pending, pending_results.results):
+        results[index] = result
+
+    return FetchResults(results)
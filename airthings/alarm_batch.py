@@ -0,0 +1,136 @@
+"""
+Alarm evaluation of whole series of values with NumPy, e.g. when backfilling a history.
+
+The values are resolved against the same compiled alarm rules as Sensor, in one vectorized
+pass, as severity codes: the index of the severity in ALARM_SEVERITY_CODES.
+Requires NumPy, installed with the numpy extra (pip install airthings[numpy]).
+"""
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError(
+        "airthings.alarm_batch requires NumPy, install it with: pip install airthings[numpy]"
+    ) from e
+
+from .alarm_rules import compile_alarm_rules, match_alarm_rule
+from .constants import (
+    ALARM_SEVERITY_CODES,
+    ALARM_SEVERITY_UNKNOWN,
+    HISTORY_TIMESTAMP_COLUMN,
+)
+from .sensors import SENSOR_CLASSES
+
+
+def _severity_code(alarm_rule):
+    if alarm_rule is None or alarm_rule["severity"] not in ALARM_SEVERITY_CODES:
+        return ALARM_SEVERITY_CODES.index(ALARM_SEVERITY_UNKNOWN)
+    return ALARM_SEVERITY_CODES.index(alarm_rule["severity"])
+
+
+def _alarm_rules(key, alarm_rules):
+    if alarm_rules is not None:
+        return alarm_rules
+    sensor_class = SENSOR_CLASSES.get(key)
+    if sensor_class is None or sensor_class.ALARM_RULES is None:
+        raise ValueError("The {} sensor has no alarm rules".format(key))
+    return sensor_class.ALARM_RULES
+
+
+def alarm_severity_codes(key, values, alarm_rules=None):
+    """
+    The severity code of every value of the sensor key, as an int8 array.
+    alarm_rules defaults to the ALARM_RULES of the sensor.
+    """
+    alarm_rules = _alarm_rules(key, alarm_rules)
+    compiled = compile_alarm_rules(alarm_rules)
+    values = np.asarray(values, dtype=np.float64)
+
+    region_codes = np.array(
+        [_severity_code(alarm_rule) for alarm_rule in compiled.regions], dtype=np.int8
+    )
+    thresholds = np.asarray(compiled.thresholds, dtype=np.float64)
+    if thresholds.size:
+        index = np.searchsorted(thresholds, values, side="left")
+        on_threshold = thresholds[np.minimum(index, thresholds.size - 1)] == values
+        codes = region_codes[2 * index + on_threshold]
+    else:
+        codes = np.full(values.shape, region_codes[0], dtype=np.int8)
+
+    # NaN sorts after every threshold, resolve it like the rules do
+    nan = np.isnan(values)
+    if nan.any():
+        codes[nan] = _severity_code(match_alarm_rule(alarm_rules, float("nan")))
+    return codes
+
+
+class AlarmSeveritySummary:
+    """
+    How many samples had every severity, and for how long (in seconds, every sample lasts
+    until the next one, the last sample does not count)
+    """
+
+    def __init__(self, counts, durations):
+        self._counts = counts
+        self._durations = durations
+
+    def __repr__(self):
+        return repr(
+            "<AlarmSeveritySummary counts={} durations={}>".format(
+                self._counts, self._durations
+            )
+        )
+
+    @property
+    def counts(self):
+        return self._counts
+
+    @property
+    def durations(self):
+        return self._durations
+
+
+def summarize_alarm_severities(codes, timestamps=None):
+    """
+    The AlarmSeveritySummary of severity codes, durations are only set with timestamps
+    """
+    codes = np.asarray(codes)
+    counts = np.bincount(codes, minlength=len(ALARM_SEVERITY_CODES))
+    durations = None
+    if timestamps is not None:
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if codes.size > 1:
+            durations = np.bincount(
+                codes[:-1],
+                weights=np.diff(timestamps),
+                minlength=len(ALARM_SEVERITY_CODES),
+            )
+        else:
+            durations = np.zeros(len(ALARM_SEVERITY_CODES))
+
+    return AlarmSeveritySummary(
+        counts={
+            severity: int(count)
+            for severity, count in zip(ALARM_SEVERITY_CODES, counts)
+        },
+        durations=None
+        if durations is None
+        else {
+            severity: float(duration)
+            for severity, duration in zip(ALARM_SEVERITY_CODES, durations)
+        },
+    )
+
+
+def summarize_history(history, key, last=None, since=None, alarm_rules=None):
+    """
+    The AlarmSeveritySummary of the sensor key in a DeviceHistory window (see window),
+    samples without a value for the sensor are skipped
+    """
+    window = history.window(last=last, since=since)
+    timestamps = np.concatenate(
+        [np.frombuffer(segment) for segment in window[HISTORY_TIMESTAMP_COLUMN]]
+    )
+    values = np.concatenate([np.frombuffer(segment) for segment in window[key]])
+    measured = ~np.isnan(values)
+    codes = alarm_severity_codes(key, values[measured], alarm_rules=alarm_rules)
+    return summarize_alarm_severities(codes, timestamps=timestamps[measured])
@@ -0,0 +1,214 @@
+"""
+Alarm rules compiled into interval tables.
+
+The rules of a sensor only compare the value with thresholds, so the number line is split by
+the sorted thresholds into regions (every threshold, and the open intervals between them)
+where every rule gives the same outcome. The rules are interpreted once per region when they
+are compiled, and a value is resolved by bisecting the thresholds to find its region.
+"""
+import bisect
+import functools
+import logging
+import numbers
+import threading
+
+from .constants import (
+    ALARM_CACHE_SIZE,
+    ALARM_OPERATOR_EQUAL,
+    ALARM_OPERATOR_GREATER_THAN,
+    ALARM_OPERATOR_GREATER_THAN_OR_EQUAL,
+    ALARM_OPERATOR_LESS_THAN,
+    ALARM_OPERATOR_LESS_THAN_OR_EQUAL,
+    ALARM_OPERATOR_NOT_EQUAL,
+    ALARM_SEVERITY_UNKNOWN,
+)
+from .models import Alarm
+
+_LOGGER = logging.getLogger(__name__)
+
+_NUMBER_TYPES = (int, float)
+
+
+def match_alarm_rule(alarm_rules, value):
+    """
+    The first alarm rule all rules of which match value, None if there is none
+    """
+    for alarm_rule in alarm_rules:
+        rules = alarm_rule["rules"]
+        required_matches = len(rules)
+
+        matches = 0
+        for rule in rules:
+            matched_rule = None
+            rule_operator = rule["operator"]
+            rule_value = rule["value"]
+            if rule_operator == ALARM_OPERATOR_EQUAL:
+                if value == rule_value:
+                    matched_rule = rule
+            elif rule_operator == ALARM_OPERATOR_NOT_EQUAL:
+                if value != rule_value:
+                    matched_rule = rule
+            elif rule_operator == ALARM_OPERATOR_GREATER_THAN:
+                if value > rule_value:
+                    matched_rule = rule
+            elif rule_operator == ALARM_OPERATOR_LESS_THAN:
+                if value < rule_value:
+                    matched_rule = rule
+            elif rule_operator == ALARM_OPERATOR_GREATER_THAN_OR_EQUAL:
+                if value >= rule_value:
+                    matched_rule = rule
+            elif rule_operator == ALARM_OPERATOR_LESS_THAN_OR_EQUAL:
+                if value <= rule_value:
+                    matched_rule = rule
+
+            if matched_rule:
+                matches += 1
+
+        if matches >= required_matches:
+            return alarm_rule
+    return None
+
+
+class CompiledAlarmRules:
+    """
+    The alarm rules of a sensor as a sorted table of thresholds and the outcome of every
+    region between them. Alarms are shared between evaluations of equal values.
+    """
+
+    def __init__(self, alarm_rules):
+        self._alarm_rules = alarm_rules
+        self._thresholds = sorted(
+            {
+                rule["value"]
+                for alarm_rule in alarm_rules
+                for rule in alarm_rule["rules"]
+            }
+        )
+        self._regions = [
+            match_alarm_rule(alarm_rules, value) for value in self._representatives()
+        ]
+        self._alarm = functools.lru_cache(maxsize=ALARM_CACHE_SIZE, typed=True)(
+            self._create_alarm
+        )
+
+    def __repr__(self):
+        return repr(
+            "<CompiledAlarmRules thresholds={} regions={}>".format(
+                self._thresholds, len(self._regions)
+            )
+        )
+
+    def _representatives(self):
+        """
+        A value in every region: below the first threshold, every threshold and the interval
+        after it
+        """
+        thresholds = self._thresholds
+        if not thresholds:
+            return [0]
+        representatives = [thresholds[0] - 1]
+        for index, threshold in enumerate(thresholds):
+            representatives.append(threshold)
+            if index + 1 < len(thresholds):
+                representatives.append((threshold + thresholds[index + 1]) / 2.0)
+            else:
+                representatives.append(threshold + 1)
+        return representatives
+
+    @property
+    def alarm_rules(self):
+        return self._alarm_rules
+
+    @property
+    def thresholds(self):
+        return self._thresholds
+
+    @property
+    def regions(self):
+        """
+        The alarm rule matched in every region (see region), None if no rule matches
+        """
+        return self._regions
+
+    def region(self, value):
+        """
+        The index of the region of value: 2 * i for the interval below the i-th threshold,
+        2 * i + 1 for the i-th threshold itself
+        """
+        index = bisect.bisect_left(self._thresholds, value)
+        if index < len(self._thresholds) and self._thresholds[index] == value:
+            return 2 * index + 1
+        return 2 * index
+
+    def match(self, value):
+        """
+        Same as match_alarm_rule, but resolved from the table
+        """
+        return self._regions[self.region(value)]
+
+    def _create_alarm(self, region, value):
+        alarm_rule = self._regions[region]
+        if alarm_rule is None:
+            return Alarm(severity=ALARM_SEVERITY_UNKNOWN, value=value)
+        return Alarm(
+            severity=alarm_rule["severity"], value=value, rules=alarm_rule["rules"]
+        )
+
+    def evaluate(self, value):
+        """
+        The Alarm of value, with the same outcome as interpreting the rules.
+        None (no reading, e.g. a radon sensor warming up) has the unknown severity.
+        """
+        if value is None:
+            return Alarm(severity=ALARM_SEVERITY_UNKNOWN, value=value)
+        if (
+            type(value) not in _NUMBER_TYPES
+            and not isinstance(value, numbers.Real)
+            or value != value
+        ):
+            # Not on the number line (e.g. None or NaN), interpret the rules
+            alarm_rule = match_alarm_rule(self._alarm_rules, value)
+            if alarm_rule is None:
+                self._warn_unknown(value)
+                return Alarm(severity=ALARM_SEVERITY_UNKNOWN, value=value)
+            return Alarm(
+                severity=alarm_rule["severity"], value=value, rules=alarm_rule["rules"]
+            )
+
+        thresholds = self._thresholds
+        index = bisect.bisect_left(thresholds, value)
+        if index < len(thresholds) and thresholds[index] == value:
+            region = 2 * index + 1
+        else:
+            region = 2 * index
+        if self._regions[region] is None:
+            self._warn_unknown(value)
+        return self._alarm(region, value)
+
+    def _warn_unknown(self, value):
+        _LOGGER.warning(
+            "Setting severity to unknown. Could not determine alarm severity for value: {}, and alarm_rules: {}".format(
+                value, self._alarm_rules
+            )
+        )
+
+
+_compiled_alarm_rules = {}
+_compiled_alarm_rules_lock = threading.Lock()
+
+
+def compile_alarm_rules(alarm_rules):
+    """
+    The CompiledAlarmRules of alarm_rules, compiled on first use.
+    The rules are not expected to change once compiled.
+    """
+    try:
+        return _compiled_alarm_rules[id(alarm_rules)][1]
+    except KeyError:
+        pass
+
+    compiled = CompiledAlarmRules(alarm_rules)
+    with _compiled_alarm_rules_lock:
+        # Keep alarm_rules alive, so its id is not reused
+        _compiled_alarm_rules.setdefault(id(alarm_rules), (alarm_rules, compiled))
+        return _compiled_alarm_rules[id(alarm_rules)][1]
@@ -0,0 +1,121 @@
+import time
+
+import bluepy.btle as btle
+
+
+class SystemClock:
+    """
+    The real time, the clock of the bluepy backend
+    """
+
+    def __repr__(self):
+        return repr("<SystemClock>")
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds, reason=None):
+        """
+        reason is what the sleep is for, one of the SLEEP_ constants
+        """
+        time.sleep(seconds)
+
+    def wait(self, event, timeout):
+        """
+        Wait until the threading.Event is set, or for timeout seconds, returns if it is set
+        """
+        return event.wait(timeout)
+
+
+class Characteristic:
+    """
+    A characteristic of a peripheral that is not a bluepy peripheral, read through
+    readCharacteristic like bluepy does
+    """
+
+    def __init__(self, peripheral, uuid, handle):
+        self._peripheral = peripheral
+        self._uuid = uuid
+        self._handle = handle
+
+    def __repr__(self):
+        return repr(
+            "<Characteristic uuid={} handle={}>".format(self._uuid, self._handle)
+        )
+
+    @property
+    def uuid(self):
+        return self._uuid
+
+    @property
+    def valHandle(self):
+        return self._handle
+
+    def read(self):
+        return self._peripheral.readCharacteristic(self._handle)
+
+
+class Backend:
+    """
+    Opens the peripherals and scanners the devices are talked to with, and keeps the time
+    every wait (retries, before_fetch_sleep, next_connect_sleep, ...) is measured in
+    """
+
+    def __init__(self, clock=None):
+        self._clock = clock if clock is not None else SystemClock()
+
+    @property
+    def clock(self):
+        return self._clock
+
+    def open_peripheral(self, mac_address, iface, address_type):
+        raise NotImplementedError(
+            "{} cannot connect to peripherals".format(type(self).__name__)
+        )
+
+    def create_scanner(self, iface):
+        raise NotImplementedError("{} cannot scan".format(type(self).__name__))
+
+
+class BluepyBackend(Backend):
+    """
+    Opens peripherals and scanners with bluepy, the backend used by default
+    """
+
+    def __repr__(self):
+        return repr("<BluepyBackend>")
+
+    def open_peripheral(self, mac_address, iface, address_type):
+        return btle.Peripheral(mac_address, iface=iface, addrType=address_type)
+
+    def create_scanner(self, iface):
+        return btle.Scanner(iface=iface)
+
+
+_backend = BluepyBackend()
+
+
+def get_backend():
+    """
+    The backend used to open peripherals and scanners
+    """
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replace the backend used to open peripherals and scanners, e.g. with a SimulatedBackend
+    (see airthings.backends.simulated). None restores the bluepy backend.
+    """
+    global _backend
+    _backend = backend if backend is not None else BluepyBackend()
+
+
+def get_clock():
+    """
+    The clock of the backend, every wait of the library is a sleep of this clock
+    """
+    return _backend.clock
@@ -0,0 +1,193 @@
+"""
+Replays a payload log (see airthings.recorder) through the regular fetch path of the
+devices, at full speed and without radios, e.g. to profile or regression-test decoding on
+recorded traffic.
+"""
+import collections
+
+import bluepy.btle as btle
+
+from ..exceptions import UnsupportedDuringReplayException
+from ..handle_cache import CharacteristicHandleCache, get_handle_cache, set_handle_cache
+from ..measurement_cache import get_measurement_cache, set_measurement_cache
+from ..recorder import get_payload_recorder, read_payload_log, set_payload_recorder
+from ..utils import determine_device_class_from_serial_number
+from . import Backend, Characteristic, get_backend, set_backend
+
+
+class ReplayPeripheral:
+    """
+    Answers reads with the values queued for its MAC address, in the order they were queued
+    """
+
+    def __init__(self, backend, mac_address):
+        self._backend = backend
+        self._mac_address = mac_address
+        self._connected = True
+
+    def __repr__(self):
+        return repr("<ReplayPeripheral mac_address={}>".format(self._mac_address))
+
+    def getState(self):
+        return "conn" if self._connected else "disc"
+
+    def disconnect(self):
+        self._connected = False
+
+    def getCharacteristics(self, uuid=None):
+        uuid = str(btle.UUID(uuid))
+        return [Characteristic(self, uuid, self._backend.handle(uuid))]
+
+    def readCharacteristic(self, handle):
+        if not self._connected:
+            raise btle.BTLEDisconnectError("Replayed device is disconnected")
+        return self._backend.dequeue(self._mac_address, handle)
+
+
+class ReplayBackend(Backend):
+    """
+    A backend whose peripherals answer with recorded values, queued with enqueue.
+    Every characteristic UUID gets a handle of its own, so cached handles keep working.
+    """
+
+    def __init__(self):
+        super(ReplayBackend, self).__init__()
+        self._queues = collections.defaultdict(collections.deque)
+        self._handles = {}
+        self._uuids = {}
+
+    def __repr__(self):
+        return repr("<ReplayBackend queued={}>".format(self.queued))
+
+    @property
+    def queued(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def handle(self, uuid):
+        handle = self._handles.get(uuid)
+        if handle is None:
+            handle = len(self._handles) + 1
+            self._handles[uuid] = handle
+            self._uuids[handle] = uuid
+        return handle
+
+    def enqueue(self, mac_address, uuid, value):
+        self._queues[(mac_address, str(btle.UUID(uuid)))].append(value)
+
+    def has_queued(self, mac_address, uuid):
+        return bool(self._queues.get((mac_address, str(btle.UUID(uuid)))))
+
+    def dequeue(self, mac_address, handle):
+        uuid = self._uuids.get(handle)
+        queue = self._queues.get((mac_address, uuid))
+        if not queue:
+            raise btle.BTLEGattError(
+                "No recorded value of {} left for handle {}".format(mac_address, handle)
+            )
+        return queue.popleft()
+
+    def open_peripheral(self, mac_address, iface, address_type):
+        return ReplayPeripheral(self, mac_address)
+
+    def create_scanner(self, iface):
+        raise UnsupportedDuringReplayException("Discovering devices")
+
+
+class PayloadReplay:
+    """
+    Feeds the payload log at path back through Device.fetch_and_set_measurements. Iterating
+    it yields (timestamp, device) every time the raw data of a device has been recorded in
+    full, timestamp is when its last value was recorded. Every yielded device is a new
+    device, so the readings can be kept. Values read before the device was identified are
+    skipped.
+
+    The replay only runs inside a with block: entering it swaps in a ReplayBackend, an empty
+    handle cache, no measurement cache and no payload recorder for the whole process, and
+    leaving it restores the previous ones, even if the iteration was stopped early.
+    """
+
+    def __init__(self, path, **fetch_options):
+        self._path = path
+        self._fetch_options = fetch_options
+        self._backend = None
+        self._previous = None
+
+    def __repr__(self):
+        return repr("<PayloadReplay path={}>".format(self._path))
+
+    def __enter__(self):
+        if self._previous is not None:
+            raise RuntimeError("{} is already being replayed".format(self._path))
+        self._previous = (
+            get_backend(),
+            get_handle_cache(),
+            get_measurement_cache(),
+            get_payload_recorder(),
+        )
+        self._backend = ReplayBackend()
+        set_backend(self._backend)
+        set_handle_cache(CharacteristicHandleCache())
+        # The recorded readings are not current, they must not be served as cached ones
+        set_measurement_cache(None)
+        set_payload_recorder(None)
+        return self
+
+    def __exit__(self, *args):
+        backend, handle_cache, measurement_cache, payload_recorder = self._previous
+        self._previous = None
+        set_backend(backend)
+        set_handle_cache(handle_cache)
+        set_measurement_cache(measurement_cache)
+        set_payload_recorder(payload_recorder)
+
+    def __iter__(self):
+        if self._previous is None:
+            raise RuntimeError(
+                "Replay {} inside a with block: with replay_payload_log(path) as replay".format(
+                    self._path
+                )
+            )
+
+        backend = self._backend
+        # (serial number, device class, raw data UUIDs) per MAC address
+        identities = {}
+        for record in read_payload_log(self._path):
+            if self._previous is None:
+                raise RuntimeError(
+                    "The replay of {} was left while iterating it".format(self._path)
+                )
+            if record.serial_number is None:
+                continue
+            identity = identities.get(record.mac_address)
+            if identity is None or identity[0] != record.serial_number:
+                device_class = determine_device_class_from_serial_number(
+                    record.serial_number
+                )
+                identity = (
+                    record.serial_number,
+                    device_class,
+                    [str(btle.UUID(uuid)) for uuid in device_class.RAW_DATA_UUIDS],
+                )
+                identities[record.mac_address] = identity
+
+            serial_number, device_class, raw_data_uuids = identity
+            if record.uuid not in raw_data_uuids:
+                continue
+            backend.enqueue(record.mac_address, record.uuid, record.value)
+            if all(
+                backend.has_queued(record.mac_address, uuid) for uuid in raw_data_uuids
+            ):
+                device = device_class(record.mac_address, serial_number)
+                device.fetch_and_set_measurements(**self._fetch_options)
+                yield record.timestamp, device
+
+
+def replay_payload_log(path, **fetch_options):
+    """
+    A PayloadReplay of the payload log at path:
+
+    with replay_payload_log("payloads.log") as replay:
+        for timestamp, device in replay:
+            ...
+    """
+    return PayloadReplay(path, **fetch_options)
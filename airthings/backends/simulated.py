@@ -0,0 +1,594 @@
+"""
+A simulated backend, talking to a fleet of virtual devices instead of bluepy, e.g. to work on
+the scan, connect and retry paths without hardware.
+
+Connecting and reading take a configurable (virtual) time, and can fail at random, and a scan
+only sees every device with a configurable probability. With a VirtualClock, every wait of
+the library (retries, before_fetch_sleep, next_connect_sleep, ...) advances the clock instead
+of sleeping, so hours of polling run in moments. Waits of the asyncio variants in airthings.aio
+are asyncio sleeps, and are not simulated.
+"""
+import collections
+import math
+import random
+import struct
+import threading
+import time
+
+import bluepy.btle as btle
+
+from ..constants import (
+    SENSOR_ATMOSPHERIC_PRESSURE_KEY,
+    SENSOR_CO2_KEY,
+    SENSOR_HUMIDITY_KEY,
+    SENSOR_RADON_LONG_TERM_AVG_KEY,
+    SENSOR_RADON_SHORT_TERM_AVG_KEY,
+    SENSOR_TEMPERATURE_KEY,
+    SENSOR_UPDATE_INTERVAL_ON_READ,
+    SENSOR_VOC_KEY,
+    SLEEP_CONNECT,
+    SLEEP_READ,
+    SLEEP_SCAN,
+    WAVE_GEN_1_MODEL_NUMBER,
+    WAVE_GEN_2_MODEL_NUMBER,
+    WAVE_MINI_GEN_1_MODEL_NUMBER,
+    WAVE_PLUS_GEN_1_MODEL_NUMBER,
+)
+from ..utils import determine_device_class_from_model_number
+from . import Backend, Characteristic
+
+# Company identifier of Airthings, followed by the serial number
+_MANUFACTURER_DATA = struct.Struct("<HLH")
+_MANUFACTURER_ID = 0x0334
+
+VIRTUAL_DEVICE_MODEL_NUMBERS = (
+    WAVE_GEN_1_MODEL_NUMBER,
+    WAVE_MINI_GEN_1_MODEL_NUMBER,
+    WAVE_PLUS_GEN_1_MODEL_NUMBER,
+    WAVE_GEN_2_MODEL_NUMBER,
+)
+
+
+class VirtualClock:
+    """
+    A clock that only moves when it sleeps. Sleeps of several threads add up, as if they
+    were run one after the other.
+    """
+
+    def __init__(self, start_time=None):
+        self._start_time = time.time() if start_time is None else start_time
+        self._elapsed = 0.0
+        self._slept = collections.defaultdict(float)
+        self._sleeps = collections.Counter()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return repr("<VirtualClock elapsed={}>".format(self._elapsed))
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    def time(self):
+        return self._start_time + self._elapsed
+
+    def monotonic(self):
+        return self._elapsed
+
+    @property
+    def slept(self):
+        """
+        The seconds slept per reason (see SystemClock.sleep)
+        """
+        return dict(self._slept)
+
+    @property
+    def sleeps(self):
+        """
+        How many times the clock slept per reason, sleeps of 0 seconds included
+        """
+        return dict(self._sleeps)
+
+    def sleep(self, seconds, reason=None):
+        with self._lock:
+            self._sleeps[reason] += 1
+            if seconds > 0:
+                self._elapsed += seconds
+                self._slept[reason] += seconds
+
+    def wait(self, event, timeout):
+        if not event.is_set() and timeout is not None:
+            self.sleep(timeout)
+        return event.is_set()
+
+
+def _wave_gen_1_raw_data(values, measured_at):
+    # Date and time of the reading, then one characteristic per sensor
+    return time.gmtime(measured_at)[:6] + (
+        int(values[SENSOR_HUMIDITY_KEY] * 100),
+        int(values[SENSOR_TEMPERATURE_KEY] * 100),
+        values[SENSOR_RADON_SHORT_TERM_AVG_KEY],
+        values[SENSOR_RADON_LONG_TERM_AVG_KEY],
+    )
+
+
+def _wave_mini_gen_1_raw_data(values, measured_at):
+    return (
+        1,
+        int((values[SENSOR_TEMPERATURE_KEY] + 273.15) * 100),
+        0,
+        int(values[SENSOR_HUMIDITY_KEY] * 100),
+        values[SENSOR_VOC_KEY],
+        0,
+        0,
+        0,
+    )
+
+
+def _wave_plus_gen_1_raw_data(values, measured_at):
+    return (
+        1,
+        int(values[SENSOR_HUMIDITY_KEY] * 2),
+        0,
+        0,
+        values[SENSOR_RADON_SHORT_TERM_AVG_KEY],
+        values[SENSOR_RADON_LONG_TERM_AVG_KEY],
+        int(values[SENSOR_TEMPERATURE_KEY] * 100),
+        int(values[SENSOR_ATMOSPHERIC_PRESSURE_KEY] * 50),
+        values[SENSOR_CO2_KEY],
+        values[SENSOR_VOC_KEY],
+        0,
+        0,
+    )
+
+
+def _wave_gen_2_raw_data(values, measured_at):
+    return (
+        1,
+        int(values[SENSOR_HUMIDITY_KEY] * 2),
+        0,
+        0,
+        values[SENSOR_RADON_SHORT_TERM_AVG_KEY],
+        values[SENSOR_RADON_LONG_TERM_AVG_KEY],
+        int(values[SENSOR_TEMPERATURE_KEY] * 100),
+        0,
+        0,
+        0,
+        0,
+        0,
+    )
+
+
+_RAW_DATA = {
+    WAVE_GEN_1_MODEL_NUMBER: _wave_gen_1_raw_data,
+    WAVE_MINI_GEN_1_MODEL_NUMBER: _wave_mini_gen_1_raw_data,
+    WAVE_PLUS_GEN_1_MODEL_NUMBER: _wave_plus_gen_1_raw_data,
+    WAVE_GEN_2_MODEL_NUMBER: _wave_gen_2_raw_data,
+}
+
+# The struct format of every characteristic the raw data is read from, if there are several
+_RAW_DATA_CHARACTERISTIC_FORMATS = {
+    WAVE_GEN_1_MODEL_NUMBER: ("<H5B", "<H", "<H", "<H", "<H"),
+}
+
+
+class VirtualDevice:
+    """
+    A virtual Airthings device, whose sensor values wander around random levels. Like a
+    real device, every sensor is updated once every update interval of its model, and the
+    raw data is taken anew every time its first characteristic is read.
+    """
+
+    def __init__(self, mac_address, serial_number, seed=None):
+        self._mac_address = mac_address.lower()
+        self._serial_number = serial_number
+        self._device_class = determine_device_class_from_model_number(serial_number[:4])
+        self._random = random.Random(seed)
+        self._levels = {
+            SENSOR_HUMIDITY_KEY: self._random.uniform(25.0, 60.0),
+            SENSOR_TEMPERATURE_KEY: self._random.uniform(17.0, 25.0),
+            SENSOR_RADON_SHORT_TERM_AVG_KEY: self._random.uniform(10.0, 200.0),
+            SENSOR_RADON_LONG_TERM_AVG_KEY: self._random.uniform(10.0, 200.0),
+            SENSOR_ATMOSPHERIC_PRESSURE_KEY: self._random.uniform(980.0, 1030.0),
+            SENSOR_CO2_KEY: self._random.uniform(400.0, 1500.0),
+            SENSOR_VOC_KEY: self._random.uniform(50.0, 500.0),
+        }
+        self._phase = self._random.uniform(0.0, 3600.0)
+        self._values = {}
+        self._updates = {}
+        self._raw_data_uuids = [
+            str(btle.UUID(uuid)) for uuid in self._device_class.RAW_DATA_UUIDS
+        ]
+        self._characteristics = {
+            str(btle.UUID(btle.AssignedNumbers.modelNumberString)): serial_number[
+                :4
+            ].encode("utf-8"),
+            str(btle.UUID(btle.AssignedNumbers.serialNumberString)): serial_number[
+                4:
+            ].encode("utf-8"),
+            str(btle.UUID(btle.AssignedNumbers.firmwareRevisionString)): b"G-BLE-1.5.3",
+            str(btle.UUID(btle.AssignedNumbers.hardwareRevisionString)): b"REV A",
+        }
+        self._statistics = {
+            "connects": 0,
+            "failed_connects": 0,
+            "disconnects": 0,
+            "discovers": 0,
+            "reads": 0,
+        }
+
+    def __repr__(self):
+        return repr(
+            "<VirtualDevice mac_address={} serial_number={} model={}>".format(
+                self._mac_address, self._serial_number, self._device_class.LABEL
+            )
+        )
+
+    @property
+    def mac_address(self):
+        return self._mac_address
+
+    @property
+    def serial_number(self):
+        return self._serial_number
+
+    @property
+    def device_class(self):
+        return self._device_class
+
+    @property
+    def manufacturer_data(self):
+        return _MANUFACTURER_DATA.pack(_MANUFACTURER_ID, int(self._serial_number), 0)
+
+    @property
+    def statistics(self):
+        """
+        How many times the device was connected to (or failed to), dropped the connection,
+        and had a characteristic discovered or read
+        """
+        return self._statistics
+
+    def _update_values(self, measured_at):
+        update_intervals = self._device_class.SENSOR_UPDATE_INTERVALS
+        for key, level in self._levels.items():
+            interval = update_intervals.get(key, SENSOR_UPDATE_INTERVAL_ON_READ)
+            if interval != SENSOR_UPDATE_INTERVAL_ON_READ:
+                # The sensor is updated at phase + n * interval
+                update = math.floor((measured_at - self._phase) / interval)
+                if self._updates.get(key) == update:
+                    continue
+                self._updates[key] = update
+            value = level + self._random.gauss(0.0, level * 0.02)
+            self._values[key] = (
+                value
+                if key in (SENSOR_HUMIDITY_KEY, SENSOR_TEMPERATURE_KEY)
+                else int(value)
+            )
+
+    def _measure(self, measured_at):
+        self._update_values(measured_at)
+        values = self._values
+        raw_data = self._device_class.RAW_DATA_STRUCT.pack(
+            *_RAW_DATA[self._device_class.MODEL_NUMBER](values, measured_at)
+        )
+
+        formats = _RAW_DATA_CHARACTERISTIC_FORMATS.get(
+            self._device_class.MODEL_NUMBER, (None,)
+        )
+        offset = 0
+        for uuid, characteristic_format in zip(self._raw_data_uuids, formats):
+            size = (
+                len(raw_data)
+                if characteristic_format is None
+                else struct.calcsize(characteristic_format)
+            )
+            self._characteristics[uuid] = raw_data[offset : offset + size]
+            offset += size
+
+    def read(self, uuid, measured_at):
+        """
+        The value of the characteristic uuid, None if the device does not have it
+        """
+        uuid = str(btle.UUID(uuid))
+        if uuid == self._raw_data_uuids[0] or (
+            uuid in self._raw_data_uuids and uuid not in self._characteristics
+        ):
+            self._measure(measured_at)
+        return self._characteristics.get(uuid)
+
+
+def create_virtual_fleet(count, model_numbers=VIRTUAL_DEVICE_MODEL_NUMBERS, seed=None):
+    """
+    count virtual devices, of every model number in turn
+    """
+    return [
+        VirtualDevice(
+            "aa:00:00:00:{:02x}:{:02x}".format(index // 256 % 256, index % 256),
+            "{}{:06d}".format(model_numbers[index % len(model_numbers)], index),
+            seed=None if seed is None else seed + index,
+        )
+        for index in range(count)
+    ]
+
+
+class SimulatedScanEntry:
+    def __init__(self, device, rssi):
+        self._device = device
+        self.addr = device.mac_address
+        self.addrType = btle.ADDR_TYPE_PUBLIC
+        self.rssi = rssi
+        self.updateCount = 0
+
+    def __repr__(self):
+        return repr("<SimulatedScanEntry addr={}>".format(self.addr))
+
+    def getValue(self, sdid):
+        if sdid == btle.ScanEntry.MANUFACTURER:
+            return self._device.manufacturer_data
+        return None
+
+
+class SimulatedScanner:
+    """
+    Sees every device of the backend with its scan_visibility probability, every scan
+    """
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._delegate = None
+        self._entries = {}
+
+    def __repr__(self):
+        return repr("<SimulatedScanner>")
+
+    def withDelegate(self, delegate):
+        self._delegate = delegate
+        return self
+
+    def _visible_entries(self):
+        entries = []
+        for device in self._backend.devices:
+            if self._backend.is_visible(device):
+                entry = self._entries.get(device.mac_address)
+                if entry is None:
+                    entry = SimulatedScanEntry(device, self._backend.rssi(device))
+                    self._entries[device.mac_address] = entry
+                entry.updateCount += 1
+                entries.append(entry)
+        return entries
+
+    def start(self, passive=False):
+        self._backend.count("scans")
+        if self._backend.should_fail(self._backend.scan_failure_probability):
+            raise btle.BTLEManagementError(
+                "Failed to execute management command 'scan'"
+            )
+
+    def stop(self):
+        pass
+
+    def clear(self):
+        self._entries = {}
+
+    def process(self, timeout=10):
+        self._backend.clock.sleep(timeout, SLEEP_SCAN)
+        for entry in self._visible_entries():
+            if self._delegate is not None:
+                self._delegate.handleDiscovery(entry, entry.updateCount == 1, True)
+
+    def scan(self, timeout=10, passive=False):
+        self.clear()
+        self.start(passive=passive)
+        self._backend.clock.sleep(timeout, SLEEP_SCAN)
+        return self._visible_entries()
+
+
+class SimulatedPeripheral:
+    def __init__(self, backend, device):
+        self._backend = backend
+        self._device = device
+        self._connected = True
+
+    def __repr__(self):
+        return repr("<SimulatedPeripheral mac_address={}>".format(self.addr))
+
+    @property
+    def addr(self):
+        return self._device.mac_address
+
+    def getState(self):
+        return "conn" if self._connected else "disc"
+
+    def disconnect(self):
+        self._connected = False
+
+    def _use(self, statistic):
+        if not self._connected:
+            raise btle.BTLEDisconnectError("Device disconnected")
+        self._backend.clock.sleep(self._backend.read_latency, SLEEP_READ)
+        if self._backend.should_fail(self._backend.disconnect_probability):
+            self._connected = False
+            self._device.statistics["disconnects"] += 1
+            raise btle.BTLEDisconnectError("Device disconnected")
+        self._device.statistics[statistic] += 1
+
+    def getCharacteristics(self, uuid=None):
+        self._use("discovers")
+        if self._device.read(uuid, self._backend.clock.time()) is None:
+            return []
+        uuid = str(btle.UUID(uuid))
+        return [Characteristic(self, uuid, self._backend.handle(uuid))]
+
+    def readCharacteristic(self, handle):
+        self._use("reads")
+        value = self._device.read(
+            self._backend.uuid(handle), self._backend.clock.time()
+        )
+        if value is None:
+            raise btle.BTLEGattError("Invalid handle {}".format(handle))
+        return value
+
+
+class SimulatedBackend(Backend):
+    """
+    A backend talking to virtual devices (see VirtualDevice and create_virtual_fleet).
+
+    Connecting takes connect_latency seconds and fails with connect_failure_probability,
+    and every characteristic read or discovery takes read_latency seconds and drops the
+    connection with disconnect_probability. A scan fails with scan_failure_probability, and
+    sees every device with scan_visibility probability. The latencies are slept on clock, a
+    VirtualClock by default. seed makes the failures repeatable.
+    """
+
+    def __init__(
+        self,
+        devices=(),
+        clock=None,
+        connect_latency=0.0,
+        read_latency=0.0,
+        connect_failure_probability=0.0,
+        disconnect_probability=0.0,
+        scan_visibility=1.0,
+        scan_failure_probability=0.0,
+        seed=None,
+    ):
+        super(SimulatedBackend, self).__init__(
+            clock=clock if clock is not None else VirtualClock()
+        )
+        self._devices = {}
+        self._connect_latency = connect_latency
+        self._read_latency = read_latency
+        self._connect_failure_probability = connect_failure_probability
+        self._disconnect_probability = disconnect_probability
+        self._scan_visibility = scan_visibility
+        self._scan_failure_probability = scan_failure_probability
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._handles = {}
+        self._uuids = {}
+        self._statistics = {"scans": 0}
+        for device in devices:
+            self.add_device(device)
+
+    def __repr__(self):
+        return repr(
+            "<SimulatedBackend devices={} clock={}>".format(
+                len(self._devices), self._clock
+            )
+        )
+
+    @property
+    def devices(self):
+        return list(self._devices.values())
+
+    @property
+    def connect_latency(self):
+        return self._connect_latency
+
+    @connect_latency.setter
+    def connect_latency(self, connect_latency):
+        self._connect_latency = connect_latency
+
+    @property
+    def read_latency(self):
+        return self._read_latency
+
+    @read_latency.setter
+    def read_latency(self, read_latency):
+        self._read_latency = read_latency
+
+    @property
+    def connect_failure_probability(self):
+        return self._connect_failure_probability
+
+    @connect_failure_probability.setter
+    def connect_failure_probability(self, connect_failure_probability):
+        self._connect_failure_probability = connect_failure_probability
+
+    @property
+    def disconnect_probability(self):
+        return self._disconnect_probability
+
+    @disconnect_probability.setter
+    def disconnect_probability(self, disconnect_probability):
+        self._disconnect_probability = disconnect_probability
+
+    @property
+    def scan_visibility(self):
+        return self._scan_visibility
+
+    @scan_visibility.setter
+    def scan_visibility(self, scan_visibility):
+        self._scan_visibility = scan_visibility
+
+    @property
+    def scan_failure_probability(self):
+        return self._scan_failure_probability
+
+    @scan_failure_probability.setter
+    def scan_failure_probability(self, scan_failure_probability):
+        self._scan_failure_probability = scan_failure_probability
+
+    @property
+    def statistics(self):
+        return self._statistics
+
+    def add_device(self, device):
+        self._devices[device.mac_address] = device
+
+    def remove_device(self, mac_address):
+        self._devices.pop(mac_address.lower(), None)
+
+    def get_device(self, mac_address):
+        return self._devices.get(mac_address.lower())
+
+    def count(self, statistic):
+        with self._lock:
+            self._statistics[statistic] += 1
+
+    def should_fail(self, probability):
+        if probability <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < probability
+
+    def is_visible(self, device):
+        return not self.should_fail(1.0 - self._scan_visibility)
+
+    def rssi(self, device):
+        with self._lock:
+            return self._random.randint(-90, -50)
+
+    def handle(self, uuid):
+        with self._lock:
+            handle = self._handles.get(uuid)
+            if handle is None:
+                handle = len(self._handles) + 1
+                self._handles[uuid] = handle
+                self._uuids[handle] = uuid
+            return handle
+
+    def uuid(self, handle):
+        return self._uuids.get(handle)
+
+    def open_peripheral(self, mac_address, iface, address_type):
+        self._clock.sleep(self._connect_latency, SLEEP_CONNECT)
+        device = self.get_device(mac_address)
+        if device is None:
+            raise btle.BTLEDisconnectError(
+                "Failed to connect to peripheral {}, addr type: {}".format(
+                    mac_address, address_type
+                )
+            )
+        if self.should_fail(self._connect_failure_probability):
+            device.statistics["failed_connects"] += 1
+            raise btle.BTLEDisconnectError(
+                "Failed to connect to peripheral {}, addr type: {}".format(
+                    mac_address, address_type
+                )
+            )
+        device.statistics["connects"] += 1
+        return SimulatedPeripheral(self, device)
+
+    def create_scanner(self, iface):
+        return SimulatedScanner(self)
@@ -0,0 +1,378 @@
+"""
+An end-to-end benchmark of the poll cycle, run with python -m airthings.bench.
+
+Every cycle scans for a fleet of virtual devices (see airthings.backends.simulated), then
+identifies the devices it found by their MAC addresses and fetches their measurements with
+fetch_measurements, like a poller does. The failure rates can be scripted per cycle: a comma
+separated list of probabilities is used one cycle after the other, e.g.
+--disconnect-probability 0,0,0.2 drops connections in every third cycle.
+
+Every wait runs on the VirtualClock of the backend, so a cycle takes its virtual time in
+moments. The report has the virtual time of every cycle and phase, split into working
+(scanning, connecting and reading) and sleeping, the delay every sleep of the library
+(before_fetch_sleep, next_connect_sleep, the retry sleeps, ...) adds up to, and the
+connections and GATT reads per device.
+"""
+import argparse
+import logging
+import sys
+import time
+
+from . import (
+    CharacteristicHandleCache,
+    IdentityRegistry,
+    discover_devices,
+    fetch_measurements,
+    get_handle_cache,
+    get_identity_registry,
+    set_handle_cache,
+    set_identity_registry,
+)
+from .backends import get_backend, set_backend
+from .backends.simulated import (
+    VIRTUAL_DEVICE_MODEL_NUMBERS,
+    SimulatedBackend,
+    VirtualClock,
+    create_virtual_fleet,
+)
+from .constants import (
+    DEFAULT_BEFORE_FETCH_SLEEP,
+    DEFAULT_CONNECT_ATTEMPTS,
+    DEFAULT_FETCH_ATTEMPTS,
+    DEFAULT_KEEP_ALIVE,
+    DEFAULT_NEXT_CONNECT_SLEEP,
+    DEFAULT_RECONNECT_SLEEP,
+    DEFAULT_REFETCH_SLEEP,
+    DEFAULT_RESCAN_SLEEP,
+    DEFAULT_SCAN_ATTEMPTS,
+    DEFAULT_SCAN_TIMEOUT,
+    SLEEP_BEFORE_FETCH,
+    SLEEP_CONNECT,
+    SLEEP_NEXT_CONNECT,
+    SLEEP_READ,
+    SLEEP_RECONNECT,
+    SLEEP_REFETCH,
+    SLEEP_RESCAN,
+    SLEEP_SCAN,
+)
+from .exceptions import OutOfScanAttemptsException
+from .models import FetchResults
+
+# The time the radio is busy, every other sleep is a wait of the library
+WORKING_REASONS = (SLEEP_SCAN, SLEEP_CONNECT, SLEEP_READ)
+SLEEPING_REASONS = (
+    SLEEP_BEFORE_FETCH,
+    SLEEP_NEXT_CONNECT,
+    SLEEP_RECONNECT,
+    SLEEP_REFETCH,
+    SLEEP_RESCAN,
+)
+DEVICE_STATISTICS = (
+    ("connects", "connections"),
+    ("failed_connects", "failed connections"),
+    ("disconnects", "dropped connections"),
+    ("discovers", "GATT discoveries"),
+    ("reads", "GATT reads"),
+)
+
+DEFAULT_DEVICES = 20
+DEFAULT_CYCLES = 5
+DEFAULT_CONNECT_LATENCY = 1.0  # Seconds
+DEFAULT_READ_LATENCY = 0.05  # Seconds
+
+
+def _probabilities(value):
+    probabilities = [float(probability) for probability in value.split(",")]
+    for probability in probabilities:
+        if not 0.0 <= probability <= 1.0:
+            raise argparse.ArgumentTypeError(
+                "{} is not a probability between 0 and 1".format(probability)
+            )
+    return probabilities
+
+
+def _model_numbers(value):
+    model_numbers = value.split(",")
+    for model_number in model_numbers:
+        if model_number not in VIRTUAL_DEVICE_MODEL_NUMBERS:
+            raise argparse.ArgumentTypeError(
+                "{} is not one of the simulated models {}".format(
+                    model_number, ", ".join(VIRTUAL_DEVICE_MODEL_NUMBERS)
+                )
+            )
+    return model_numbers
+
+
+def _difference(after, before):
+    return {
+        key: value - before.get(key, 0)
+        for key, value in after.items()
+        if value != before.get(key, 0)
+    }
+
+
+def _reason_label(reason):
+    return "other" if reason is None else reason
+
+
+def _apply_failure_rates(backend, args, cycle):
+    # Every rate is scripted as a list of probabilities, one per cycle in turn
+    for name in (
+        "connect_failure_probability",
+        "disconnect_probability",
+        "scan_failure_probability",
+        "scan_visibility",
+    ):
+        probabilities = getattr(args, name)
+        setattr(backend, name, probabilities[cycle % len(probabilities)])
+
+
+def run_cycle(backend, args):
+    """
+    Discover, identify and fetch the fleet of backend once, returns what the cycle took
+    """
+    clock = backend.clock
+    slept = clock.slept
+    sleeps = clock.sleeps
+    device_statistics = {
+        device.mac_address: dict(device.statistics) for device in backend.devices
+    }
+    started = clock.monotonic()
+    cpu_started = time.perf_counter()
+
+    try:
+        discovered = discover_devices(
+            scan_attempts=args.scan_attempts,
+            scan_timeout=args.scan_timeout,
+            rescan_sleep=args.rescan_sleep,
+        )
+    except OutOfScanAttemptsException:
+        discovered = []
+    discovered_at = clock.monotonic()
+
+    if discovered:
+        results = fetch_measurements(
+            mac_addresses=[device.mac_address for device in discovered],
+            connect_attempts=args.connect_attempts,
+            reconnect_sleep=args.reconnect_sleep,
+            next_connect_sleep=args.next_connect_sleep,
+            before_fetch_sleep=args.before_fetch_sleep,
+            fetch_attempts=args.fetch_attempts,
+            refetch_sleep=args.refetch_sleep,
+            keep_alive=args.keep_alive,
+        )
+    else:
+        results = FetchResults([])
+
+    statistics = dict.fromkeys((key for key, _ in DEVICE_STATISTICS), 0)
+    for device in backend.devices:
+        before = device_statistics.get(device.mac_address, {})
+        for key, value in _difference(device.statistics, before).items():
+            statistics[key] += value
+
+    return {
+        "duration": clock.monotonic() - started,
+        "discover_duration": discovered_at - started,
+        "cpu_duration": time.perf_counter() - cpu_started,
+        "discovered": len(discovered),
+        "fetched": len(results),
+        "failed": len(results.failures),
+        "slept": _difference(clock.slept, slept),
+        "sleeps": _difference(clock.sleeps, sleeps),
+        "device_statistics": statistics,
+    }
+
+
+def run(args):
+    backend = SimulatedBackend(
+        create_virtual_fleet(args.devices, model_numbers=args.models, seed=args.seed),
+        clock=VirtualClock(),
+        connect_latency=args.connect_latency,
+        read_latency=args.read_latency,
+        seed=args.seed,
+    )
+    previous_backend = get_backend()
+    previous_handle_cache = get_handle_cache()
+    previous_identity_registry = get_identity_registry()
+    set_backend(backend)
+    set_handle_cache(CharacteristicHandleCache())
+    set_identity_registry(None if args.no_identity_registry else IdentityRegistry())
+    try:
+        cycles = []
+        for cycle in range(args.cycles):
+            _apply_failure_rates(backend, args, cycle)
+            cycles.append(run_cycle(backend, args))
+        return cycles
+    finally:
+        set_backend(previous_backend)
+        set_handle_cache(previous_handle_cache)
+        set_identity_registry(previous_identity_registry)
+
+
+def report(cycles, devices, out=None):
+    out = sys.stdout if out is None else out
+
+    def write(line=""):
+        out.write(line + "\n")
+
+    write(
+        "{:>5} {:>6} {:>6} {:>6} {:>11} {:>11} {:>11} {:>11} {:>11} {:>9}".format(
+            "cycle",
+            "seen",
+            "ok",
+            "failed",
+            "discover s",
+            "id+fetch s",
+            "total s",
+            "working s",
+            "sleeping s",
+            "cpu ms",
+        )
+    )
+    for index, cycle in enumerate(cycles):
+        working = sum(cycle["slept"].get(reason, 0.0) for reason in WORKING_REASONS)
+        write(
+            "{:>5} {:>6} {:>6} {:>6} {:>11.1f} {:>11.1f} {:>11.1f} {:>11.1f} {:>11.1f} {:>9.1f}".format(
+                index,
+                cycle["discovered"],
+                cycle["fetched"],
+                cycle["failed"],
+                cycle["discover_duration"],
+                cycle["duration"] - cycle["discover_duration"],
+                cycle["duration"],
+                working,
+                cycle["duration"] - working,
+                cycle["cpu_duration"] * 1000,
+            )
+        )
+
+    total = sum(cycle["duration"] for cycle in cycles)
+    slept = {}
+    sleeps = {}
+    for cycle in cycles:
+        for reason, seconds in cycle["slept"].items():
+            slept[reason] = slept.get(reason, 0.0) + seconds
+        for reason, count in cycle["sleeps"].items():
+            sleeps[reason] = sleeps.get(reason, 0) + count
+
+    write()
+    write(
+        "{:<20} {:>8} {:>11} {:>11} {:>7}".format(
+            "phase", "count", "seconds", "per cycle", "share"
+        )
+    )
+    reasons = list(WORKING_REASONS) + list(SLEEPING_REASONS)
+    reasons += sorted(
+        (reason for reason in set(slept) | set(sleeps) if reason not in reasons),
+        key=_reason_label,
+    )
+    for reason in reasons:
+        seconds = slept.get(reason, 0.0)
+        write(
+            "{:<20} {:>8} {:>11.1f} {:>11.1f} {:>6.1f}%".format(
+                _reason_label(reason),
+                sleeps.get(reason, 0),
+                seconds,
+                seconds / len(cycles) if cycles else 0.0,
+                100.0 * seconds / total if total else 0.0,
+            )
+        )
+
+    write()
+    write("Per device and cycle:")
+    for key, label in DEVICE_STATISTICS:
+        count = sum(cycle["device_statistics"][key] for cycle in cycles)
+        write(
+            "  {:<20} {:>8.2f}".format(
+                label, count / (devices * len(cycles)) if devices and cycles else 0.0
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m airthings.bench",
+        description="Benchmark full discover, identify and fetch cycles over a simulated fleet",
+    )
+    parser.add_argument("--devices", type=int, default=DEFAULT_DEVICES)
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES)
+    parser.add_argument(
+        "--models",
+        type=_model_numbers,
+        default=VIRTUAL_DEVICE_MODEL_NUMBERS,
+        help="Comma separated model numbers of the fleet, used in turn",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the fleet and the failures"
+    )
+    parser.add_argument(
+        "--connect-latency", type=float, default=DEFAULT_CONNECT_LATENCY
+    )
+    parser.add_argument("--read-latency", type=float, default=DEFAULT_READ_LATENCY)
+    parser.add_argument(
+        "--connect-failure-probability",
+        type=_probabilities,
+        default=[0.0],
+        help="Comma separated probabilities, one per cycle in turn",
+    )
+    parser.add_argument(
+        "--disconnect-probability",
+        type=_probabilities,
+        default=[0.0],
+        help="Comma separated probabilities, one per cycle in turn",
+    )
+    parser.add_argument(
+        "--scan-failure-probability",
+        type=_probabilities,
+        default=[0.0],
+        help="Comma separated probabilities, one per cycle in turn",
+    )
+    parser.add_argument(
+        "--scan-visibility",
+        type=_probabilities,
+        default=[1.0],
+        help="Comma separated probabilities, one per cycle in turn",
+    )
+    parser.add_argument("--scan-attempts", type=int, default=DEFAULT_SCAN_ATTEMPTS)
+    parser.add_argument("--scan-timeout", type=float, default=DEFAULT_SCAN_TIMEOUT)
+    parser.add_argument("--rescan-sleep", type=float, default=DEFAULT_RESCAN_SLEEP)
+    parser.add_argument(
+        "--connect-attempts", type=int, default=DEFAULT_CONNECT_ATTEMPTS
+    )
+    parser.add_argument(
+        "--reconnect-sleep", type=float, default=DEFAULT_RECONNECT_SLEEP
+    )
+    parser.add_argument(
+        "--next-connect-sleep", type=float, default=DEFAULT_NEXT_CONNECT_SLEEP
+    )
+    parser.add_argument(
+        "--before-fetch-sleep", type=float, default=DEFAULT_BEFORE_FETCH_SLEEP
+    )
+    parser.add_argument("--fetch-attempts", type=int, default=DEFAULT_FETCH_ATTEMPTS)
+    parser.add_argument("--refetch-sleep", type=float, default=DEFAULT_REFETCH_SLEEP)
+    parser.add_argument(
+        "--keep-alive",
+        type=float,
+        default=DEFAULT_KEEP_ALIVE,
+        help="Seconds to keep idle connections open between cycles",
+    )
+    parser.add_argument(
+        "--no-identity-registry",
+        action="store_true",
+        help="Identify every device over the radio in every cycle",
+    )
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        # The failures are counted in the report, their warnings would bury it
+        logging.disable(logging.WARNING)
+
+    report(run(args), args.devices)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,475 @@
+"""
+A long running collector, installed as the airthings-collector console script.
+
+The fleet is identified once and kept in memory, together with the identity registry, the
+handle cache and (optionally) open connections, and every device is polled by a
+PollingScheduler whenever its sensors are expected to have been updated. Every measurement
+is written to stdout as a JSON line, and if --exporter-port is set, served as Prometheus
+metrics. If --history-dir is set, a history of the measurements is kept per device, and if
+--record-payloads is set, every raw value read is appended to a payload log.
+
+SIGTERM and SIGINT stop the collector after the device being polled, SIGHUP reloads the
+fleet file.
+"""
+import argparse
+import json
+import logging
+import signal
+import sys
+import threading
+
+from . import (
+    CharacteristicHandleCache,
+    IdentityRegistry,
+    PayloadRecorder,
+    discover_devices,
+    find_devices,
+    identify_device_by_mac_address,
+    set_handle_cache,
+    set_identity_registry,
+    set_payload_recorder,
+)
+from .backends import get_clock
+from .constants import (
+    DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    DEFAULT_BLUETOOTH_INTERFACE,
+    DEFAULT_CONNECT_ATTEMPTS,
+    DEFAULT_EXPORTER_HOST,
+    DEFAULT_EXPORTER_PORT,
+    DEFAULT_HISTORY_CAPACITY,
+    DEFAULT_KEEP_ALIVE,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_REDISCOVER_INTERVAL,
+    DEFAULT_SCAN_TIMEOUT,
+    DEFAULT_SCHEDULE_MARGIN,
+)
+from .exceptions import InvalidFleetFileException
+from .exporter import MetricsExporter
+from .history import HistoryStore
+from .models import FetchFailure
+from .scheduler import PollingScheduler
+from .storage import load_json_file
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def load_fleet(path):
+    """
+    Load a fleet file, a JSON object with the "mac_addresses" and/or "serial_numbers" of the
+    devices to collect from. Without either, every nearby device is collected from.
+    """
+    fleet = load_json_file(path, default=None)
+    if not isinstance(fleet, dict):
+        raise InvalidFleetFileException(path)
+    return (
+        [mac_address.lower() for mac_address in fleet.get("mac_addresses", [])],
+        [str(serial_number) for serial_number in fleet.get("serial_numbers", [])],
+    )
+
+
+def measurement_to_dict(device):
+    """
+    A JSON serializable representation of a fetched device, or of a FetchFailure
+    """
+    if isinstance(device, FetchFailure):
+        return {
+            "mac_address": device.mac_address,
+            "error": str(device.exception),
+        }
+    return {
+        "mac_address": device.mac_address,
+        "serial_number": device.serial_number,
+        "model": device.label,
+        "measured_at": device.measured_at,
+        "measurements": device.measurement_values,
+        "alarms": {
+            key: sensor.current_alarm.severity
+            for key, sensor in device.measurements.items()
+            if sensor.current_alarm is not None
+        },
+    }
+
+
+class Collector:
+    """
+    Keeps a fleet of Airthings devices identified and polls them until stopped.
+    Devices that are not found are looked for again every rediscover_interval seconds,
+    and without a fleet definition, new nearby devices are picked up at the same interval.
+    """
+
+    def __init__(
+        self,
+        fleet_path=None,
+        on_measurement=None,
+        iface=DEFAULT_BLUETOOTH_INTERFACE,
+        address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+        connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+        keep_alive=DEFAULT_KEEP_ALIVE,
+        scan_timeout=DEFAULT_SCAN_TIMEOUT,
+        margin=DEFAULT_SCHEDULE_MARGIN,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        rediscover_interval=DEFAULT_REDISCOVER_INTERVAL,
+        metrics_store=None,
+        history_store=None,
+    ):
+        self._fleet_path = fleet_path
+        self._on_measurement = on_measurement
+        self._iface = iface
+        self._address_type = address_type
+        self._connect_attempts = connect_attempts
+        self._scan_timeout = scan_timeout
+        self._rediscover_interval = rediscover_interval
+        self._metrics_store = metrics_store
+        self._history_store = history_store
+        self._scheduler = PollingScheduler(
+            margin=margin,
+            poll_interval=poll_interval,
+            connect_attempts=connect_attempts,
+            iface=iface,
+            address_type=address_type,
+            keep_alive=keep_alive,
+        )
+        self._mac_addresses = []
+        self._serial_numbers = []
+        self._next_discovery = get_clock().monotonic()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._reload_requested = True
+
+    def __repr__(self):
+        return repr(
+            "<Collector fleet_path={} devices={}>".format(
+                self._fleet_path, len(self._scheduler)
+            )
+        )
+
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    @property
+    def devices(self):
+        return self._scheduler.devices
+
+    @property
+    def missing(self):
+        """
+        The MAC addresses and serial numbers in the fleet that have not been found yet
+        """
+        known_serial_numbers = {device.serial_number for device in self.devices}
+        return [
+            mac_address
+            for mac_address in self._mac_addresses
+            if mac_address not in self._scheduler
+        ] + [
+            serial_number
+            for serial_number in self._serial_numbers
+            if serial_number not in known_serial_numbers
+        ]
+
+    def stop(self):
+        """
+        Stop the collector, the device being polled is finished first
+        """
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def reload(self):
+        """
+        Reload the fleet file before the next poll
+        """
+        self._reload_requested = True
+        self._wake_event.set()
+
+    def install_signal_handlers(self):
+        """
+        Stop on SIGTERM and SIGINT, reload on SIGHUP. Must be called from the main thread.
+        """
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reload())
+
+    def _reload(self):
+        self._reload_requested = False
+        if self._fleet_path is None:
+            mac_addresses, serial_numbers = [], []
+        else:
+            try:
+                mac_addresses, serial_numbers = load_fleet(self._fleet_path)
+            except InvalidFleetFileException as e:
+                _LOGGER.error("{}, keeping the current fleet".format(e))
+                return
+
+        _LOGGER.info(
+            "Loaded a fleet of {} MAC addresses and {} serial numbers".format(
+                len(mac_addresses), len(serial_numbers)
+            )
+        )
+        self._mac_addresses = mac_addresses
+        self._serial_numbers = serial_numbers
+
+        if mac_addresses or serial_numbers:
+            # Stop polling the devices that were removed from the fleet
+            for device in self.devices:
+                if (
+                    device.mac_address.lower() not in mac_addresses
+                    and device.serial_number not in serial_numbers
+                ):
+                    _LOGGER.info(
+                        "{} was removed from the fleet".format(device.mac_address)
+                    )
+                    self._scheduler.remove(device.mac_address)
+                    if self._metrics_store is not None:
+                        self._metrics_store.remove(device.mac_address)
+                    device.close()
+
+        self._next_discovery = get_clock().monotonic()
+
+    def _add_device(self, device):
+        if device.mac_address in self._scheduler:
+            return
+        _LOGGER.info("Collecting from {} ({})".format(device.mac_address, device.label))
+        self._scheduler.add(device)
+
+    def _discover(self):
+        """
+        Identify the devices of the fleet that are not known yet
+        """
+        self._next_discovery = get_clock().monotonic() + self._rediscover_interval
+        mac_addresses = [
+            mac_address
+            for mac_address in self._mac_addresses
+            if mac_address not in self._scheduler
+        ]
+        for mac_address in mac_addresses:
+            if self._stop_event.is_set():
+                return
+            try:
+                self._add_device(
+                    identify_device_by_mac_address(
+                        mac_address,
+                        connect_attempts=self._connect_attempts,
+                        iface=self._iface,
+                        address_type=self._address_type,
+                    )
+                )
+            except Exception as e:
+                _LOGGER.warning("Failed to identify {}: {}".format(mac_address, e))
+
+        known_serial_numbers = {device.serial_number for device in self.devices}
+        serial_numbers = [
+            serial_number
+            for serial_number in self._serial_numbers
+            if serial_number not in known_serial_numbers
+        ]
+        try:
+            if serial_numbers:
+                result = find_devices(
+                    serial_numbers=serial_numbers,
+                    scan_timeout=self._scan_timeout,
+                    iface=self._iface,
+                )
+                devices = result.devices
+            elif not self._mac_addresses and not self._serial_numbers:
+                devices = discover_devices(
+                    scan_timeout=self._scan_timeout,
+                    iface=self._iface,
+                    address_type=self._address_type,
+                )
+            else:
+                devices = []
+        except Exception as e:
+            _LOGGER.warning("Failed to discover devices: {}".format(e))
+            return
+
+        for device in devices:
+            self._add_device(device)
+
+        missing = self.missing
+        if missing:
+            _LOGGER.warning(
+                "Could not find {}, looking again in {} seconds".format(
+                    missing, self._rediscover_interval
+                )
+            )
+
+    def _handle_result(self, result):
+        if self._metrics_store is not None:
+            self._metrics_store.record(result)
+        if self._history_store is not None and result.ok:
+            self._history_store.record(result.device)
+        if self._on_measurement is not None:
+            self._on_measurement(result.device if result.ok else result)
+
+    def run(self):
+        """
+        Poll the fleet until stop() is called
+        """
+        _LOGGER.info("Starting the collector")
+        try:
+            while not self._stop_event.is_set():
+                if self._reload_requested:
+                    self._reload()
+                if get_clock().monotonic() >= self._next_discovery:
+                    self._discover()
+                if self._stop_event.is_set():
+                    break
+
+                # Set by stop() and reload(), so neither waits for every due device
+                self._scheduler.poll_due(
+                    on_result=self._handle_result, stop_event=self._wake_event
+                )
+
+                wait = self._next_discovery - get_clock().monotonic()
+                next_due = self._scheduler.next_due
+                if next_due is not None:
+                    wait = min(wait, next_due - get_clock().monotonic())
+                if wait > 0:
+                    get_clock().wait(self._wake_event, wait)
+                self._wake_event.clear()
+        finally:
+            _LOGGER.info("Stopping the collector")
+            for device in self.devices:
+                device.close()
+
+
+def _print_measurement(device):
+    print(json.dumps(measurement_to_dict(device)), flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="airthings-collector",
+        description="Continuously collect measurements from a fleet of Airthings devices",
+    )
+    parser.add_argument(
+        "fleet",
+        nargs="?",
+        help='JSON file with the "mac_addresses" and/or "serial_numbers" to collect from, every nearby device if not set',
+    )
+    parser.add_argument(
+        "--iface",
+        type=int,
+        default=DEFAULT_BLUETOOTH_INTERFACE,
+        help="Bluetooth interface, 0 is hci0",
+    )
+    parser.add_argument(
+        "--address-type", default=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    )
+    parser.add_argument(
+        "--connect-attempts", type=int, default=DEFAULT_CONNECT_ATTEMPTS,
+    )
+    parser.add_argument(
+        "--keep-alive",
+        type=float,
+        default=DEFAULT_KEEP_ALIVE,
+        help="Seconds to keep idle connections open between polls, disconnects if not set",
+    )
+    parser.add_argument(
+        "--scan-timeout", type=float, default=DEFAULT_SCAN_TIMEOUT,
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help="Seconds between polls of sensors updated on read",
+    )
+    parser.add_argument(
+        "--rediscover-interval",
+        type=float,
+        default=DEFAULT_REDISCOVER_INTERVAL,
+        help="Seconds between looking for devices that have not been found",
+    )
+    parser.add_argument(
+        "--identity-registry", help="File to persist the identified devices in",
+    )
+    parser.add_argument(
+        "--handle-cache", help="File to persist the characteristic handles in",
+    )
+    parser.add_argument(
+        "--exporter-port",
+        type=int,
+        help="Serve the measurements as Prometheus metrics on this port, e.g. {}".format(
+            DEFAULT_EXPORTER_PORT
+        ),
+    )
+    parser.add_argument(
+        "--exporter-host",
+        default=DEFAULT_EXPORTER_HOST,
+        help="Address to serve the Prometheus metrics on, all interfaces if not set",
+    )
+    parser.add_argument(
+        "--history-dir",
+        help="Directory to keep a history of the measurements of every device in",
+    )
+    parser.add_argument(
+        "--history-capacity",
+        type=int,
+        default=DEFAULT_HISTORY_CAPACITY,
+        help="Samples kept per device in the history",
+    )
+    parser.add_argument(
+        "--record-payloads",
+        help="File to append every raw value read to, to replay it later",
+    )
+    parser.add_argument("-v", "--verbose", action="count", default=0)
+    args = parser.parse_args(argv)
+    if args.fleet is not None:
+        try:
+            load_fleet(args.fleet)
+        except InvalidFleetFileException as e:
+            parser.error(str(e))
+
+    logging.basicConfig(
+        level=[logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)],
+        stream=sys.stderr,
+    )
+
+    if args.identity_registry:
+        set_identity_registry(IdentityRegistry(path=args.identity_registry))
+    if args.handle_cache:
+        set_handle_cache(CharacteristicHandleCache(path=args.handle_cache))
+    payload_recorder = None
+    if args.record_payloads:
+        payload_recorder = PayloadRecorder(args.record_payloads)
+        set_payload_recorder(payload_recorder)
+
+    exporter = None
+    if args.exporter_port is not None:
+        exporter = MetricsExporter(host=args.exporter_host, port=args.exporter_port)
+        exporter.start()
+
+    history_store = None
+    if args.history_dir:
+        history_store = HistoryStore(args.history_dir, capacity=args.history_capacity)
+
+    collector = Collector(
+        fleet_path=args.fleet,
+        on_measurement=_print_measurement,
+        iface=args.iface,
+        address_type=args.address_type,
+        connect_attempts=args.connect_attempts,
+        keep_alive=args.keep_alive,
+        scan_timeout=args.scan_timeout,
+        poll_interval=args.poll_interval,
+        rediscover_interval=args.rediscover_interval,
+        metrics_store=exporter.store if exporter is not None else None,
+        history_store=history_store,
+    )
+    collector.install_signal_handlers()
+    try:
+        collector.run()
+    finally:
+        if exporter is not None:
+            exporter.stop()
+        if history_store is not None:
+            history_store.close()
+        if payload_recorder is not None:
+            set_payload_recorder(None)
+            payload_recorder.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
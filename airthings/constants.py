@@ -2,6 +2,7 @@
 DEVICE_MODEL_NUMBER_LENGTH = 4
 
 DEFAULT_BLUETOOTH_INTERFACE = 0  # 0 is hci0, 1 is hci1, etc.
+BLUETOOTH_SYSFS_PATH = "/sys/class/bluetooth"  # Lists the local hci adapters
 BLUETOOTH_ADDRESS_TYPE_PUBLIC = "public"  # Same as bluepy.btle.ADDR_TYPE_PUBLIC
 BLUETOOTH_ADDRESS_TYPE_RANDOM = "random"  # Same as bluepy.btle.ADDR_TYPE_RANDOM
 DEFAULT_BLUETOOTH_ADDRESS_TYPE = BLUETOOTH_ADDRESS_TYPE_PUBLIC
@@ -11,16 +12,35 @@ DEFAULT_BEFORE_FETCH_SLEEP = 3  # seconds
 DEFAULT_CONNECT_ATTEMPTS = 6  # Times
 DEFAULT_RECONNECT_SLEEP = 5  # Seconds
 DEFAULT_NEXT_CONNECT_SLEEP = 0.5  # Seconds
+DEFAULT_KEEP_ALIVE = None  # Seconds to keep an idle connection open, None disconnects
+DEVICE_CONNECTION_STATE_DISCONNECTED = "disconnected"
+DEVICE_CONNECTION_STATE_CONNECTING = "connecting"
+DEVICE_CONNECTION_STATE_CONNECTED = "connected"
 
 # Fetch
 DEFAULT_FETCH_ATTEMPTS = 3  # Times
 DEFAULT_REFETCH_SLEEP = 5  # Seconds
+DEFAULT_MAX_CONCURRENT_FETCHES = 1  # Devices fetched at the same time (asyncio)
 DEFAULT_NEXT_CONNECT_SLEEP = 0.5  # Seconds
 
 # Scan
 DEFAULT_SCAN_ATTEMPTS = 5  # Times
 DEFAULT_SCAN_TIMEOUT = 3  # Seconds
 DEFAULT_RESCAN_SLEEP = 1  # Seconds
+DEFAULT_SCAN_PROCESS_INTERVAL = 0.1  # Seconds between handing over discovered devices
+
+# Schedule
+SENSOR_UPDATE_INTERVAL_ON_READ = (
+    0  # Seconds, the sensor is updated every time it is read
+)
+SENSOR_UPDATE_INTERVAL_5_MINUTES = 300  # Seconds
+SENSOR_UPDATE_INTERVAL_1_HOUR = 3600  # Seconds
+DEFAULT_POLL_INTERVAL = (
+    300  # Seconds, for sensors updated on read or at an unknown interval
+)
+DEFAULT_SCHEDULE_MARGIN = 5  # Seconds to wait after an expected sensor update
+DEFAULT_SCHEDULE_RETRY_SLEEP = 60  # Seconds before polling a failed device again
+DEFAULT_REDISCOVER_INTERVAL = 300  # Seconds between looking for devices not found yet
 
 # Alarm rules
 ALARM_OPERATOR_EQUAL = "equal"
@@ -29,6 +49,7 @@ ALARM_OPERATOR_GREATER_THAN = "greater_than"
 ALARM_OPERATOR_LESS_THAN = "less_than"
 ALARM_OPERATOR_GREATER_THAN_OR_EQUAL = "greater_than_or_equal"
 ALARM_OPERATOR_LESS_THAN_OR_EQUAL = "less_than_or_equal"
+ALARM_CACHE_SIZE = 4096  # Alarms kept per compiled rule list, shared by equal values
 
 # Alarm severity levels
 ALARM_SEVERITY_HIGH = "high"
@@ -75,6 +96,15 @@ ALARM_SEVERITY_MAPPING = {
         "color": ALARM_SEVERITY_UNKNOWN_COLOR,
     },
 }
+# Severity codes of batch evaluations, the index of the severity
+ALARM_SEVERITY_CODES = (
+    ALARM_SEVERITY_UNKNOWN,
+    ALARM_SEVERITY_NONE,
+    ALARM_SEVERITY_CAUTION,
+    ALARM_SEVERITY_LOW,
+    ALARM_SEVERITY_MEDIUM,
+    ALARM_SEVERITY_HIGH,
+)
 
 # Sensors
 ## Humidity
@@ -244,3 +274,48 @@ WAVE_GEN_2_LABEL = "Wave Gen 2"
 WAVE_GEN_2_MODEL_NUMBER = "2950"
 WAVE_GEN_2_RAW_DATA_FORMAT = "<4B8H"
 WAVE_GEN_2_UUID_DATA = "b42e4dcc-ade7-11e4-89d3-123b93f75cba"
+
+# Exporter
+DEFAULT_EXPORTER_HOST = ""  # All interfaces
+DEFAULT_EXPORTER_PORT = 9743
+EXPORTER_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+EXPORTER_SENSOR_METRIC_NAMES = {
+    SENSOR_HUMIDITY_KEY: "airthings_humidity_percent",
+    SENSOR_RADON_SHORT_TERM_AVG_KEY: "airthings_radon_short_term_avg_becquerels_per_cubic_meter",
+    SENSOR_RADON_LONG_TERM_AVG_KEY: "airthings_radon_long_term_avg_becquerels_per_cubic_meter",
+    SENSOR_TEMPERATURE_KEY: "airthings_temperature_celsius",
+    SENSOR_ATMOSPHERIC_PRESSURE_KEY: "airthings_atmospheric_pressure_hectopascals",
+    SENSOR_CO2_KEY: "airthings_co2_ppm",
+    SENSOR_VOC_KEY: "airthings_voc_ppb",
+}
+
+# History
+DEFAULT_HISTORY_CAPACITY = 8064  # 4 weeks of samples every 5 minutes
+HISTORY_FILE_MAGIC = b"ATHS"
+HISTORY_FILE_VERSION = 1
+HISTORY_HEADER_SIZE = 64
+HISTORY_TIMESTAMP_COLUMN = "timestamp"
+HISTORY_COLUMNS = (
+    HISTORY_TIMESTAMP_COLUMN,
+    SENSOR_HUMIDITY_KEY,
+    SENSOR_RADON_SHORT_TERM_AVG_KEY,
+    SENSOR_RADON_LONG_TERM_AVG_KEY,
+    SENSOR_TEMPERATURE_KEY,
+    SENSOR_ATMOSPHERIC_PRESSURE_KEY,
+    SENSOR_CO2_KEY,
+    SENSOR_VOC_KEY,
+)
+
+# Payload log
+PAYLOAD_LOG_MAGIC = b"ATPL"
+PAYLOAD_LOG_VERSION = 1
+
+# What the clock of the backend sleeps for
+SLEEP_RESCAN = "rescan_sleep"
+SLEEP_RECONNECT = "reconnect_sleep"
+SLEEP_REFETCH = "refetch_sleep"
+SLEEP_BEFORE_FETCH = "before_fetch_sleep"
+SLEEP_NEXT_CONNECT = "next_connect_sleep"
+SLEEP_SCAN = "scan"  # Simulated scan time
+SLEEP_CONNECT = "connect"  # Simulated connect latency
+SLEEP_READ = "read"  # Simulated characteristic read latency
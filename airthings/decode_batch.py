@@ -0,0 +1,130 @@
+"""
+Decoding of recorded raw data with NumPy, e.g. when re-decoding an archive of payloads.
+
+The RAW_DATA_FORMAT of a model is mapped to a structured dtype, so a contiguous buffer of
+payloads is decoded with a single frombuffer, and the SENSOR_DECODERS scaling of the model
+is applied per column instead of per payload.
+Requires NumPy, installed with the numpy extra (pip install airthings[numpy]).
+"""
+import re
+import struct
+
+from .devices.utils import (
+    RADON_DATA_MAX,
+    RADON_DATA_MIN,
+    parse_kelvin_temperature_data,
+    parse_radon_data,
+)
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError(
+        "airthings.decode_batch requires NumPy, install it with: pip install airthings[numpy]"
+    ) from e
+
+
+_BYTE_ORDERS = {"<": "<", ">": ">", "!": ">", "=": "=", "@": "="}
+_FORMAT_TOKEN = re.compile(r"(\d*)([xbBhHiIlLqQefd])")
+
+_dtypes = {}
+
+
+def _parse_radon_columns(radon_data):
+    """
+    Same as parse_radon_data, values out of range are NaN instead of None
+    """
+    radon_data = radon_data.astype(np.float64)
+    radon_data[(radon_data < RADON_DATA_MIN) | (radon_data > RADON_DATA_MAX)] = np.nan
+    return radon_data
+
+
+def _parse_kelvin_temperature_columns(temperature_data):
+    """
+    Same as parse_kelvin_temperature_data
+    """
+    return np.round(temperature_data / 100.0 - 273.15, 2)
+
+
+# Scaling functions that do not work on arrays as they are
+_COLUMN_SCALES = {
+    parse_kelvin_temperature_data: _parse_kelvin_temperature_columns,
+    parse_radon_data: _parse_radon_columns,
+}
+
+
+def raw_data_dtype(raw_data_format):
+    """
+    The structured dtype of a struct format, with a field per value (f0, f1, ...) at the
+    same offsets as struct
+    """
+    dtype = _dtypes.get(raw_data_format)
+    if dtype is not None:
+        return dtype
+
+    prefix = raw_data_format[0] if raw_data_format[0] in _BYTE_ORDERS else "@"
+    codes = (
+        raw_data_format[1:] if raw_data_format[0] in _BYTE_ORDERS else raw_data_format
+    )
+    names, formats, offsets = [], [], []
+    layout = prefix
+    for count, code in _FORMAT_TOKEN.findall(codes):
+        for _ in range(int(count) if count else 1):
+            if code == "x":
+                layout += code
+                continue
+            size = struct.calcsize(prefix + code)
+            # The offset struct gives the value, including the alignment of native formats
+            offsets.append(struct.calcsize(layout + code) - size)
+            layout += code
+            names.append("f{}".format(len(names)))
+            if code in "efd":
+                kind = "f"
+            elif code.isupper():
+                kind = "u"
+            else:
+                kind = "i"
+            formats.append("{}{}{}".format(_BYTE_ORDERS[prefix], kind, size))
+
+    if struct.calcsize(layout) != struct.calcsize(raw_data_format):
+        raise ValueError("Unsupported raw data format: {}".format(raw_data_format))
+
+    dtype = np.dtype(
+        {
+            "names": names,
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": struct.calcsize(raw_data_format),
+        }
+    )
+    _dtypes[raw_data_format] = dtype
+    return dtype
+
+
+def parse_raw_data(device_class, buffer, count=-1, offset=0):
+    """
+    The structured array of count payloads of device_class (every payload if -1) in buffer,
+    a bytes-like object of back to back payloads, without copying it
+    """
+    return np.frombuffer(
+        buffer,
+        dtype=raw_data_dtype(device_class.RAW_DATA_FORMAT),
+        count=count,
+        offset=offset,
+    )
+
+
+def decode_raw_data(device_class, buffer, count=-1, offset=0):
+    """
+    The value of every sensor of device_class per key, as arrays with a value per payload
+    in buffer (see parse_raw_data), scaled like the sensors of a device.
+    Radon values out of range are NaN.
+    """
+    data = parse_raw_data(device_class, buffer, count=count, offset=offset)
+    columns = {}
+    for key, (sensor_class, index, scale) in device_class.SENSOR_DECODERS.items():
+        column = data["f{}".format(index)]
+        if scale is not None:
+            column = _COLUMN_SCALES.get(scale, scale)(column)
+        columns[key] = column
+    return columns
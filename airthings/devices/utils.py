@@ -1,2 +1,13 @@
+RADON_DATA_MIN = 0
+RADON_DATA_MAX = 16383
+
+
 def parse_radon_data(radon_data):
-    return radon_data if 0 <= radon_data <= 16383 else None
+    return radon_data if RADON_DATA_MIN <= radon_data <= RADON_DATA_MAX else None
+
+
+def parse_kelvin_temperature_data(temperature_data):
+    """
+    Temperature in °C from hundredths of a Kelvin
+    """
+    return round(temperature_data / 100.0 - 273.15, 2)
@@ -1,3 +1,5 @@
+import struct
+
 import bluepy.btle as btle
 
 from airthings.constants import (
@@ -7,6 +9,8 @@ from airthings.constants import (
     SENSOR_RADON_LONG_TERM_AVG_KEY,
     SENSOR_RADON_SHORT_TERM_AVG_KEY,
     SENSOR_TEMPERATURE_KEY,
+    SENSOR_UPDATE_INTERVAL_1_HOUR,
+    SENSOR_UPDATE_INTERVAL_ON_READ,
     SENSOR_VOC_KEY,
     WAVE_GEN_1_KEY,
     WAVE_GEN_1_LABEL,
@@ -38,15 +42,25 @@ class WaveGen1(Device):
     Radon measurements are updated once every hour.
     """
 
+    __slots__ = ()
+
     KEY = WAVE_GEN_1_KEY
     MODEL_NUMBER = WAVE_GEN_1_MODEL_NUMBER
     LABEL = WAVE_GEN_1_LABEL
     RAW_DATA_FORMAT = WAVE_GEN_1_RAW_DATA_FORMAT
+    RAW_DATA_STRUCT = struct.Struct(WAVE_GEN_1_RAW_DATA_FORMAT)
     UUID_DATETIME = btle.UUID(WAVE_GEN_1_UUID_DATETIME)
     UUID_HUMIDITY = btle.UUID(WAVE_GEN_1_UUID_HUMIDITY)
     UUID_TEMPERATURE = btle.UUID(WAVE_GEN_1_UUID_TEMPERATURE)
     UUID_RADON_STA = btle.UUID(WAVE_GEN_1_UUID_RADON_SHORT_TERM_AVERAGE)
     UUID_RADON_LTA = btle.UUID(WAVE_GEN_1_UUID_RADON_LONG_TERM_AVERAGE)
+    RAW_DATA_UUIDS = (
+        UUID_DATETIME,
+        UUID_HUMIDITY,
+        UUID_TEMPERATURE,
+        UUID_RADON_STA,
+        UUID_RADON_LTA,
+    )
     SENSOR_CAPABILITIES = {
         SENSOR_HUMIDITY_KEY: True,
         SENSOR_RADON_SHORT_TERM_AVG_KEY: True,
@@ -56,23 +70,23 @@ class WaveGen1(Device):
         SENSOR_CO2_KEY: False,
         SENSOR_VOC_KEY: False,
     }
-
-    def _fetch_raw_data(self, connect_retries=3):
-        self._connect(connect_retries)
-        raw_data = self._fetch_characteristic(self.UUID_DATETIME)
-        raw_data += self._fetch_characteristic(self.UUID_HUMIDITY)
-        raw_data += self._fetch_characteristic(self.UUID_TEMPERATURE)
-        raw_data += self._fetch_characteristic(self.UUID_RADON_STA)
-        raw_data += self._fetch_characteristic(self.UUID_RADON_LTA)
-        self._disconnect()
-        return raw_data
-
-    def _parse_data(self, data):
-        self._measurements[SENSOR_HUMIDITY_KEY] = HumiditySensor(data[6] / 100.0)
-        self._measurements[SENSOR_TEMPERATURE_KEY] = TemperatureSensor(data[7] / 100.0)
-        self._measurements[
-            SENSOR_RADON_SHORT_TERM_AVG_KEY
-        ] = RadonShortTermAverageSensor(parse_radon_data(data[8]))
-        self._measurements[SENSOR_RADON_LONG_TERM_AVG_KEY] = RadonLongTermAverageSensor(
-            parse_radon_data(data[9])
-        )
+    SENSOR_UPDATE_INTERVALS = {
+        SENSOR_HUMIDITY_KEY: SENSOR_UPDATE_INTERVAL_ON_READ,
+        SENSOR_RADON_SHORT_TERM_AVG_KEY: SENSOR_UPDATE_INTERVAL_1_HOUR,
+        SENSOR_RADON_LONG_TERM_AVG_KEY: SENSOR_UPDATE_INTERVAL_1_HOUR,
+        SENSOR_TEMPERATURE_KEY: SENSOR_UPDATE_INTERVAL_ON_READ,
+    }
+    SENSOR_DECODERS = {
+        SENSOR_HUMIDITY_KEY: (HumiditySensor, 6, lambda value: value / 100.0),
+        SENSOR_TEMPERATURE_KEY: (TemperatureSensor, 7, lambda value: value / 100.0),
+        SENSOR_RADON_SHORT_TERM_AVG_KEY: (
+            RadonShortTermAverageSensor,
+            8,
+            parse_radon_data,
+        ),
+        SENSOR_RADON_LONG_TERM_AVG_KEY: (
+            RadonLongTermAverageSensor,
+            9,
+            parse_radon_data,
+        ),
+    }
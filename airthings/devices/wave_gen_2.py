@@ -1,3 +1,5 @@
+import struct
+
 import bluepy.btle as btle
 
 from airthings.constants import (
@@ -7,6 +9,8 @@ from airthings.constants import (
     SENSOR_RADON_LONG_TERM_AVG_KEY,
     SENSOR_RADON_SHORT_TERM_AVG_KEY,
     SENSOR_TEMPERATURE_KEY,
+    SENSOR_UPDATE_INTERVAL_1_HOUR,
+    SENSOR_UPDATE_INTERVAL_5_MINUTES,
     SENSOR_VOC_KEY,
     WAVE_GEN_2_KEY,
     WAVE_GEN_2_LABEL,
@@ -34,11 +38,15 @@ class WaveGen2(Device):
     Radon measurements are updated once every hour.
     """
 
+    __slots__ = ()
+
     KEY = WAVE_GEN_2_KEY
     MODEL_NUMBER = WAVE_GEN_2_MODEL_NUMBER
     LABEL = WAVE_GEN_2_LABEL
     RAW_DATA_FORMAT = WAVE_GEN_2_RAW_DATA_FORMAT
+    RAW_DATA_STRUCT = struct.Struct(WAVE_GEN_2_RAW_DATA_FORMAT)
     DATA_UUID = btle.UUID(WAVE_GEN_2_UUID_DATA)
+    RAW_DATA_UUIDS = (DATA_UUID,)
     SENSOR_CAPABILITIES = {
         SENSOR_HUMIDITY_KEY: True,
         SENSOR_RADON_SHORT_TERM_AVG_KEY: True,
@@ -48,13 +56,23 @@ class WaveGen2(Device):
         SENSOR_CO2_KEY: False,
         SENSOR_VOC_KEY: False,
     }
-
-    def _parse_data(self, data):
-        self._measurements[SENSOR_HUMIDITY_KEY] = HumiditySensor(data[1] / 2.0)
-        self._measurements[
-            SENSOR_RADON_SHORT_TERM_AVG_KEY
-        ] = RadonShortTermAverageSensor(parse_radon_data(data[4]))
-        self._measurements[SENSOR_RADON_LONG_TERM_AVG_KEY] = RadonLongTermAverageSensor(
-            parse_radon_data(data[5])
-        )
-        self._measurements[SENSOR_TEMPERATURE_KEY] = TemperatureSensor(data[6] / 100.0)
+    SENSOR_UPDATE_INTERVALS = {
+        SENSOR_HUMIDITY_KEY: SENSOR_UPDATE_INTERVAL_5_MINUTES,
+        SENSOR_RADON_SHORT_TERM_AVG_KEY: SENSOR_UPDATE_INTERVAL_1_HOUR,
+        SENSOR_RADON_LONG_TERM_AVG_KEY: SENSOR_UPDATE_INTERVAL_1_HOUR,
+        SENSOR_TEMPERATURE_KEY: SENSOR_UPDATE_INTERVAL_5_MINUTES,
+    }
+    SENSOR_DECODERS = {
+        SENSOR_HUMIDITY_KEY: (HumiditySensor, 1, lambda value: value / 2.0),
+        SENSOR_RADON_SHORT_TERM_AVG_KEY: (
+            RadonShortTermAverageSensor,
+            4,
+            parse_radon_data,
+        ),
+        SENSOR_RADON_LONG_TERM_AVG_KEY: (
+            RadonLongTermAverageSensor,
+            5,
+            parse_radon_data,
+        ),
+        SENSOR_TEMPERATURE_KEY: (TemperatureSensor, 6, lambda value: value / 100.0),
+    }
@@ -1,3 +1,5 @@
+import struct
+
 import bluepy.btle as btle
 
 from airthings.constants import (
@@ -7,6 +9,7 @@ from airthings.constants import (
     SENSOR_RADON_LONG_TERM_AVG_KEY,
     SENSOR_RADON_SHORT_TERM_AVG_KEY,
     SENSOR_TEMPERATURE_KEY,
+    SENSOR_UPDATE_INTERVAL_5_MINUTES,
     SENSOR_VOC_KEY,
     WAVE_MINI_GEN_1_KEY,
     WAVE_MINI_GEN_1_LABEL,
@@ -22,7 +25,7 @@ from airthings.sensors import (
     VOCSensor,
 )
 
-from .utils import parse_radon_data
+from .utils import parse_kelvin_temperature_data, parse_radon_data
 
 
 class WaveMiniGen1(Device):
@@ -30,11 +33,15 @@ class WaveMiniGen1(Device):
     Sensor values are updated every 5 minutes.
     """
 
+    __slots__ = ()
+
     KEY = WAVE_MINI_GEN_1_KEY
     MODEL_NUMBER = WAVE_MINI_GEN_1_MODEL_NUMBER
     LABEL = WAVE_MINI_GEN_1_LABEL
     RAW_DATA_FORMAT = WAVE_MINI_GEN_1_RAW_DATA_FORMAT
+    RAW_DATA_STRUCT = struct.Struct(WAVE_MINI_GEN_1_RAW_DATA_FORMAT)
     DATA_UUID = btle.UUID(WAVE_MINI_GEN_1_UUID_DATA)
+    RAW_DATA_UUIDS = (DATA_UUID,)
     SENSOR_CAPABILITIES = {
         SENSOR_HUMIDITY_KEY: True,
         SENSOR_RADON_SHORT_TERM_AVG_KEY: False,
@@ -44,10 +51,13 @@ class WaveMiniGen1(Device):
         SENSOR_CO2_KEY: False,
         SENSOR_VOC_KEY: True,
     }
-
-    def _parse_data(self, data):
-        self._measurements[SENSOR_TEMPERATURE_KEY] = TemperatureSensor(
-            round(data[1] / 100.0 - 273.15, 2)
-        )
-        self._measurements[SENSOR_HUMIDITY_KEY] = HumiditySensor(data[3] / 100.0)
-        self._measurements[SENSOR_VOC_KEY] = VOCSensor(data[4])
+    SENSOR_UPDATE_INTERVALS = {
+        SENSOR_HUMIDITY_KEY: SENSOR_UPDATE_INTERVAL_5_MINUTES,
+        SENSOR_TEMPERATURE_KEY: SENSOR_UPDATE_INTERVAL_5_MINUTES,
+        SENSOR_VOC_KEY: SENSOR_UPDATE_INTERVAL_5_MINUTES,
+    }
+    SENSOR_DECODERS = {
+        SENSOR_TEMPERATURE_KEY: (TemperatureSensor, 1, parse_kelvin_temperature_data),
+        SENSOR_HUMIDITY_KEY: (HumiditySensor, 3, lambda value: value / 100.0),
+        SENSOR_VOC_KEY: (VOCSensor, 4, None),
+    }
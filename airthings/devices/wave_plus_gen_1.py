@@ -9,6 +9,8 @@ from airthings.constants import (
     SENSOR_RADON_LONG_TERM_AVG_KEY,
     SENSOR_RADON_SHORT_TERM_AVG_KEY,
     SENSOR_TEMPERATURE_KEY,
+    SENSOR_UPDATE_INTERVAL_1_HOUR,
+    SENSOR_UPDATE_INTERVAL_5_MINUTES,
     SENSOR_VOC_KEY,
     WAVE_PLUS_GEN_1_KEY,
     WAVE_PLUS_GEN_1_LABEL,
@@ -35,11 +37,15 @@ class WavePlusGen1(Device):
     Except for the radon measurements, the Wave Plus updates its current sensor values once every 5 minutes. Radon measurements are updated once every hour.
     """
 
+    __slots__ = ()
+
     KEY = WAVE_PLUS_GEN_1_KEY
     MODEL_NUMBER = WAVE_PLUS_GEN_1_MODEL_NUMBER
     LABEL = WAVE_PLUS_GEN_1_LABEL
     RAW_DATA_FORMAT = WAVE_PLUS_GEN_1_RAW_DATA_FORMAT
+    RAW_DATA_STRUCT = struct.Struct(WAVE_PLUS_GEN_1_RAW_DATA_FORMAT)
     DATA_UUID = btle.UUID(WAVE_PLUS_GEN_1_UUID_DATA)
+    RAW_DATA_UUIDS = (DATA_UUID,)
     SENSOR_CAPABILITIES = {
         SENSOR_HUMIDITY_KEY: True,
         SENSOR_RADON_SHORT_TERM_AVG_KEY: True,
@@ -49,18 +55,33 @@ class WavePlusGen1(Device):
         SENSOR_CO2_KEY: True,
         SENSOR_VOC_KEY: True,
     }
-
-    def _parse_data(self, data):
-        self._measurements[SENSOR_HUMIDITY_KEY] = HumiditySensor(data[1] / 2.0)
-        self._measurements[
-            SENSOR_RADON_SHORT_TERM_AVG_KEY
-        ] = RadonShortTermAverageSensor(parse_radon_data(data[4]))
-        self._measurements[SENSOR_RADON_LONG_TERM_AVG_KEY] = RadonLongTermAverageSensor(
-            parse_radon_data(data[5])
-        )
-        self._measurements[SENSOR_TEMPERATURE_KEY] = TemperatureSensor(data[6] / 100.0)
-        self._measurements[SENSOR_ATMOSPHERIC_PRESSURE_KEY] = AtmosphericPressureSensor(
-            data[7] / 50.0
-        )
-        self._measurements[SENSOR_CO2_KEY] = CO2Sensor(data[8] * 1.0)
-        self._measurements[SENSOR_VOC_KEY] = VOCSensor(data[9] * 1.0)
+    SENSOR_UPDATE_INTERVALS = {
+        SENSOR_HUMIDITY_KEY: SENSOR_UPDATE_INTERVAL_5_MINUTES,
+        SENSOR_RADON_SHORT_TERM_AVG_KEY: SENSOR_UPDATE_INTERVAL_1_HOUR,
+        SENSOR_RADON_LONG_TERM_AVG_KEY: SENSOR_UPDATE_INTERVAL_1_HOUR,
+        SENSOR_TEMPERATURE_KEY: SENSOR_UPDATE_INTERVAL_5_MINUTES,
+        SENSOR_ATMOSPHERIC_PRESSURE_KEY: SENSOR_UPDATE_INTERVAL_5_MINUTES,
+        SENSOR_CO2_KEY: SENSOR_UPDATE_INTERVAL_5_MINUTES,
+        SENSOR_VOC_KEY: SENSOR_UPDATE_INTERVAL_5_MINUTES,
+    }
+    SENSOR_DECODERS = {
+        SENSOR_HUMIDITY_KEY: (HumiditySensor, 1, lambda value: value / 2.0),
+        SENSOR_RADON_SHORT_TERM_AVG_KEY: (
+            RadonShortTermAverageSensor,
+            4,
+            parse_radon_data,
+        ),
+        SENSOR_RADON_LONG_TERM_AVG_KEY: (
+            RadonLongTermAverageSensor,
+            5,
+            parse_radon_data,
+        ),
+        SENSOR_TEMPERATURE_KEY: (TemperatureSensor, 6, lambda value: value / 100.0),
+        SENSOR_ATMOSPHERIC_PRESSURE_KEY: (
+            AtmosphericPressureSensor,
+            7,
+            lambda value: value / 50.0,
+        ),
+        SENSOR_CO2_KEY: (CO2Sensor, 8, lambda value: value * 1.0),
+        SENSOR_VOC_KEY: (VOCSensor, 9, lambda value: value * 1.0),
+    }
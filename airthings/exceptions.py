@@ -48,3 +48,39 @@ class OutOfFetchAttemptsException(Exception):
                 fetch_attempts, refetch_sleep
             )
         )
+
+
+class InvalidFleetFileException(Exception):
+    def __init__(self, path):
+        super(InvalidFleetFileException, self).__init__(
+            "Could not load the fleet file {}, it must be a JSON object with mac_addresses and/or serial_numbers".format(
+                path
+            )
+        )
+
+
+class InvalidHistoryFileException(Exception):
+    def __init__(self, path):
+        super(InvalidHistoryFileException, self).__init__(
+            "Could not open the history file {}, it is not a history file of this version".format(
+                path
+            )
+        )
+
+
+class InvalidPayloadLogException(Exception):
+    def __init__(self, path):
+        super(InvalidPayloadLogException, self).__init__(
+            "Could not read the payload log {}, it is not a payload log of this version".format(
+                path
+            )
+        )
+
+
+class UnsupportedDuringReplayException(Exception):
+    def __init__(self, operation):
+        super(UnsupportedDuringReplayException, self).__init__(
+            "{} is not supported during a payload replay, payload logs only record characteristic reads".format(
+                operation
+            )
+        )
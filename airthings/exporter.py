@@ -0,0 +1,299 @@
+"""
+A Prometheus exporter serving the most recent measurements from memory.
+
+MetricsStore is updated with every FetchResult by a poller (e.g. the collector or a
+PollingScheduler), and renders the exposition text on update, so a scrape only hands
+over the already rendered text and never touches the radio.
+"""
+import http.server
+import logging
+import threading
+
+from .constants import (
+    ALARM_SEVERITY_MAPPING,
+    DEFAULT_EXPORTER_HOST,
+    DEFAULT_EXPORTER_PORT,
+    EXPORTER_CONTENT_TYPE,
+    EXPORTER_SENSOR_METRIC_NAMES,
+)
+from .models import Device
+from .sensors import SENSOR_CLASSES
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return ",".join(
+        '{}="{}"'.format(name, _escape(value)) for name, value in sorted(labels.items())
+    )
+
+
+class MetricsStore:
+    """
+    Keeps the metrics of the last FetchResult of every device, and their exposition text.
+    """
+
+    def __init__(self):
+        self._devices = {}
+        self._fetches = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+        self._rendered = self._render()
+
+    def __repr__(self):
+        return repr("<MetricsStore devices={}>".format(len(self._devices)))
+
+    def __len__(self):
+        return len(self._devices)
+
+    def record(self, result):
+        """
+        Record a FetchResult, the result of a failed fetch keeps the last measurements
+        """
+        mac_address = result.mac_address.lower()
+        with self._lock:
+            self._fetches[mac_address] = self._fetches.get(mac_address, 0) + 1
+            self._failures.setdefault(mac_address, 0)
+            if result.failed:
+                self._failures[mac_address] += 1
+
+            entry = self._devices.setdefault(mac_address, {"device": None})
+            if result.device is not None:
+                entry["device"] = result.device
+            entry["up"] = result.ok
+            entry["duration"] = result.duration
+            entry["attempts"] = result.attempts
+            self._rendered = self._render()
+
+    def remove(self, mac_address):
+        mac_address = mac_address.lower()
+        with self._lock:
+            self._devices.pop(mac_address, None)
+            self._fetches.pop(mac_address, None)
+            self._failures.pop(mac_address, None)
+            self._rendered = self._render()
+
+    def render(self):
+        """
+        The exposition text of every metric, as bytes
+        """
+        return self._rendered
+
+    def _device_labels(self, mac_address, device):
+        if device is None:
+            return {"mac_address": mac_address, "serial_number": "", "model": ""}
+        return {
+            "mac_address": mac_address,
+            "serial_number": device.serial_number,
+            "model": device.KEY,
+        }
+
+    def _render(self):
+        families = []
+
+        def family(name, metric_type, help_text, samples):
+            lines = [
+                "# HELP {} {}".format(name, help_text),
+                "# TYPE {} {}".format(name, metric_type),
+            ]
+            lines.extend(
+                "{}{{{}}} {}".format(name, _labels(labels), repr(float(value)))
+                for labels, value in samples
+            )
+            families.append("\n".join(lines))
+
+        devices = sorted(self._devices.items())
+
+        for key in Device.SENSOR_CAPABILITIES:
+            sensor_class = SENSOR_CLASSES[key]
+            samples = []
+            for mac_address, entry in devices:
+                device = entry["device"]
+                if device is None or key not in device.measurements:
+                    continue
+                value = device.measurements[key].value
+                if value is None:
+                    continue
+                samples.append((self._device_labels(mac_address, device), value))
+            family(
+                EXPORTER_SENSOR_METRIC_NAMES[key],
+                "gauge",
+                "{} ({})".format(sensor_class.LABEL, sensor_class.UNIT),
+                samples,
+            )
+
+        samples = []
+        for mac_address, entry in devices:
+            device = entry["device"]
+            if device is None:
+                continue
+            for key, sensor in device.measurements.items():
+                if sensor.current_alarm is None:
+                    continue
+                for severity in ALARM_SEVERITY_MAPPING:
+                    labels = self._device_labels(mac_address, device)
+                    labels.update({"sensor": key, "severity": severity})
+                    samples.append(
+                        (labels, 1 if sensor.current_alarm.severity == severity else 0)
+                    )
+        family(
+            "airthings_alarm_severity",
+            "gauge",
+            "1 for the current alarm severity of every sensor, 0 for the others",
+            samples,
+        )
+
+        family(
+            "airthings_measured_timestamp_seconds",
+            "gauge",
+            "When the measurements were read from the device",
+            [
+                (self._device_labels(mac_address, entry["device"]), measured_at)
+                for mac_address, entry in devices
+                if entry["device"] is not None
+                for measured_at in [entry["device"].measured_at]
+                if measured_at is not None
+            ],
+        )
+        family(
+            "airthings_up",
+            "gauge",
+            "1 if the last fetch succeeded, 0 if it failed",
+            [
+                (self._device_labels(mac_address, entry["device"]), int(entry["up"]))
+                for mac_address, entry in devices
+            ],
+        )
+        family(
+            "airthings_fetch_duration_seconds",
+            "gauge",
+            "Seconds spent on the last fetch, including retries",
+            [
+                (self._device_labels(mac_address, entry["device"]), entry["duration"])
+                for mac_address, entry in devices
+                if entry["duration"] is not None
+            ],
+        )
+        family(
+            "airthings_fetch_attempts",
+            "gauge",
+            "Attempts used by the last fetch",
+            [
+                (self._device_labels(mac_address, entry["device"]), entry["attempts"])
+                for mac_address, entry in devices
+            ],
+        )
+        family(
+            "airthings_fetches_total",
+            "counter",
+            "Fetches from the device",
+            [
+                (
+                    self._device_labels(mac_address, entry["device"]),
+                    self._fetches[mac_address],
+                )
+                for mac_address, entry in devices
+            ],
+        )
+        family(
+            "airthings_fetch_failures_total",
+            "counter",
+            "Failed fetches from the device",
+            [
+                (
+                    self._device_labels(mac_address, entry["device"]),
+                    self._failures[mac_address],
+                )
+                for mac_address, entry in devices
+            ],
+        )
+
+        return ("\n".join(families) + "\n").encode("utf-8")
+
+
+class _MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    store = None
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+
+        body = self.store.render()
+        self.send_response(200)
+        self.send_header("Content-Type", EXPORTER_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        _LOGGER.debug(format % args)
+
+
+class MetricsExporter:
+    """
+    Serves the metrics of a MetricsStore over HTTP on /metrics, from a background thread
+    """
+
+    def __init__(
+        self, store=None, host=DEFAULT_EXPORTER_HOST, port=DEFAULT_EXPORTER_PORT
+    ):
+        self._store = store if store is not None else MetricsStore()
+        self._host = host
+        self._port = port
+        self._server = None
+        self._thread = None
+
+    def __repr__(self):
+        return repr("<MetricsExporter host={} port={}>".format(self._host, self.port))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def store(self):
+        return self._store
+
+    @property
+    def port(self):
+        """
+        The port being served on, the actual one if started with port 0
+        """
+        if self._server is not None:
+            return self._server.server_address[1]
+        return self._port
+
+    def start(self):
+        handler = type(
+            "MetricsRequestHandler", (_MetricsRequestHandler,), {"store": self._store}
+        )
+        self._server = http.server.ThreadingHTTPServer(
+            (self._host, self._port), handler
+        )
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="airthings-exporter", daemon=True
+        )
+        self._thread.start()
+        _LOGGER.info(
+            "Serving Prometheus metrics on http://{}:{}/metrics".format(
+                self._host, self.port
+            )
+        )
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
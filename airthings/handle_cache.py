@@ -0,0 +1,99 @@
+import logging
+import threading
+
+import bluepy.btle as btle
+
+from .storage import load_json_file, save_json_file
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CharacteristicHandleCache:
+    """
+    Caches the GATT value handles of characteristics per MAC address and model number,
+    so characteristics can be read without discovering them first.
+    If path is set, the cache is loaded from and persisted to that file.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._handles = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            self._load()
+
+    def __repr__(self):
+        return repr(
+            "<CharacteristicHandleCache path={} handles={}>".format(
+                self._path, len(self._handles)
+            )
+        )
+
+    def __len__(self):
+        return len(self._handles)
+
+    @staticmethod
+    def _key(mac_address, model_number, uuid):
+        return "{}|{}|{}".format(
+            mac_address.lower(), model_number or "", btle.UUID(uuid)
+        )
+
+    def _load(self):
+        handles = load_json_file(self._path, default={})
+        self._handles = {key: int(handle) for key, handle in handles.items()}
+
+    def _save(self):
+        if self._path is not None:
+            save_json_file(self._path, self._handles)
+
+    def get(self, mac_address, model_number, uuid):
+        return self._handles.get(self._key(mac_address, model_number, uuid))
+
+    def set(self, mac_address, model_number, uuid, handle):
+        key = self._key(mac_address, model_number, uuid)
+        with self._lock:
+            if self._handles.get(key) == handle:
+                return
+            self._handles[key] = handle
+            self._save()
+
+    def invalidate(self, mac_address, model_number=None, uuid=None):
+        """
+        Forget a cached handle, or every handle of a MAC address if uuid is not set
+        """
+        with self._lock:
+            if uuid is not None:
+                self._handles.pop(self._key(mac_address, model_number, uuid), None)
+            else:
+                prefix = "{}|".format(mac_address.lower())
+                for key in [key for key in self._handles if key.startswith(prefix)]:
+                    del self._handles[key]
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._handles = {}
+            self._save()
+
+    @property
+    def path(self):
+        return self._path
+
+
+_handle_cache = CharacteristicHandleCache()
+
+
+def get_handle_cache():
+    """
+    The handle cache used when reading characteristics, None if disabled
+    """
+    return _handle_cache
+
+
+def set_handle_cache(handle_cache):
+    """
+    Replace the handle cache used when reading characteristics, e.g. with a persisted one:
+    set_handle_cache(CharacteristicHandleCache(path="handles.json")). None disables it.
+    """
+    global _handle_cache
+    _handle_cache = handle_cache
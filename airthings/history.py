@@ -0,0 +1,298 @@
+"""
+An on-disk history of sensor samples, as one memory-mapped ring buffer file per device.
+
+A file starts with a fixed size header, followed by one column per HISTORY_COLUMNS entry
+(the timestamp and every sensor key), each an array of capacity float64 values in native
+byte order. A sample is a row across the columns, missing sensors are stored as NaN.
+Appending a sample writes one value per column, and reading a window hands out memoryviews
+of the mapped columns, so no Python object is created per sample.
+"""
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+
+from .constants import (
+    DEFAULT_HISTORY_CAPACITY,
+    HISTORY_COLUMNS,
+    HISTORY_FILE_MAGIC,
+    HISTORY_FILE_VERSION,
+    HISTORY_HEADER_SIZE,
+    HISTORY_TIMESTAMP_COLUMN,
+)
+from .exceptions import InvalidHistoryFileException
+
+_LOGGER = logging.getLogger(__name__)
+
+# Magic, version, column count, capacity, head (the next index written) and count
+_HEADER = struct.Struct("<4sHHIQQ")
+_HEAD_OFFSET = 12
+_COUNTERS = struct.Struct("<QQ")
+_VALUE_SIZE = 8
+
+
+class DeviceHistory:
+    """
+    A ring buffer of the last capacity samples of a single device, mapped from path.
+    If the file exists, its own capacity is used.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_HISTORY_CAPACITY):
+        self._path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._mmap = None
+        self._columns = None
+        self._open(capacity)
+
+    def __repr__(self):
+        return repr(
+            "<DeviceHistory path={} samples={} capacity={}>".format(
+                self._path, self._count, self._capacity
+            )
+        )
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open(self, capacity):
+        exists = os.path.exists(self._path)
+        self._file = open(self._path, "r+b" if exists else "w+b")
+        if exists:
+            header = self._file.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                self._file.close()
+                raise InvalidHistoryFileException(self._path)
+            magic, version, column_count, capacity, head, count = _HEADER.unpack(header)
+            if (
+                magic != HISTORY_FILE_MAGIC
+                or version != HISTORY_FILE_VERSION
+                or column_count != len(HISTORY_COLUMNS)
+                or os.path.getsize(self._path) != self._file_size(capacity)
+            ):
+                self._file.close()
+                raise InvalidHistoryFileException(self._path)
+        else:
+            head, count = 0, 0
+            self._file.truncate(self._file_size(capacity))
+            self._file.write(
+                _HEADER.pack(
+                    HISTORY_FILE_MAGIC,
+                    HISTORY_FILE_VERSION,
+                    len(HISTORY_COLUMNS),
+                    capacity,
+                    head,
+                    count,
+                )
+            )
+            self._file.flush()
+
+        self._capacity = capacity
+        self._head = head
+        self._count = count
+        self._mmap = mmap.mmap(self._file.fileno(), self._file_size(capacity))
+        self._map_columns()
+
+    def _map_columns(self):
+        data = memoryview(self._mmap)
+        column_size = self._capacity * _VALUE_SIZE
+        self._columns = {
+            key: data[
+                HISTORY_HEADER_SIZE
+                + index * column_size : HISTORY_HEADER_SIZE
+                + (index + 1) * column_size
+            ].cast("d")
+            for index, key in enumerate(HISTORY_COLUMNS)
+        }
+
+    @staticmethod
+    def _file_size(capacity):
+        return HISTORY_HEADER_SIZE + len(HISTORY_COLUMNS) * capacity * _VALUE_SIZE
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def append(self, timestamp, values):
+        """
+        Append a sample, values maps sensor keys to their value, missing keys are stored as NaN.
+        The oldest sample is overwritten once the buffer is full.
+        """
+        with self._lock:
+            index = self._head
+            for key, column in self._columns.items():
+                if key == HISTORY_TIMESTAMP_COLUMN:
+                    column[index] = timestamp
+                else:
+                    value = values.get(key)
+                    column[index] = math.nan if value is None else value
+            self._head = (index + 1) % self._capacity
+            self._count = min(self._count + 1, self._capacity)
+            _COUNTERS.pack_into(self._mmap, _HEAD_OFFSET, self._head, self._count)
+
+    def append_device(self, device):
+        """
+        Append the measurements of a device, timestamped with when they were read
+        """
+        if not device.has_measurements:
+            return
+        self.append(device.measured_at, device.measurement_values)
+
+    def _count_since(self, since):
+        """
+        The number of most recent samples with a timestamp at or after since
+        """
+        timestamps = self._columns[HISTORY_TIMESTAMP_COLUMN]
+        oldest = self._head - self._count
+        lo, hi = 0, self._count
+        while lo < hi:
+            middle = (lo + hi) // 2
+            if timestamps[(oldest + middle) % self._capacity] < since:
+                lo = middle + 1
+            else:
+                hi = middle
+        return self._count - lo
+
+    def _segments(self, column, count):
+        start = (self._head - count) % self._capacity
+        end = start + count
+        if end <= self._capacity:
+            return [column[start:end]]
+        return [column[start:], column[: end - self._capacity]]
+
+    def window(self, last=None, since=None):
+        """
+        The most recent samples, either the last samples or the ones since a timestamp
+        (every sample if neither is set), oldest first.
+        Returns a list of memoryviews (of float64) per column key, two if the window wraps
+        around the end of the buffer. The memoryviews are views of the file: they are not
+        copied, and are overwritten as new samples are appended.
+        """
+        with self._lock:
+            count = self._count
+            if since is not None:
+                count = self._count_since(since)
+            if last is not None:
+                count = min(count, last)
+            return {
+                key: self._segments(column, count)
+                for key, column in self._columns.items()
+            }
+
+    def column(self, key, last=None, since=None):
+        """
+        Same as window, for a single column
+        """
+        return self.window(last=last, since=since)[key]
+
+    def latest(self):
+        """
+        The most recent sample as a dict per column key, None if there are no samples
+        """
+        if not self._count:
+            return None
+        index = (self._head - 1) % self._capacity
+        return {key: column[index] for key, column in self._columns.items()}
+
+    def flush(self):
+        self._mmap.flush()
+
+    def close(self):
+        """
+        Close the file, memoryviews handed out by window must have been released.
+        Raises BufferError, and stays open, while any of them is still alive.
+        """
+        if self._mmap is None:
+            return
+        try:
+            for column in self._columns.values():
+                column.release()
+            self._mmap.close()
+        except BufferError:
+            # The columns were (partly) released, map them again so the history stays usable
+            self._map_columns()
+            raise
+        self._columns = None
+        self._mmap = None
+        self._file.close()
+        self._file = None
+
+
+class HistoryStore:
+    """
+    A directory of DeviceHistory files, one per serial number
+    """
+
+    def __init__(self, directory, capacity=DEFAULT_HISTORY_CAPACITY):
+        self._directory = directory
+        self._capacity = capacity
+        self._histories = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self):
+        return repr(
+            "<HistoryStore directory={} devices={}>".format(
+                self._directory, len(self._histories)
+            )
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def serial_numbers(self):
+        return sorted(
+            filename[: -len(".history")]
+            for filename in os.listdir(self._directory)
+            if filename.endswith(".history")
+        )
+
+    def get(self, serial_number):
+        """
+        The DeviceHistory of a serial number, created if it does not exist
+        """
+        with self._lock:
+            history = self._histories.get(serial_number)
+            if history is None:
+                history = DeviceHistory(
+                    os.path.join(self._directory, "{}.history".format(serial_number)),
+                    capacity=self._capacity,
+                )
+                self._histories[serial_number] = history
+            return history
+
+    def record(self, device):
+        """
+        Append the measurements of a device to its history
+        """
+        self.get(device.serial_number).append_device(device)
+
+    def flush(self):
+        for history in list(self._histories.values()):
+            history.flush()
+
+    def close(self):
+        with self._lock:
+            for history in self._histories.values():
+                history.close()
+            self._histories = {}
@@ -0,0 +1,104 @@
+import logging
+import threading
+
+from .storage import load_json_file, save_json_file
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class IdentityRegistry:
+    """
+    Remembers which serial number (and therefore which model) a MAC address belongs to,
+    so devices can be created from a MAC address without connecting to identify them.
+    If path is set, the registry is loaded from and persisted to that file.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._serial_numbers = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            self._serial_numbers = load_json_file(path, default={})
+
+    def __repr__(self):
+        return repr(
+            "<IdentityRegistry path={} devices={}>".format(
+                self._path, len(self._serial_numbers)
+            )
+        )
+
+    def __len__(self):
+        return len(self._serial_numbers)
+
+    def __contains__(self, mac_address):
+        return mac_address.lower() in self._serial_numbers
+
+    def _save(self):
+        if self._path is not None:
+            save_json_file(self._path, self._serial_numbers)
+
+    def get(self, mac_address):
+        """
+        The serial number of a MAC address, None if it is unknown
+        """
+        return self._serial_numbers.get(mac_address.lower())
+
+    def record(self, mac_address, serial_number):
+        mac_address = mac_address.lower()
+        with self._lock:
+            previous_serial_number = self._serial_numbers.get(mac_address)
+            if previous_serial_number == serial_number:
+                return
+            if previous_serial_number is not None:
+                _LOGGER.warning(
+                    "MAC address {} changed from serial number {} to {}, refreshing its identity".format(
+                        mac_address, previous_serial_number, serial_number
+                    )
+                )
+            self._serial_numbers[mac_address] = serial_number
+            self._save()
+
+    def invalidate(self, mac_address):
+        with self._lock:
+            if self._serial_numbers.pop(mac_address.lower(), None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._serial_numbers = {}
+            self._save()
+
+    def create_device(self, mac_address):
+        """
+        Create the Airthings device of a MAC address, None if it is unknown
+        """
+        from .utils import determine_device_class_from_serial_number
+
+        serial_number = self.get(mac_address)
+        if serial_number is None:
+            return None
+        device_class = determine_device_class_from_serial_number(serial_number)
+        return device_class(mac_address, serial_number)
+
+    @property
+    def path(self):
+        return self._path
+
+
+_identity_registry = IdentityRegistry()
+
+
+def get_identity_registry():
+    """
+    The identity registry used when identifying devices, None if disabled
+    """
+    return _identity_registry
+
+
+def set_identity_registry(identity_registry):
+    """
+    Replace the identity registry used when identifying devices, e.g. with a persisted one:
+    set_identity_registry(IdentityRegistry(path="identities.json")). None disables it.
+    """
+    global _identity_registry
+    _identity_registry = identity_registry
@@ -0,0 +1,102 @@
+import threading
+
+
+class MeasurementCache:
+    """
+    Keeps the most recently fetched device per serial number, so its measurements can be served
+    without connecting to the device again until the device updates its sensors.
+    Devices can be looked up by serial number or by MAC address.
+    """
+
+    def __init__(self):
+        self._devices = {}
+        self._serial_numbers = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return repr("<MeasurementCache devices={}>".format(len(self._devices)))
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, serial_number):
+        return serial_number in self._devices
+
+    def record(self, device):
+        """
+        Remember device, it must have measurements
+        """
+        if not device.has_measurements:
+            return
+        with self._lock:
+            previous_device = self._devices.get(device.serial_number)
+            if previous_device is not None:
+                self._serial_numbers.pop(previous_device.mac_address.lower(), None)
+            self._devices[device.serial_number] = device
+            self._serial_numbers[device.mac_address.lower()] = device.serial_number
+
+    def get(self, serial_number, max_age=None):
+        """
+        The cached device of a serial number, None if it is unknown, its measurements are stale
+        (the device has updated its sensors since) or older than max_age seconds
+        """
+        device = self._devices.get(serial_number)
+        if device is None or device.is_stale:
+            return None
+        if max_age is not None and device.age > max_age:
+            return None
+        return device
+
+    def get_by_mac_address(self, mac_address, max_age=None):
+        """
+        Same as get, but by MAC address
+        """
+        serial_number = self._serial_numbers.get(mac_address.lower())
+        if serial_number is None:
+            return None
+        return self.get(serial_number, max_age=max_age)
+
+    def invalidate(self, serial_number):
+        with self._lock:
+            device = self._devices.pop(serial_number, None)
+            if device is not None:
+                self._serial_numbers.pop(device.mac_address.lower(), None)
+
+    def clear(self):
+        with self._lock:
+            self._devices = {}
+            self._serial_numbers = {}
+
+    @property
+    def devices(self):
+        return list(self._devices.values())
+
+
+_measurement_cache = MeasurementCache()
+
+
+def get_measurement_cache():
+    """
+    The measurement cache every fetched device is recorded in, None if disabled
+    """
+    return _measurement_cache
+
+
+def set_measurement_cache(measurement_cache):
+    """
+    Replace the measurement cache every fetched device is recorded in. None disables it.
+    """
+    global _measurement_cache
+    _measurement_cache = measurement_cache
+
+
+def get_cached_device(max_age, serial_number=None, mac_address=None):
+    """
+    The cached device of a serial number or MAC address, if its measurements are no older than
+    max_age seconds and not stale. None if max_age is not set or the cache is disabled.
+    """
+    if max_age is None or _measurement_cache is None:
+        return None
+    if serial_number is not None:
+        return _measurement_cache.get(serial_number, max_age=max_age)
+    return _measurement_cache.get_by_mac_address(mac_address, max_age=max_age)
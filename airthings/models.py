@@ -1,9 +1,10 @@
 import logging
 import struct
-import time
+import threading
 
 import bluepy.btle as btle
 
+from .backends import get_backend, get_clock
 from .constants import (
     ALARM_SEVERITY_MAPPING,
     ALARM_SEVERITY_NONE,
@@ -14,8 +15,12 @@ from .constants import (
     DEFAULT_BLUETOOTH_INTERFACE,
     DEFAULT_CONNECT_ATTEMPTS,
     DEFAULT_FETCH_ATTEMPTS,
+    DEFAULT_KEEP_ALIVE,
     DEFAULT_RECONNECT_SLEEP,
     DEFAULT_REFETCH_SLEEP,
+    DEVICE_CONNECTION_STATE_CONNECTED,
+    DEVICE_CONNECTION_STATE_CONNECTING,
+    DEVICE_CONNECTION_STATE_DISCONNECTED,
     DEVICE_MODEL_NUMBER_LENGTH,
     SENSOR_ATMOSPHERIC_PRESSURE_KEY,
     SENSOR_CO2_KEY,
@@ -24,24 +29,41 @@ from .constants import (
     SENSOR_RADON_SHORT_TERM_AVG_KEY,
     SENSOR_TEMPERATURE_KEY,
     SENSOR_VOC_KEY,
+    SLEEP_RECONNECT,
+    SLEEP_REFETCH,
 )
 from .exceptions import OutOfConnectAttemptsException, OutOfFetchAttemptsException
+from .measurement_cache import get_measurement_cache
 
 _LOGGER = logging.getLogger(__name__)
 
+# The device whose connection is kept alive, per lower case MAC address
+_kept_alive_devices = {}
+_kept_alive_devices_lock = threading.Lock()
+
+
+def get_kept_alive_device(mac_address):
+    """
+    The device whose connection to mac_address is kept alive (see Device.fetch_and_set_measurements),
+    None if there is none. Reusing it saves connecting to the MAC address again.
+    """
+    with _kept_alive_devices_lock:
+        return _kept_alive_devices.get(mac_address.lower())
+
 
 class Alarm:
+    __slots__ = ("_severity", "_value", "_rules", "_label", "_color")
+
     def __init__(self, severity, value, rules=None):
         self._severity = severity
         self._value = value
         self._rules = rules
 
         # Match the severity mapping and set color/label
-        for alarm_severity, alarm_info in ALARM_SEVERITY_MAPPING.items():
-            if alarm_severity == severity:
-                self._label = alarm_info["label"]
-                self._color = alarm_info["color"]
-                break
+        alarm_info = ALARM_SEVERITY_MAPPING.get(severity)
+        if alarm_info is not None:
+            self._label = alarm_info["label"]
+            self._color = alarm_info["color"]
         else:
             # TODO: raise exception?
             self._severity = ALARM_SEVERITY_UNKNOWN
@@ -76,7 +98,153 @@ class Alarm:
         return self.severity != ALARM_SEVERITY_NONE
 
 
+class DiscoveryResult:
+    def __init__(self, devices, missing):
+        self._devices = devices
+        self._missing = missing
+
+    def __repr__(self):
+        return repr(
+            "<DiscoveryResult devices={} missing={}>".format(
+                len(self._devices), self._missing
+            )
+        )
+
+    @property
+    def devices(self):
+        return self._devices
+
+    @property
+    def missing(self):
+        """
+        The MAC addresses or serial numbers that were not found before the scan timed out
+        """
+        return self._missing
+
+    @property
+    def is_complete(self):
+        return not self._missing
+
+
+class FetchResult:
+    """
+    The outcome of fetching measurements from a single device: either the device with its
+    measurements, or the exception that made it fail. Also records how many attempts were
+    used and how long it took.
+    """
+
+    def __init__(
+        self, mac_address, device=None, exception=None, attempts=0, duration=None
+    ):
+        self._mac_address = mac_address
+        self._device = device
+        self._exception = exception
+        self._attempts = attempts
+        self._duration = duration
+
+    def __repr__(self):
+        if self.failed:
+            return repr(
+                "<{} mac_address={} exception={!r} attempts={} duration={}>".format(
+                    type(self).__name__,
+                    self._mac_address,
+                    self._exception,
+                    self._attempts,
+                    self._duration,
+                )
+            )
+        return repr(
+            "<FetchResult mac_address={} attempts={} duration={}>".format(
+                self._mac_address, self._attempts, self._duration
+            )
+        )
+
+    @property
+    def mac_address(self):
+        return self._mac_address
+
+    @property
+    def device(self):
+        """
+        The device, None if it could not even be identified
+        """
+        return self._device
+
+    @property
+    def exception(self):
+        return self._exception
+
+    @property
+    def attempts(self):
+        return self._attempts
+
+    @property
+    def duration(self):
+        """
+        Seconds spent fetching, including the time slept between attempts
+        """
+        return self._duration
+
+    @property
+    def failed(self):
+        return self._exception is not None
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    @property
+    def measurements(self):
+        return self._device.measurements if self.ok else None
+
+
+class FetchFailure(FetchResult):
+    """
+    Stands in for a device whose measurements could not be fetched
+    """
+
+    def __init__(self, mac_address, exception, device=None, attempts=0, duration=None):
+        super(FetchFailure, self).__init__(
+            mac_address,
+            device=device,
+            exception=exception,
+            attempts=attempts,
+            duration=duration,
+        )
+
+    @property
+    def has_measurements(self):
+        return False
+
+
+class FetchResults(list):
+    """
+    The devices that were fetched successfully, in order. Every device's FetchResult,
+    including the failed ones, is available through results.
+    """
+
+    def __init__(self, results):
+        super(FetchResults, self).__init__(
+            result.device for result in results if result.ok
+        )
+        self._results = list(results)
+
+    @property
+    def results(self):
+        return self._results
+
+    @property
+    def failures(self):
+        return [result for result in self._results if result.failed]
+
+    @property
+    def has_failures(self):
+        return any(result.failed for result in self._results)
+
+
 class Sensor:
+    __slots__ = ("_value", "_current_alarm", "_measured_at", "_update_interval")
+
     KEY = None
     LABEL = None
     UNIT = None
@@ -87,6 +255,8 @@ class Sensor:
 
         self._value = value
         self._current_alarm = determine_alarm_severity(self.ALARM_RULES, value)
+        self._measured_at = None
+        self._update_interval = None
 
     def __repr__(self):
         return repr("{} {}".format(self._value, self.unit))
@@ -126,12 +296,84 @@ class Sensor:
     def value(self):
         return self._value
 
+    def _set_measured_at(self, measured_at, update_interval):
+        self._measured_at = measured_at
+        self._update_interval = update_interval
+
+    @property
+    def measured_at(self):
+        """
+        When the value was read from the device (get_clock().time()), None if unknown
+        """
+        return self._measured_at
+
+    @property
+    def age(self):
+        """
+        Seconds since the value was read from the device, None if unknown
+        """
+        if self._measured_at is None:
+            return None
+        return get_clock().time() - self._measured_at
+
+    @property
+    def update_interval(self):
+        """
+        Seconds between updates of the sensor on the device, None if unknown
+        """
+        return self._update_interval
+
+    @property
+    def expires_at(self):
+        """
+        When the device has updated the sensor since the value was read, None if unknown
+        """
+        if self._measured_at is None or self._update_interval is None:
+            return None
+        return self._measured_at + self._update_interval
+
+    @property
+    def is_stale(self):
+        """
+        True if the device might have updated the sensor since the value was read
+        """
+        expires_at = self.expires_at
+        return expires_at is None or get_clock().time() >= expires_at
+
 
 class Device:
+    __slots__ = (
+        "_mac_address",
+        "_serial_number",
+        "_identifier",
+        "_measurements",
+        "_has_measurements",
+        "_data",
+        "_measured_at",
+        "_debug_information",
+        "_has_debug_information",
+        "_peripheral",
+        "_connection_state",
+        "_connection_statistics",
+        "_connect_attempts",
+        "_reconnect_sleep",
+        "_fetch_attempts",
+        "_refetch_sleep",
+        "_iface",
+        "_address_type",
+        "_keep_alive",
+        "_last_used",
+        "_idle_timer",
+        "_connection_lock",
+    )
+
     KEY = None
     MODEL_NUMBER = None
     LABEL = None
     RAW_DATA_FORMAT = None
+    # Precompiled struct.Struct(RAW_DATA_FORMAT)
+    RAW_DATA_STRUCT = None
+    RAW_DATA_UUIDS = None
     SENSOR_CAPABILITIES = {
         SENSOR_HUMIDITY_KEY: False,
         SENSOR_RADON_SHORT_TERM_AVG_KEY: False,
@@ -141,6 +383,10 @@ class Device:
         SENSOR_CO2_KEY: False,
         SENSOR_VOC_KEY: False,
     }
+    SENSOR_UPDATE_INTERVALS = {}
+    # (Sensor class, index in the parsed raw data, function scaling the raw value or None
+    # to keep it as is) per sensor key
+    SENSOR_DECODERS = None
 
     def __init__(
         self,
@@ -155,11 +401,32 @@ class Device:
         self._identifier = serial_number[4:]
         self._measurements = {}
         self._has_measurements = False
+        self._data = None
+        self._measured_at = None
         self._debug_information = None
         self._has_debug_information = False
         self._peripheral = peripheral
+        # A peripheral handed over on creation (e.g. from identification) is already connected
+        self._connection_state = (
+            DEVICE_CONNECTION_STATE_CONNECTED
+            if peripheral is not None
+            else DEVICE_CONNECTION_STATE_DISCONNECTED
+        )
+        self._connection_statistics = {
+            "connects": 1 if peripheral is not None else 0,
+            "disconnects": 0,
+            "reused": 0,
+        }
         self._connect_attempts = connect_attempts
         self._reconnect_sleep = reconnect_sleep
+        self._fetch_attempts = DEFAULT_FETCH_ATTEMPTS
+        self._refetch_sleep = DEFAULT_REFETCH_SLEEP
+        self._iface = DEFAULT_BLUETOOTH_INTERFACE
+        self._address_type = DEFAULT_BLUETOOTH_ADDRESS_TYPE
+        self._keep_alive = DEFAULT_KEEP_ALIVE
+        self._last_used = None
+        self._idle_timer = None
+        self._connection_lock = threading.RLock()
 
     def __repr__(self):
         return repr(
@@ -168,25 +435,143 @@ class Device:
             )
         )
 
-    def _connect(self):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Release the connection kept open by the keep-alive mode
+        """
+        with self._connection_lock:
+            self._cancel_idle_timer()
+            self._close_peripheral()
+
+    def _close_superseded_connection(self):
+        """
+        Close the kept alive connection for another device of the same MAC address,
+        unless the connection is being used right now
+        """
+        if not self._connection_lock.acquire(blocking=False):
+            return
+        try:
+            self._cancel_idle_timer()
+            self._close_peripheral()
+        finally:
+            self._connection_lock.release()
+
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _release_connection(self):
+        if (
+            not self._keep_alive
+            or self._connection_state != DEVICE_CONNECTION_STATE_CONNECTED
+        ):
+            # Nothing to keep alive if a reconnect during the fetch failed
+            self._disconnect()
+            return
+
+        # Keep the connection open, and close it if it is still idle after keep_alive seconds
+        self._last_used = get_clock().monotonic()
+        key = self.mac_address.lower()
+        with _kept_alive_devices_lock:
+            superseded_device = _kept_alive_devices.get(key)
+            _kept_alive_devices[key] = self
+        if superseded_device is not None and superseded_device is not self:
+            # Only one connection to a MAC address can be open
+            superseded_device._close_superseded_connection()
+        self._cancel_idle_timer()
+        self._idle_timer = threading.Timer(
+            self._keep_alive, self._close_idle_connection
+        )
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _close_idle_connection(self):
+        with self._connection_lock:
+            if self._last_used is None or not self._keep_alive:
+                return
+            if not self._is_idle():
+                # Used again since the timer was started
+                return
+            _LOGGER.debug(
+                "Connection has been idle for {} seconds, disconnecting from {}".format(
+                    self._keep_alive, self.mac_address
+                )
+            )
+            self._idle_timer = None
+            self._close_peripheral()
+
+    def _is_idle(self):
+        """
+        True if the kept alive connection has not been used for keep_alive seconds,
+        measured on the clock of the backend
+        """
+        return (
+            self._last_used is not None
+            and get_clock().monotonic() - self._last_used >= self._keep_alive
+        )
+
+    def _set_connection_state(self, connection_state):
+        if connection_state != self._connection_state:
+            _LOGGER.debug(
+                "Device {} connection state: {} -> {}".format(
+                    self.mac_address, self._connection_state, connection_state
+                )
+            )
+        self._connection_state = connection_state
+
+    def _set_peripheral(self, peripheral):
+        self._peripheral = peripheral
+        self._connection_statistics["connects"] += 1
+        self._set_connection_state(DEVICE_CONNECTION_STATE_CONNECTED)
+
+    def _verify_connection(self):
+        """
+        Check if an already open connection (from identification or keep-alive) is still up,
+        and drop it if it is not. Returns True if it can be reused.
+        """
+        if self._connection_state != DEVICE_CONNECTION_STATE_CONNECTED:
+            return False
+        if self._keep_alive and self._is_idle():
+            # The idle timer runs on real time, the clock of the backend might be ahead of it
+            _LOGGER.debug(
+                "Connection to {} has been idle for {} seconds, reconnecting".format(
+                    self.mac_address, self._keep_alive
+                )
+            )
+            self._close_peripheral()
+            return False
         if self.is_connected:
+            self._connection_statistics["reused"] += 1
+            return True
+        _LOGGER.debug(
+            "Connection to {} was dropped, reconnecting".format(self.mac_address)
+        )
+        self._close_peripheral()
+        return False
+
+    def _connect(self):
+        if self._verify_connection():
             return
+        kept_alive_device = get_kept_alive_device(self.mac_address)
+        if kept_alive_device is not None and kept_alive_device is not self:
+            # Another device of the same MAC address holds its connection open, e.g. one
+            # that was created by an earlier discovery
+            kept_alive_device._close_superseded_connection()
         current_retries = 0
         while True:
             try:
-                if self._peripheral is not None:
-                    # Try to disconnect from peripheral
-                    try:
-                        self._peripheral.disconnect()
-                    except Exception as e:
-                        _LOGGER.warning("Failed to disconnect from Peripheral")
-                        _LOGGER.debug(e)
-
-                self._peripheral = btle.Peripheral(
-                    self.mac_address, iface=self._iface, addrType=self._address_type
-                )
+                self._set_connection_state(DEVICE_CONNECTION_STATE_CONNECTING)
+                self._set_peripheral(self._open_peripheral())
                 break
             except btle.BTLEException as e:
+                self._set_connection_state(DEVICE_CONNECTION_STATE_DISCONNECTED)
                 if current_retries == self._connect_attempts:
                     raise OutOfConnectAttemptsException(
                         self._connect_attempts, self._reconnect_sleep
@@ -202,20 +587,35 @@ class Device:
                     )
                 )
 
-                time.sleep(self._reconnect_sleep)
+                get_clock().sleep(self._reconnect_sleep, SLEEP_RECONNECT)
 
-    def _disconnect(self):
-        self._peripheral.disconnect()
+    def _open_peripheral(self):
+        return get_backend().open_peripheral(
+            self.mac_address, self._iface, self._address_type
+        )
+
+    def _close_peripheral(self):
+        key = self.mac_address.lower()
+        with _kept_alive_devices_lock:
+            if _kept_alive_devices.get(key) is self:
+                del _kept_alive_devices[key]
+        self._last_used = None
+        if self._peripheral is not None:
+            # Try to disconnect from peripheral
+            try:
+                self._peripheral.disconnect()
+            except Exception as e:
+                _LOGGER.warning("Failed to disconnect from Peripheral")
+                _LOGGER.debug(e)
+            self._connection_statistics["disconnects"] += 1
         self._peripheral = None
+        self._set_connection_state(DEVICE_CONNECTION_STATE_DISCONNECTED)
+
+    def _disconnect(self):
+        self._close_peripheral()
 
     def _reconnect(self):
-        try:
-            self._disconnect()
-        except Exception as e:
-            _LOGGER.debug(e)
-            _LOGGER.debug(
-                "Failed to disconnect during device reconnect, ignoring and continuing..."
-            )
+        self._close_peripheral()
 
         try:
             self._connect()
@@ -223,13 +623,22 @@ class Device:
             _LOGGER.debug(e)
             _LOGGER.debug("Failed to connect during device reconnect, ignoring...")
 
-    def _fetch_characteristic(self, uuid):
+    def _read_characteristic(self, peripheral, uuid):
         from .utils import fetch_characteristic
 
+        return fetch_characteristic(
+            peripheral,
+            uuid,
+            mac_address=self.mac_address,
+            model_number=self.model_number,
+            serial_number=self.serial_number,
+        )
+
+    def _fetch_characteristic(self, uuid):
         current_retries = 0
         while True:
             try:
-                return fetch_characteristic(self.connection, uuid)
+                return self._read_characteristic(self.connection, uuid)
             except btle.BTLEException as e:
                 if current_retries == self._fetch_attempts:
                     raise OutOfFetchAttemptsException(
@@ -251,25 +660,59 @@ class Device:
                     )
                     self._reconnect()
 
-                time.sleep(self._refetch_sleep)
+                get_clock().sleep(self._refetch_sleep, SLEEP_REFETCH)
 
     def _fetch_and_set_debug_information(self):
-        self._debug_information["firmware_revision"] = self._fetch_characteristic(
-            btle.AssignedNumbers.firmwareRevisionString
-        )
-        self._debug_information["hardware_revision"] = self._fetch_characteristic(
-            btle.AssignedNumbers.hardwareRevisionString
-        )
-        self._disconnect()
+        try:
+            self._debug_information["firmware_revision"] = self._fetch_characteristic(
+                btle.AssignedNumbers.firmwareRevisionString
+            )
+            self._debug_information["hardware_revision"] = self._fetch_characteristic(
+                btle.AssignedNumbers.hardwareRevisionString
+            )
+        finally:
+            self._disconnect()
 
     def _fetch_raw_data(self):
-        self._connect()
-        raw_data = self._fetch_characteristic(self.DATA_UUID)
-        self._disconnect()
-        return raw_data
+        with self._connection_lock:
+            # A failed connect leaves nothing to release
+            self._connect()
+            try:
+                raw_data = self._allocate_raw_data()
+                length = 0
+                for uuid in self.RAW_DATA_UUIDS:
+                    length = self._write_raw_data(
+                        raw_data, length, self._fetch_characteristic(uuid)
+                    )
+            finally:
+                # Also when a read failed, so the link is not left open without an idle timer
+                self._release_connection()
+        return memoryview(raw_data)[:length]
+
+    def _allocate_raw_data(self):
+        """
+        A buffer to assemble the characteristic values in, sized for RAW_DATA_STRUCT
+        """
+        return bytearray(self.RAW_DATA_STRUCT.size if self.RAW_DATA_STRUCT else 0)
+
+    @staticmethod
+    def _write_raw_data(raw_data, offset, value):
+        """
+        Copy a characteristic value into raw_data at offset, returns the offset after it.
+        raw_data grows if the value does not fit, so the length can still be checked.
+        """
+        end = offset + len(value)
+        raw_data[offset:end] = value
+        return end
 
     def _parse_raw_data(self, raw_data):
-        return struct.unpack(self.RAW_DATA_FORMAT, raw_data)
+        if self.RAW_DATA_STRUCT is None:
+            return struct.unpack(self.RAW_DATA_FORMAT, raw_data)
+        if len(raw_data) != self.RAW_DATA_STRUCT.size:
+            raise struct.error(
+                "unpack requires a buffer of {} bytes".format(self.RAW_DATA_STRUCT.size)
+            )
+        return self.RAW_DATA_STRUCT.unpack_from(raw_data)
 
     def fetch_and_set_measurements(
         self,
@@ -279,22 +722,91 @@ class Device:
         refetch_sleep=DEFAULT_REFETCH_SLEEP,
         iface=DEFAULT_BLUETOOTH_INTERFACE,
         address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+        keep_alive=DEFAULT_KEEP_ALIVE,
     ):
+        """
+        If keep_alive is set, the connection is kept open for keep_alive seconds after
+        the fetch, so the next fetch can reuse it. Release it with close().
+        """
         _LOGGER.debug("Fetching measurements from device:")
         _LOGGER.debug(self)
+        self._set_fetch_options(
+            connect_attempts=connect_attempts,
+            reconnect_sleep=reconnect_sleep,
+            fetch_attempts=fetch_attempts,
+            refetch_sleep=refetch_sleep,
+            iface=iface,
+            address_type=address_type,
+            keep_alive=keep_alive,
+        )
+        raw_data = self._fetch_raw_data()
+        self._set_measurements(raw_data)
+
+    async def fetch(
+        self,
+        connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+        reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+        fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
+        refetch_sleep=DEFAULT_REFETCH_SLEEP,
+        iface=DEFAULT_BLUETOOTH_INTERFACE,
+        address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    ):
+        """
+        Asyncio variant of fetch_and_set_measurements, see airthings.aio
+        """
+        from .aio import fetch_device
+
+        return await fetch_device(
+            self,
+            connect_attempts=connect_attempts,
+            reconnect_sleep=reconnect_sleep,
+            fetch_attempts=fetch_attempts,
+            refetch_sleep=refetch_sleep,
+            iface=iface,
+            address_type=address_type,
+        )
+
+    def _set_fetch_options(
+        self,
+        connect_attempts,
+        reconnect_sleep,
+        fetch_attempts,
+        refetch_sleep,
+        iface,
+        address_type,
+        keep_alive=DEFAULT_KEEP_ALIVE,
+    ):
         self._connect_attempts = connect_attempts
         self._reconnect_sleep = reconnect_sleep
         self._fetch_attempts = fetch_attempts
         self._refetch_sleep = refetch_sleep
         self._iface = iface
         self._address_type = address_type
-        self._connect()
-        raw_data = self._fetch_raw_data()
+        self._keep_alive = keep_alive
+
+    def _set_measurements(self, raw_data):
         data = self._parse_raw_data(raw_data)
         # TODO: check sensor version
-        self._parse_data(data)
+        self._data = data
+        self._measurements = {}
+        self._measured_at = get_clock().time()
+        if self.SENSOR_DECODERS is None:
+            # Without decoders, the model builds every sensor right away
+            self._parse_data(data)
+            for key, sensor in self._measurements.items():
+                sensor._set_measured_at(
+                    self._measured_at, self.SENSOR_UPDATE_INTERVALS.get(key)
+                )
         self._has_measurements = True
 
+        measurement_cache = get_measurement_cache()
+        if measurement_cache is not None:
+            measurement_cache.record(self)
+
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            self._log_alarms()
+
+    def _log_alarms(self):
         # Check for alarms
         for measurement, sensor in self.measurements.items():
             if not sensor.has_alarm_rules:
@@ -320,6 +832,26 @@ class Device:
         _LOGGER.debug("Fetched measurements!")
         _LOGGER.debug(self._measurements)
 
+    def _get_sensor(self, key):
+        """
+        The sensor of key, built from the parsed raw data (and its alarm evaluated) on first use
+        """
+        sensor = self._measurements.get(key)
+        if sensor is not None or self._data is None or self.SENSOR_DECODERS is None:
+            return sensor
+
+        decoder = self.SENSOR_DECODERS.get(key)
+        if decoder is None:
+            return None
+        sensor_class, index, scale = decoder
+        value = self._data[index]
+        sensor = sensor_class(value if scale is None else scale(value))
+        sensor._set_measured_at(
+            self._measured_at, self.SENSOR_UPDATE_INTERVALS.get(key)
+        )
+        self._measurements[key] = sensor
+        return sensor
+
     @property
     def is_connected(self):
         """
@@ -330,7 +862,10 @@ class Device:
             "scan" scanning
             "tryconn" - connecting
         """
-        if not self._peripheral:
+        if (
+            not self._peripheral
+            or self._connection_state == DEVICE_CONNECTION_STATE_DISCONNECTED
+        ):
             return False
 
         try:
@@ -358,10 +893,23 @@ class Device:
 
     @property
     def connection(self):
-        if not self.is_connected:
+        # Only the state is checked here, a dropped link surfaces as a disconnect error on use
+        if self._connection_state != DEVICE_CONNECTION_STATE_CONNECTED:
             self._connect()
         return self._peripheral
 
+    @property
+    def connection_state(self):
+        return self._connection_state
+
+    @property
+    def connection_statistics(self):
+        """
+        How many times the device was connected to, disconnected from,
+        and how many times an open connection was reused
+        """
+        return dict(self._connection_statistics)
+
     @property
     def debug_information(self):
         if not self._has_debug_information:
@@ -397,42 +945,125 @@ class Device:
     def sensor_capabilities(self):
         return self.SENSOR_CAPABILITIES
 
+    @property
+    def sensor_update_intervals(self):
+        """
+        Seconds between sensor updates per sensor key, SENSOR_UPDATE_INTERVAL_ON_READ if the
+        sensor is updated every time it is read
+        """
+        return self.SENSOR_UPDATE_INTERVALS
+
     @property
     def has_measurements(self):
         return self._has_measurements
 
+    @property
+    def measured_at(self):
+        """
+        When the measurements were read from the device (get_clock().time()), None if it has none
+        """
+        if not self._sensor_keys:
+            return None
+        return self._measured_at
+
+    @property
+    def age(self):
+        """
+        Seconds since the measurements were read from the device, None if it has none
+        """
+        measured_at = self.measured_at
+        if measured_at is None:
+            return None
+        return get_clock().time() - measured_at
+
+    @property
+    def expires_at(self):
+        """
+        When the first sensor is updated on the device since the measurements were read,
+        None if unknown
+        """
+        intervals = [self.SENSOR_UPDATE_INTERVALS.get(key) for key in self._sensor_keys]
+        if not intervals or None in intervals:
+            return None
+        return self._measured_at + min(intervals)
+
+    @property
+    def is_stale(self):
+        """
+        True if the device has no measurements, or might have updated a sensor since
+        """
+        expires_at = self.expires_at
+        return expires_at is None or get_clock().time() >= expires_at
+
     @property
     def label(self):
         return self.LABEL
 
+    @property
+    def _sensor_keys(self):
+        """
+        The keys of the sensors the device has measurements of
+        """
+        if not self._has_measurements:
+            return ()
+        if self.SENSOR_DECODERS is None:
+            return tuple(self._measurements)
+        return tuple(self.SENSOR_DECODERS)
+
     @property
     def measurements(self):
+        """
+        Every sensor per key, the sensors are built on first use
+        """
+        if (
+            self._data is not None
+            and self.SENSOR_DECODERS is not None
+            and len(self._measurements) < len(self.SENSOR_DECODERS)
+        ):
+            self._measurements = {
+                key: self._get_sensor(key) for key in self.SENSOR_DECODERS
+            }
         return self._measurements
 
+    @property
+    def measurement_values(self):
+        """
+        The value of every sensor per key, as plain numbers without building the sensors
+        """
+        if self._data is None:
+            return {}
+        if self.SENSOR_DECODERS is None:
+            return {key: sensor.value for key, sensor in self._measurements.items()}
+        data = self._data
+        return {
+            key: data[index] if scale is None else scale(data[index])
+            for key, (sensor_class, index, scale) in self.SENSOR_DECODERS.items()
+        }
+
     @property
     def humidity(self):
-        return self._measurements.get(SENSOR_HUMIDITY_KEY, None)
+        return self._get_sensor(SENSOR_HUMIDITY_KEY)
 
     @property
     def radon_short_term_avg(self):
-        return self._measurements.get(SENSOR_RADON_SHORT_TERM_AVG_KEY, None)
+        return self._get_sensor(SENSOR_RADON_SHORT_TERM_AVG_KEY)
 
     @property
     def radon_long_term_avg(self):
-        return self._measurements.get(SENSOR_RADON_LONG_TERM_AVG_KEY, None)
+        return self._get_sensor(SENSOR_RADON_LONG_TERM_AVG_KEY)
 
     @property
     def temperature(self):
-        return self._measurements.get(SENSOR_TEMPERATURE_KEY, None)
+        return self._get_sensor(SENSOR_TEMPERATURE_KEY)
 
     @property
     def atmospheric_pressure(self):
-        return self._measurements.get(SENSOR_ATMOSPHERIC_PRESSURE_KEY, None)
+        return self._get_sensor(SENSOR_ATMOSPHERIC_PRESSURE_KEY)
 
     @property
     def co2(self):
-        return self._measurements.get(SENSOR_CO2_KEY, None)
+        return self._get_sensor(SENSOR_CO2_KEY)
 
     @property
     def voc(self):
-        return self._measurements.get(SENSOR_VOC_KEY, None)
+        return self._get_sensor(SENSOR_VOC_KEY)
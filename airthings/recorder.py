@@ -0,0 +1,209 @@
+"""
+An append-only log of the raw characteristic values read from devices, to replay them
+later without radios (see airthings.backends.replay).
+
+A log starts with a magic and version, followed by one record per value read: a fixed size
+header (timestamp, MAC address, serial number, model number, characteristic UUID and value
+length), followed by the value itself.
+"""
+import binascii
+import logging
+import struct
+import threading
+import time
+
+import bluepy.btle as btle
+
+from .constants import PAYLOAD_LOG_MAGIC, PAYLOAD_LOG_VERSION
+from .exceptions import InvalidPayloadLogException
+
+_LOGGER = logging.getLogger(__name__)
+
+_FILE_HEADER = struct.Struct("<4sH")
+# Timestamp, MAC address, serial number, model number, UUID and value length
+_RECORD_HEADER = struct.Struct("<d6s10s4s16sH")
+
+
+def _pack_mac_address(mac_address):
+    return bytes.fromhex(mac_address.replace(":", ""))
+
+
+def _unpack_mac_address(mac_address):
+    return ":".join("{:02x}".format(byte) for byte in mac_address)
+
+
+class PayloadRecord:
+    __slots__ = (
+        "_timestamp",
+        "_mac_address",
+        "_serial_number",
+        "_model_number",
+        "_uuid",
+        "_value",
+    )
+
+    def __init__(
+        self, timestamp, mac_address, serial_number, model_number, uuid, value
+    ):
+        self._timestamp = timestamp
+        self._mac_address = mac_address
+        self._serial_number = serial_number
+        self._model_number = model_number
+        self._uuid = uuid
+        self._value = value
+
+    def __repr__(self):
+        return repr(
+            "<PayloadRecord timestamp={} mac_address={} serial_number={} uuid={} length={}>".format(
+                self._timestamp,
+                self._mac_address,
+                self._serial_number,
+                self._uuid,
+                len(self._value),
+            )
+        )
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @property
+    def mac_address(self):
+        return self._mac_address
+
+    @property
+    def serial_number(self):
+        """
+        None for values read before the device was identified
+        """
+        return self._serial_number
+
+    @property
+    def model_number(self):
+        return self._model_number
+
+    @property
+    def uuid(self):
+        return self._uuid
+
+    @property
+    def value(self):
+        return self._value
+
+
+class PayloadRecorder:
+    """
+    Appends every characteristic value read to the payload log at path, see
+    set_payload_recorder
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._records = 0
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(_FILE_HEADER.pack(PAYLOAD_LOG_MAGIC, PAYLOAD_LOG_VERSION))
+            self._file.flush()
+
+    def __repr__(self):
+        return repr(
+            "<PayloadRecorder path={} records={}>".format(self._path, self._records)
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def path(self):
+        return self._path
+
+    def record(self, mac_address, serial_number, model_number, uuid, value):
+        header = _RECORD_HEADER.pack(
+            time.time(),
+            _pack_mac_address(mac_address),
+            (serial_number or "").encode("ascii"),
+            (model_number or "").encode("ascii"),
+            btle.UUID(uuid).binVal,
+            len(value),
+        )
+        with self._lock:
+            self._file.write(header)
+            self._file.write(value)
+            self._records += 1
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def read_payload_log(path):
+    """
+    Yield every PayloadRecord of the payload log at path, in the order they were recorded.
+    A record cut short (e.g. by a crash while it was written) ends the log.
+    """
+    with open(path, "rb") as log_file:
+        header = log_file.read(_FILE_HEADER.size)
+        if len(header) != _FILE_HEADER.size or _FILE_HEADER.unpack(header) != (
+            PAYLOAD_LOG_MAGIC,
+            PAYLOAD_LOG_VERSION,
+        ):
+            raise InvalidPayloadLogException(path)
+
+        while True:
+            header = log_file.read(_RECORD_HEADER.size)
+            if not header:
+                return
+            if len(header) == _RECORD_HEADER.size:
+                (
+                    timestamp,
+                    mac_address,
+                    serial_number,
+                    model_number,
+                    uuid,
+                    length,
+                ) = _RECORD_HEADER.unpack(header)
+                value = log_file.read(length)
+                if len(value) == length:
+                    yield PayloadRecord(
+                        timestamp,
+                        _unpack_mac_address(mac_address),
+                        serial_number.rstrip(b"\0").decode("ascii") or None,
+                        model_number.rstrip(b"\0").decode("ascii") or None,
+                        str(btle.UUID(binascii.hexlify(uuid).decode("ascii"))),
+                        value,
+                    )
+                    continue
+            _LOGGER.warning(
+                "The payload log {} ends with an incomplete record, ignoring it".format(
+                    path
+                )
+            )
+            return
+
+
+_payload_recorder = None
+
+
+def get_payload_recorder():
+    """
+    The recorder every characteristic value read is appended to, None if disabled
+    """
+    return _payload_recorder
+
+
+def set_payload_recorder(payload_recorder):
+    """
+    Record every characteristic value read from now on, e.g.
+    set_payload_recorder(PayloadRecorder("payloads.log")). None disables recording.
+    """
+    global _payload_recorder
+    _payload_recorder = payload_recorder
@@ -0,0 +1,167 @@
+import collections
+import logging
+
+import bluepy.btle as btle
+
+from .backends import get_backend, get_clock
+from .constants import DEFAULT_BLUETOOTH_INTERFACE, DEFAULT_SCAN_PROCESS_INTERVAL
+from .exceptions import AirthingsModelNotImplementedException
+from .utils import determine_devices
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AirthingsScanDelegate(btle.DefaultDelegate):
+    """
+    Determines Airthings devices as soon as their advertisement is received,
+    and calls callback once per MAC address.
+    """
+
+    def __init__(self, callback, mac_addresses=None, serial_numbers=None):
+        btle.DefaultDelegate.__init__(self)
+        self._callback = callback
+        self._mac_addresses = mac_addresses
+        self._serial_numbers = serial_numbers
+        self._seen_mac_addresses = set()
+
+    def handleDiscovery(self, scan_entry, is_new_device, is_new_data):
+        if not is_new_data or scan_entry.addr in self._seen_mac_addresses:
+            return
+
+        try:
+            devices = determine_devices(
+                [scan_entry],
+                mac_addresses=self._mac_addresses,
+                serial_numbers=self._serial_numbers,
+            )
+        except AirthingsModelNotImplementedException as e:
+            _LOGGER.debug(e)
+            self._seen_mac_addresses.add(scan_entry.addr)
+            return
+
+        if not devices:
+            # Either not an Airthings device, or the manufacturer data has not been received yet
+            return
+
+        self._seen_mac_addresses.add(scan_entry.addr)
+        self._callback(devices[0])
+
+    def forget(self, mac_address=None):
+        """
+        Report a MAC address (or all of them if not set) again the next time it is seen
+        """
+        if mac_address is None:
+            self._seen_mac_addresses.clear()
+        else:
+            self._seen_mac_addresses.discard(mac_address)
+
+
+class AirthingsScanner:
+    """
+    A long-lived scanner that hands over Airthings devices the moment they are discovered,
+    either through the on_device callback or by iterating over iter_devices().
+    """
+
+    def __init__(
+        self,
+        on_device=None,
+        mac_addresses=None,
+        serial_numbers=None,
+        iface=DEFAULT_BLUETOOTH_INTERFACE,
+        passive=False,
+    ):
+        self._on_device = on_device
+        self._iface = iface
+        self._passive = passive
+        self._pending_devices = collections.deque()
+        self._devices = {}
+        self._delegate = AirthingsScanDelegate(
+            self._handle_device,
+            mac_addresses=mac_addresses,
+            serial_numbers=serial_numbers,
+        )
+        self._scanner = None
+
+    def __repr__(self):
+        return repr(
+            "<AirthingsScanner iface={} scanning={} devices={}>".format(
+                self._iface, self.is_scanning, len(self._devices)
+            )
+        )
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _handle_device(self, device):
+        _LOGGER.debug("AirthingsScanner discovered {}".format(device))
+        self._devices[device.mac_address] = device
+        self._pending_devices.append(device)
+        if self._on_device is not None:
+            self._on_device(device)
+
+    def start(self):
+        if self._scanner is not None:
+            return
+        scanner = get_backend().create_scanner(self._iface).withDelegate(self._delegate)
+        scanner.start(passive=self._passive)
+        self._scanner = scanner
+
+    def stop(self):
+        if self._scanner is None:
+            return
+        scanner, self._scanner = self._scanner, None
+        try:
+            scanner.stop()
+        except btle.BTLEException as e:
+            _LOGGER.warning("Failed to stop the scanner")
+            _LOGGER.debug(e)
+
+    def process(self, timeout=DEFAULT_SCAN_PROCESS_INTERVAL):
+        """
+        Scan for timeout seconds, calling on_device for every new Airthings device
+        """
+        self.start()
+        self._scanner.process(timeout)
+
+    def iter_devices(
+        self, timeout=None, process_interval=DEFAULT_SCAN_PROCESS_INTERVAL
+    ):
+        """
+        Yield Airthings devices as they are discovered, until timeout seconds have passed
+        (forever if timeout is None)
+        """
+        deadline = None if timeout is None else get_clock().monotonic() + timeout
+        while True:
+            while self._pending_devices:
+                yield self._pending_devices.popleft()
+
+            if deadline is None:
+                interval = process_interval
+            else:
+                interval = min(process_interval, deadline - get_clock().monotonic())
+                if interval <= 0:
+                    return
+
+            self.process(interval)
+
+    def forget(self, mac_address=None):
+        """
+        Report a MAC address (or all of them if not set) again the next time it is seen
+        """
+        self._delegate.forget(mac_address)
+        if mac_address is None:
+            self._devices.clear()
+        else:
+            self._devices.pop(mac_address, None)
+
+    @property
+    def is_scanning(self):
+        return self._scanner is not None
+
+    @property
+    def devices(self):
+        return list(self._devices.values())
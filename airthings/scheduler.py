@@ -0,0 +1,417 @@
+import logging
+import threading
+
+from .backends import get_clock
+from .constants import (
+    DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+    DEFAULT_BLUETOOTH_INTERFACE,
+    DEFAULT_CONNECT_ATTEMPTS,
+    DEFAULT_FETCH_ATTEMPTS,
+    DEFAULT_KEEP_ALIVE,
+    DEFAULT_NEXT_CONNECT_SLEEP,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_RECONNECT_SLEEP,
+    DEFAULT_REFETCH_SLEEP,
+    DEFAULT_SCHEDULE_MARGIN,
+    DEFAULT_SCHEDULE_RETRY_SLEEP,
+    SENSOR_UPDATE_INTERVAL_ON_READ,
+    SLEEP_NEXT_CONNECT,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class DeviceSchedule:
+    """
+    Learns when a device updates its sensors, and when it should be polled next.
+
+    The sensors with the shortest update interval (the cadence) are updated at the same moment
+    every interval. The moment of the next update is kept as a window (lo, hi]: a reading whose
+    values changed since the previous reading means an update happened between the two readings,
+    a reading whose values did not change means it did not happen yet. While the window is wider
+    than margin the device is polled in the middle of the window, which halves it, and once
+    narrow enough the device is polled right after the window. Every window ends with a poll
+    after it, so no update is missed while the phase is learned.
+    """
+
+    def __init__(
+        self,
+        device,
+        margin=DEFAULT_SCHEDULE_MARGIN,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        retry_sleep=DEFAULT_SCHEDULE_RETRY_SLEEP,
+    ):
+        self._device = device
+        self._margin = margin
+        self._poll_interval = poll_interval
+        self._retry_sleep = retry_sleep
+        self._interval = None
+        self._cadence_keys = ()
+        self._updated_on_read = False
+        self._window = None
+        self._last_polled_at = None
+        self._last_values = None
+        self._next_due = None
+        self._polls = 0
+        self._failures = 0
+        self._set_device(device)
+
+    def __repr__(self):
+        return repr(
+            "<DeviceSchedule mac_address={} interval={} window={} next_due={}>".format(
+                self._device.mac_address, self._interval, self._window, self._next_due
+            )
+        )
+
+    def _set_device(self, device):
+        self._device = device
+        intervals = {
+            key: interval
+            for key, interval in device.sensor_update_intervals.items()
+            if interval != SENSOR_UPDATE_INTERVAL_ON_READ
+        }
+        self._updated_on_read = any(
+            interval == SENSOR_UPDATE_INTERVAL_ON_READ
+            for interval in device.sensor_update_intervals.values()
+        )
+        if intervals:
+            self._interval = min(intervals.values())
+            self._cadence_keys = tuple(
+                sorted(
+                    key
+                    for key, interval in intervals.items()
+                    if interval == self._interval
+                )
+            )
+        else:
+            self._interval = None
+            self._cadence_keys = ()
+
+    @property
+    def device(self):
+        return self._device
+
+    @property
+    def mac_address(self):
+        return self._device.mac_address
+
+    @property
+    def interval(self):
+        """
+        Seconds between updates of the fastest sensors, None if unknown
+        """
+        return self._interval
+
+    @property
+    def window(self):
+        """
+        (lo, hi], the time range the next sensor update is expected in, None if not learned yet
+        """
+        return self._window
+
+    @property
+    def is_locked(self):
+        """
+        True if the update phase is known to within margin
+        """
+        return self._window is not None and self._window_width <= self._margin
+
+    @property
+    def next_due(self):
+        """
+        When the device should be polled next, None if it was never polled
+        """
+        return self._next_due
+
+    @property
+    def last_polled_at(self):
+        return self._last_polled_at
+
+    @property
+    def polls(self):
+        return self._polls
+
+    @property
+    def failures(self):
+        return self._failures
+
+    @property
+    def _window_width(self):
+        lo, hi = self._window
+        return hi - lo
+
+    def _values(self, device):
+        values = device.measurement_values
+        return tuple(values.get(key) for key in self._cadence_keys)
+
+    def _narrow(self, polled_at, changed):
+        """
+        Narrow the window with the evidence of the reading at polled_at
+        """
+        interval = self._interval
+        lo, hi = self._window
+
+        if changed:
+            # The update happened in (previous poll, polled_at], in the cycle of the window
+            # or, if the poll was late, in a later one
+            evidence_lo = max(self._last_polled_at, polled_at - interval)
+            cycles = max(0, int((polled_at - lo) // interval))
+            for shift in (cycles, cycles - 1):
+                shifted_lo = lo + shift * interval
+                shifted_hi = hi + shift * interval
+                narrowed = (max(shifted_lo, evidence_lo), min(shifted_hi, polled_at))
+                if narrowed[0] < narrowed[1]:
+                    break
+            else:
+                # The device drifted out of the window, start learning again
+                narrowed = (evidence_lo, polled_at)
+
+            lo, hi = narrowed
+            self._window = (lo + interval, hi + interval)
+        elif polled_at < hi:
+            # No update yet, it is later in the window
+            self._window = (max(lo, polled_at), hi)
+        else:
+            # No update where one was expected, either the values did not change or the device
+            # drifted. One update happens in any interval, start learning again
+            self._window = (polled_at, polled_at + interval)
+
+    def _schedule(self, polled_at):
+        if self._interval is None:
+            self._next_due = polled_at + self._poll_interval
+            return
+
+        lo, hi = self._window
+        if hi - lo <= self._margin:
+            next_due = hi + self._margin
+        else:
+            next_due = (lo + hi) / 2.0
+        if self._updated_on_read:
+            next_due = min(next_due, polled_at + self._poll_interval)
+        self._next_due = next_due
+
+    def record(self, device, polled_at):
+        """
+        Record a successful reading of device at polled_at (get_clock().monotonic()) and schedule the next poll
+        """
+        if type(device) is not type(self._device):
+            # Identified again as another model
+            self._set_device(device)
+            self._window = None
+            self._last_values = None
+        self._device = device
+        self._polls += 1
+        self._failures = 0
+
+        values = self._values(device)
+        if self._interval is not None:
+            if self._window is None or self._last_values is None:
+                # One update happens in any interval
+                self._window = (polled_at, polled_at + self._interval)
+            else:
+                self._narrow(polled_at, values != self._last_values)
+            while self._window[1] + self._margin <= polled_at:
+                lo, hi = self._window
+                self._window = (lo + self._interval, hi + self._interval)
+
+        self._last_values = values
+        self._last_polled_at = polled_at
+        self._schedule(polled_at)
+        _LOGGER.debug(
+            "Next poll of {} in {:.1f} seconds, update window = {}".format(
+                device.mac_address, self._next_due - polled_at, self._window
+            )
+        )
+
+    def record_failure(self, polled_at):
+        """
+        Record a failed poll at polled_at, the device is polled again after retry_sleep
+        """
+        self._failures += 1
+        self._next_due = polled_at + self._retry_sleep
+
+
+class PollingScheduler:
+    """
+    Polls Airthings devices only when their sensors are expected to have been updated.
+
+    Every device gets a DeviceSchedule that learns its update phase from the readings, based on
+    the SENSOR_UPDATE_INTERVALS of its model. Sensors updated on read (and models without known
+    intervals) are polled every poll_interval. Devices that are due at the same time are
+    polled one after the other.
+    """
+
+    def __init__(
+        self,
+        devices=None,
+        margin=DEFAULT_SCHEDULE_MARGIN,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        retry_sleep=DEFAULT_SCHEDULE_RETRY_SLEEP,
+        connect_attempts=DEFAULT_CONNECT_ATTEMPTS,
+        reconnect_sleep=DEFAULT_RECONNECT_SLEEP,
+        next_connect_sleep=DEFAULT_NEXT_CONNECT_SLEEP,
+        iface=DEFAULT_BLUETOOTH_INTERFACE,
+        fetch_attempts=DEFAULT_FETCH_ATTEMPTS,
+        refetch_sleep=DEFAULT_REFETCH_SLEEP,
+        address_type=DEFAULT_BLUETOOTH_ADDRESS_TYPE,
+        keep_alive=DEFAULT_KEEP_ALIVE,
+    ):
+        self._margin = margin
+        self._poll_interval = poll_interval
+        self._retry_sleep = retry_sleep
+        self._fetch_options = dict(
+            connect_attempts=connect_attempts,
+            reconnect_sleep=reconnect_sleep,
+            next_connect_sleep=next_connect_sleep,
+            iface=iface,
+            fetch_attempts=fetch_attempts,
+            refetch_sleep=refetch_sleep,
+            address_type=address_type,
+            keep_alive=keep_alive,
+        )
+        self._schedules = {}
+        self._lock = threading.Lock()
+        for device in devices or []:
+            self.add(device)
+
+    def __repr__(self):
+        return repr("<PollingScheduler devices={}>".format(len(self._schedules)))
+
+    def __len__(self):
+        return len(self._schedules)
+
+    def __contains__(self, mac_address):
+        return mac_address.lower() in self._schedules
+
+    def add(self, device):
+        """
+        Schedule device, it is due right away unless it already has measurements
+        """
+        schedule = DeviceSchedule(
+            device,
+            margin=self._margin,
+            poll_interval=self._poll_interval,
+            retry_sleep=self._retry_sleep,
+        )
+        if device.has_measurements:
+            schedule.record(device, get_clock().monotonic())
+        with self._lock:
+            self._schedules[device.mac_address.lower()] = schedule
+        return schedule
+
+    def remove(self, mac_address):
+        with self._lock:
+            self._schedules.pop(mac_address.lower(), None)
+
+    def schedule(self, mac_address):
+        return self._schedules.get(mac_address.lower())
+
+    @property
+    def devices(self):
+        return [schedule.device for schedule in self._schedules.values()]
+
+    @property
+    def next_due_times(self):
+        """
+        When every device is due next per MAC address, None if it was never polled
+        """
+        return {
+            schedule.mac_address: schedule.next_due
+            for schedule in self._schedules.values()
+        }
+
+    @property
+    def next_due(self):
+        """
+        When the first device is due, None if a device was never polled, so it is due right away
+        """
+        next_due_times = list(self.next_due_times.values())
+        if not next_due_times or None in next_due_times:
+            return None
+        return min(next_due_times)
+
+    def due(self, now=None):
+        """
+        The schedules that are due at now, the device due first is first
+        """
+        if now is None:
+            now = get_clock().monotonic()
+        with self._lock:
+            schedules = list(self._schedules.values())
+        due = [
+            schedule
+            for schedule in schedules
+            if schedule.next_due is None or schedule.next_due <= now
+        ]
+        return sorted(
+            due,
+            key=lambda schedule: -1 if schedule.next_due is None else schedule.next_due,
+        )
+
+    def poll_due(self, on_measurement=None, on_result=None, stop_event=None):
+        """
+        Fetch measurements from every device that is due.
+        Returns the FetchResult of every polled device, on_measurement is called with every
+        device (or FetchFailure) as soon as it is fetched, and on_result with its FetchResult.
+        Once stop_event (a threading.Event) is set, the devices that were not polled yet are
+        left due.
+        """
+        from . import fetch_result_from_device
+
+        results = []
+        for schedule in self.due():
+            if stop_event is not None and stop_event.is_set():
+                break
+            result = fetch_result_from_device(schedule.device, **self._fetch_options)
+            polled_at = get_clock().monotonic()
+            if result.ok:
+                schedule.record(result.device, polled_at)
+            else:
+                _LOGGER.debug(
+                    "Polling {} failed, retrying in {} seconds".format(
+                        result.mac_address, self._retry_sleep
+                    )
+                )
+                schedule.record_failure(polled_at)
+            results.append(result)
+
+            if on_result is not None:
+                on_result(result)
+            if on_measurement is not None:
+                on_measurement(result.device if result.ok else result)
+
+            get_clock().sleep(
+                self._fetch_options["next_connect_sleep"], SLEEP_NEXT_CONNECT
+            )
+
+        return results
+
+    def run_forever(self, on_measurement=None, stop_event=None, on_result=None):
+        """
+        Poll the devices as they become due until stop_event (a threading.Event) is set.
+        on_measurement is called with every device (or FetchFailure) as soon as it is fetched,
+        and on_result with its FetchResult.
+        """
+        if stop_event is None:
+            stop_event = threading.Event()
+
+        while not stop_event.is_set():
+            self.poll_due(
+                on_measurement=on_measurement,
+                on_result=on_result,
+                stop_event=stop_event,
+            )
+
+            next_due = self.next_due
+            if next_due is None:
+                if not self._schedules:
+                    # Nothing to poll, check again for added devices
+                    get_clock().wait(stop_event, self._poll_interval)
+                continue
+
+            wait = next_due - get_clock().monotonic()
+            if wait > 0:
+                _LOGGER.debug(
+                    "Sleeping {:.1f} seconds until the next device is due".format(wait)
+                )
+                get_clock().wait(stop_event, wait)
@@ -5,3 +5,16 @@ from .radon_long_term_average import RadonLongTermAverageSensor
 from .radon_short_term_average import RadonShortTermAverageSensor
 from .temperature import TemperatureSensor
 from .voc import VOCSensor
+
+SENSOR_CLASSES = {
+    sensor_class.KEY: sensor_class
+    for sensor_class in (
+        HumiditySensor,
+        RadonShortTermAverageSensor,
+        RadonLongTermAverageSensor,
+        TemperatureSensor,
+        AtmosphericPressureSensor,
+        CO2Sensor,
+        VOCSensor,
+    )
+}
@@ -7,6 +7,8 @@ from airthings.models import Sensor
 
 
 class AtmosphericPressureSensor(Sensor):
+    __slots__ = ()
+
     KEY = SENSOR_ATMOSPHERIC_PRESSURE_KEY
     LABEL = SENSOR_ATMOSPHERIC_PRESSURE_LABEL
     UNIT = SENSOR_ATMOSPHERIC_PRESSURE_UNIT
@@ -8,6 +8,8 @@ from airthings.models import Sensor
 
 
 class CO2Sensor(Sensor):
+    __slots__ = ()
+
     KEY = SENSOR_CO2_KEY
     LABEL = SENSOR_CO2_LABEL
     UNIT = SENSOR_CO2_UNIT
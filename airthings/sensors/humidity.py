@@ -7,6 +7,8 @@ from airthings.models import Sensor
 
 
 class HumiditySensor(Sensor):
+    __slots__ = ()
+
     KEY = SENSOR_HUMIDITY_KEY
     LABEL = SENSOR_HUMIDITY_LABEL
     UNIT = SENSOR_HUMIDITY_UNIT
@@ -8,6 +8,8 @@ from airthings.models import Sensor
 
 
 class RadonLongTermAverageSensor(Sensor):
+    __slots__ = ()
+
     KEY = SENSOR_RADON_LONG_TERM_AVG_KEY
     LABEL = SENSOR_RADON_LONG_TERM_AVG_LABEL
     UNIT = SENSOR_RADON_UNIT
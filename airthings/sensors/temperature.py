@@ -8,6 +8,8 @@ from airthings.models import Sensor
 
 
 class TemperatureSensor(Sensor):
+    __slots__ = ()
+
     KEY = SENSOR_TEMPERATURE_KEY
     LABEL = SENSOR_TEMPERATURE_LABEL
     UNIT = SENSOR_TEMPERATURE_UNIT
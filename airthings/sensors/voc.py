@@ -8,6 +8,8 @@ from airthings.models import Sensor
 
 
 class VOCSensor(Sensor):
+    __slots__ = ()
+
     KEY = SENSOR_VOC_KEY
     LABEL = SENSOR_VOC_LABEL
     UNIT = SENSOR_VOC_UNIT
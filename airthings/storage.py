@@ -0,0 +1,37 @@
+import json
+import logging
+import os
+import tempfile
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def load_json_file(path, default=None):
+    """
+    Load a JSON file, returns default if it does not exist or could not be loaded
+    """
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        _LOGGER.warning("Could not load {}, ignoring it".format(path))
+        _LOGGER.debug(e)
+        return default
+
+
+def save_json_file(path, data):
+    """
+    Save data to a JSON file. The data is written to a temporary file first,
+    so the file is never left half written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(temporary_path, path)
+    except OSError as e:
+        _LOGGER.warning("Could not save {}".format(path))
+        _LOGGER.debug(e)
@@ -1,16 +1,13 @@
 import logging
+import os
+import re
 import struct
 
 import bluepy.btle as btle
 
+from .backends import get_backend
 from .constants import (
-    ALARM_OPERATOR_EQUAL,
-    ALARM_OPERATOR_GREATER_THAN,
-    ALARM_OPERATOR_GREATER_THAN_OR_EQUAL,
-    ALARM_OPERATOR_LESS_THAN,
-    ALARM_OPERATOR_LESS_THAN_OR_EQUAL,
-    ALARM_OPERATOR_NOT_EQUAL,
-    ALARM_SEVERITY_UNKNOWN,
+    BLUETOOTH_SYSFS_PATH,
     DEFAULT_BLUETOOTH_ADDRESS_TYPE,
     DEFAULT_BLUETOOTH_INTERFACE,
 )
@@ -19,73 +16,63 @@ from .exceptions import (
     AirthingsModelNotImplementedException,
     CouldNotDetermineAlarmSeverityException,
 )
+from .handle_cache import get_handle_cache
+from .identity_registry import get_identity_registry
+from .recorder import get_payload_recorder
 
 _LOGGER = logging.getLogger(__name__)
 
 
 def determine_alarm_severity(alarm_rules, value):
-    from .models import Alarm
+    from .alarm_rules import compile_alarm_rules
 
     if alarm_rules is None:
         # TODO: exception?
         return None
 
-    for alarm_rule in alarm_rules:
-        severity = alarm_rule["severity"]
-        rules = alarm_rule["rules"]
-        required_matches = len(rules)
-
-        matches = 0
-        for rule in rules:
-            matched_rule = None
-            rule_operator = rule["operator"]
-            rule_value = rule["value"]
-            if rule_operator == ALARM_OPERATOR_EQUAL:
-                if value == rule_value:
-                    matched_rule = rule
-            elif rule_operator == ALARM_OPERATOR_NOT_EQUAL:
-                if value != rule_value:
-                    matched_rule = rule
-            elif rule_operator == ALARM_OPERATOR_GREATER_THAN:
-                if value > rule_value:
-                    matched_rule = rule
-            elif rule_operator == ALARM_OPERATOR_LESS_THAN:
-                if value < rule_value:
-                    matched_rule = rule
-            elif rule_operator == ALARM_OPERATOR_GREATER_THAN_OR_EQUAL:
-                if value >= rule_value:
-                    matched_rule = rule
-            elif rule_operator == ALARM_OPERATOR_LESS_THAN_OR_EQUAL:
-                if value <= rule_value:
-                    matched_rule = rule
-
-            if matched_rule:
-                matches += 1
-
-        if matches >= required_matches:
-            return Alarm(severity=severity, value=value, rules=rules)
-    else:
-        # TODO:?
-        """
-        if matched_rule is None:
-            raise CouldNotDetermineAlarmSeverityException(severity, value, rules)
-
-        """
-        _LOGGER.warning(
-            "Setting severity to unknown. Could not determine alarm severity for value: {}, and alarm_rules: {}".format(
-                value, alarm_rules
-            )
-        )
-        return Alarm(severity=ALARM_SEVERITY_UNKNOWN, value=value)
+    return compile_alarm_rules(alarm_rules).evaluate(value)
 
 
-def fetch_characteristic(peripheral, uuid):
+def fetch_characteristic(
+    peripheral, uuid, mac_address=None, model_number=None, serial_number=None
+):
+    """
+    Read a characteristic. If the MAC address is set, the value handle is looked up in
+    the handle cache, to skip discovering the characteristic on every read, and the value
+    is appended to the payload recorder if one is set.
+    """
     if peripheral is None:
         raise ValueError("Peripheral cannot be None")
+
+    value = _read_characteristic(peripheral, uuid, mac_address, model_number)
+    payload_recorder = get_payload_recorder() if mac_address is not None else None
+    if payload_recorder is not None:
+        payload_recorder.record(mac_address, serial_number, model_number, uuid, value)
+    return value
+
+
+def _read_characteristic(peripheral, uuid, mac_address, model_number):
+    handle_cache = get_handle_cache() if mac_address is not None else None
+    if handle_cache is not None:
+        handle = handle_cache.get(mac_address, model_number, uuid)
+        if handle is not None:
+            try:
+                return peripheral.readCharacteristic(handle)
+            except btle.BTLEGattError as e:
+                _LOGGER.debug(e)
+                _LOGGER.debug(
+                    "Cached handle {} for uuid {} was rejected by {}, discovering it again".format(
+                        handle, uuid, mac_address
+                    )
+                )
+                handle_cache.invalidate(mac_address, model_number, uuid)
+
     characteristics = peripheral.getCharacteristics(uuid=uuid)
     if len(characteristics) != 1:
         raise ValueError("fetch_characteristic did not return exactly 1 characteristic")
     characteristic = characteristics[0]
+    if handle_cache is not None:
+        handle_cache.set(mac_address, model_number, uuid, characteristic.valHandle)
     return characteristic.read()
 
 
@@ -100,14 +87,14 @@ def determine_device_from_mac_address(
         )
     )
 
-    peripheral = btle.Peripheral(mac_address, iface=iface, addrType=address_type)
+    peripheral = get_backend().open_peripheral(mac_address, iface, address_type)
     # First 4 digits of the serial number
     model_number = fetch_characteristic(
-        peripheral, btle.AssignedNumbers.modelNumberString
+        peripheral, btle.AssignedNumbers.modelNumberString, mac_address=mac_address
     ).decode("utf-8")
     # Last 6 digits of the serial number
     identifier = fetch_characteristic(
-        peripheral, btle.AssignedNumbers.serialNumberString
+        peripheral, btle.AssignedNumbers.serialNumberString, mac_address=mac_address
     ).decode("utf-8")
 
     # 10 digits
@@ -115,6 +102,10 @@ def determine_device_from_mac_address(
 
     device_class = determine_device_class_from_serial_number(serial_number)
 
+    identity_registry = get_identity_registry()
+    if identity_registry is not None:
+        identity_registry.record(mac_address, serial_number)
+
     return device_class(mac_address, serial_number, peripheral=peripheral)
 
 
@@ -158,9 +149,48 @@ def determine_device(dev):
         return None
     serial_number = str(serial_number)
     device_class = determine_device_class_from_serial_number(serial_number)
+
+    identity_registry = get_identity_registry()
+    if identity_registry is not None:
+        # The advertisement tells us the serial number for free
+        identity_registry.record(mac_address, serial_number)
+
     return device_class(mac_address, serial_number)
 
 
+def determine_devices(scan_entries, mac_addresses=None, serial_numbers=None):
+    """
+    Determine the Airthings devices among scan entries, optionally only the ones
+    matching a list of MAC addresses or serial numbers
+    """
+    airthings_devices = []
+    for dev in scan_entries:
+        device = determine_device(dev)
+        if device:
+            if mac_addresses and device.mac_address not in mac_addresses:
+                # MAC addresses are set, and the device MAC address does not
+                # match any in the list.
+                _LOGGER.debug(
+                    "MAC address: {} is not in our mac_addresses list, ignoring it".format(
+                        device.mac_address
+                    )
+                )
+                continue
+            elif serial_numbers and device.serial_number not in serial_numbers:
+                # Serial numbers are set, and the device serial number does not match
+                # any in the list.
+                _LOGGER.debug(
+                    "Serial number: {} is not in our serial_numbers list, ignoring it".format(
+                        device.serial_number
+                    )
+                )
+                continue
+
+            # Device is an Airthings device
+            airthings_devices.append(device)
+    return airthings_devices
+
+
 def parse_manufacturer_data(manufacturer_data):
     try:
         (idx, serial_number, _) = struct.unpack("<HLH", manufacturer_data)
@@ -169,3 +199,29 @@ def parse_manufacturer_data(manufacturer_data):
     else:
         if idx == 0x0334:
             return serial_number
+
+
+def determine_bluetooth_interfaces(sysfs_path=BLUETOOTH_SYSFS_PATH):
+    """
+    Enumerate the local Bluetooth adapters, returns their interface numbers (hci0 = 0, hci1 = 1, etc.)
+    """
+    try:
+        names = os.listdir(sysfs_path)
+    except OSError as e:
+        _LOGGER.warning(
+            "Could not list Bluetooth adapters in {}, assuming there are none".format(
+                sysfs_path
+            )
+        )
+        _LOGGER.debug(e)
+        return []
+
+    ifaces = []
+    for name in names:
+        match = re.match(r"^hci(\d+)$", name)
+        if match:
+            ifaces.append(int(match.group(1)))
+
+    _LOGGER.debug("Found the following Bluetooth interfaces: {}".format(ifaces))
+
+    return sorted(ifaces)
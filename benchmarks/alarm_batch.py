@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Compares evaluating a series of CO2 values one Sensor at a time with the batch evaluation.
+"""
+import logging
+import time
+
+import numpy as np
+
+from airthings.alarm_batch import alarm_severity_codes, summarize_alarm_severities
+from airthings.sensors import CO2Sensor
+
+SENSOR_SAMPLES = 100000
+BATCH_SAMPLES = 10000000
+
+
+if __name__ == "__main__":
+    # The CO2 rules do not cover 800, the warnings would dominate the timings
+    logging.disable(logging.WARNING)
+    values = np.random.default_rng(0).integers(300, 2500, BATCH_SAMPLES)
+    timestamps = np.arange(BATCH_SAMPLES) * 300.0
+
+    started_at = time.perf_counter()
+    [CO2Sensor(value).current_alarm for value in values[:SENSOR_SAMPLES].tolist()]
+    sensor_rate = SENSOR_SAMPLES / (time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    codes = alarm_severity_codes(CO2Sensor.KEY, values)
+    batch_rate = BATCH_SAMPLES / (time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    summarize_alarm_severities(codes, timestamps)
+    summary_rate = BATCH_SAMPLES / (time.perf_counter() - started_at)
+
+    print("Sensor objects: {:>14,.0f} samples per second".format(sensor_rate))
+    print("Batch:          {:>14,.0f} samples per second".format(batch_rate))
+    print("Summary:        {:>14,.0f} samples per second".format(summary_rate))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Compares interpreting the alarm rules of every sensor per value with the compiled tables.
+
+Before timing, checks that the compiled tables give every value the severity interpreting
+the rules gives it, and that a missing value (None, e.g. a radon sensor warming up) has the
+unknown severity instead of raising, and exits with 1 if they do not.
+"""
+import logging
+import random
+import sys
+import timeit
+
+from airthings.alarm_rules import compile_alarm_rules, match_alarm_rule
+from airthings.constants import (
+    ALARM_SEVERITY_UNKNOWN,
+    SENSOR_HUMIDITY_KEY,
+    SENSOR_TEMPERATURE_KEY,
+)
+from airthings.models import Alarm
+from airthings.sensors import SENSOR_CLASSES
+
+SAMPLES = 10000
+REPEAT = 5
+RESOLUTIONS = {
+    SENSOR_HUMIDITY_KEY: 2,
+    SENSOR_TEMPERATURE_KEY: 100,
+}
+
+
+def interpret(alarm_rules, value):
+    alarm_rule = match_alarm_rule(alarm_rules, value)
+    if alarm_rule is None:
+        return Alarm(severity=ALARM_SEVERITY_UNKNOWN, value=value)
+    return Alarm(
+        severity=alarm_rule["severity"], value=value, rules=alarm_rule["rules"]
+    )
+
+
+def check(key, alarm_rules, values):
+    compiled = compile_alarm_rules(alarm_rules)
+    mismatches = [
+        "{}: {} is {} compiled, {} interpreted".format(
+            key,
+            value,
+            compiled.evaluate(value).severity,
+            interpret(alarm_rules, value).severity,
+        )
+        for value in values
+        if compiled.evaluate(value).severity != interpret(alarm_rules, value).severity
+    ]
+    if compiled.evaluate(None).severity != ALARM_SEVERITY_UNKNOWN:
+        mismatches.append("{}: None is not {}".format(key, ALARM_SEVERITY_UNKNOWN))
+    return mismatches
+
+
+def benchmark(name, function, alarm_rules, values):
+    seconds = min(
+        timeit.repeat(
+            lambda: [function(alarm_rules, value) for value in values],
+            number=1,
+            repeat=REPEAT,
+        )
+    )
+    return seconds / len(values) * 1e9
+
+
+if __name__ == "__main__":
+    # The temperature rules do not cover 18, the warnings would dominate the timings
+    logging.disable(logging.WARNING)
+    random.seed(0)
+    print(
+        "{:<22} {:>14} {:>14} {:>8}".format(
+            "sensor", "interpreted", "compiled", "speedup"
+        )
+    )
+    for key, sensor_class in SENSOR_CLASSES.items():
+        if sensor_class.ALARM_RULES is None:
+            continue
+        alarm_rules = sensor_class.ALARM_RULES
+        compiled = compile_alarm_rules(alarm_rules)
+        resolution = RESOLUTIONS.get(key, 1)
+        high = max(compiled.thresholds) * 1.5
+        # Values with the resolution of the devices
+        values = [
+            round(random.uniform(0, high) * resolution) / resolution
+            if resolution != 1
+            else random.randint(0, int(high))
+            for _ in range(SAMPLES)
+        ]
+
+        mismatches = check(key, alarm_rules, values)
+        if mismatches:
+            print("\n".join(mismatches))
+            sys.exit(1)
+
+        interpreted_ns = benchmark(key, interpret, alarm_rules, values)
+        compiled_ns = benchmark(
+            key,
+            lambda alarm_rules, value: compiled.evaluate(value),
+            alarm_rules,
+            values,
+        )
+        print(
+            "{:<22} {:>11.0f} ns {:>11.0f} ns {:>7.1f}x".format(
+                key, interpreted_ns, compiled_ns, interpreted_ns / compiled_ns
+            )
+        )
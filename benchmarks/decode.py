@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Compares decoding a log of recorded Wave Plus payloads with struct.unpack on sliced copies,
+and with the precompiled RAW_DATA_STRUCT at offsets into the log.
+"""
+import os
+import struct
+import timeit
+
+from airthings.devices import WavePlusGen1
+
+PAYLOADS = 100000
+REPEAT = 5
+
+
+def unpack_slices(log, size):
+    return [
+        struct.unpack(WavePlusGen1.RAW_DATA_FORMAT, log[offset : offset + size])
+        for offset in range(0, len(log), size)
+    ]
+
+
+def unpack_from_offsets(log, size):
+    unpack_from = WavePlusGen1.RAW_DATA_STRUCT.unpack_from
+    return [unpack_from(log, offset) for offset in range(0, len(log), size)]
+
+
+if __name__ == "__main__":
+    size = WavePlusGen1.RAW_DATA_STRUCT.size
+    log = os.urandom(PAYLOADS * size)
+    for name, decode in (
+        ("struct.unpack", unpack_slices),
+        ("unpack_from", unpack_from_offsets),
+    ):
+        seconds = min(timeit.repeat(lambda: decode(log, size), number=1, repeat=REPEAT))
+        print("{:<14} {:>8.0f} ns per payload".format(name, seconds / PAYLOADS * 1e9))
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of the decode and alarm hot paths, with the ops per second and the
+allocations per call of every case: the memory blocks a call leaves allocated (its result
+and what it caches) and the peak of memory it traces while it runs.
+
+--save writes the results to a JSON baseline (baseline.json next to this script by default),
+--compare reports every case that got slower than the baseline by more than --tolerance, or
+allocates more blocks, and exits with 1 if there is one.
+"""
+import argparse
+import gc
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+
+from airthings import set_identity_registry, set_measurement_cache
+from airthings.backends.simulated import SimulatedScanEntry, create_virtual_fleet
+from airthings.constants import (
+    SENSOR_ATMOSPHERIC_PRESSURE_KEY,
+    SENSOR_CO2_KEY,
+    SENSOR_HUMIDITY_KEY,
+    SENSOR_RADON_LONG_TERM_AVG_KEY,
+    SENSOR_RADON_SHORT_TERM_AVG_KEY,
+    SENSOR_TEMPERATURE_KEY,
+    SENSOR_VOC_KEY,
+)
+from airthings.devices import DEVICE_MODELS
+from airthings.sensors import SENSOR_CLASSES
+from airthings.utils import (
+    determine_alarm_severity,
+    determine_device,
+    parse_manufacturer_data,
+)
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baseline.json"
+)
+PAYLOADS = 64
+ALLOCATION_CALLS = 1000
+PEAK_SAMPLES = 50
+REPEAT = 5
+TOLERANCE = 0.3
+# Values at the resolution the sensors report them in, across the range of the alarm rules
+SENSOR_VALUES = {
+    SENSOR_HUMIDITY_KEY: [value / 2.0 for value in range(0, 200)],
+    SENSOR_RADON_SHORT_TERM_AVG_KEY: list(range(0, 400)),
+    SENSOR_RADON_LONG_TERM_AVG_KEY: list(range(0, 400)),
+    SENSOR_TEMPERATURE_KEY: [value / 100.0 for value in range(1500, 3000, 7)],
+    SENSOR_ATMOSPHERIC_PRESSURE_KEY: [
+        value / 50.0 for value in range(48000, 52000, 11)
+    ],
+    SENSOR_CO2_KEY: [float(value) for value in range(300, 2500, 3)],
+    SENSOR_VOC_KEY: [float(value) for value in range(0, 3000, 5)],
+}
+
+
+def raw_payloads(device):
+    now = 0.0
+    payloads = []
+    for _ in range(PAYLOADS):
+        now += 3600.0
+        payloads.append(
+            b"".join(
+                device.read(uuid, now) for uuid in device.device_class.RAW_DATA_UUIDS
+            )
+        )
+    return payloads
+
+
+def cases():
+    virtual_devices = create_virtual_fleet(len(DEVICE_MODELS), seed=0)
+    manufacturer_data = virtual_devices[0].manufacturer_data
+    yield "parse_manufacturer_data[airthings]", lambda: parse_manufacturer_data(
+        manufacturer_data
+    )
+    yield "parse_manufacturer_data[other]", lambda: parse_manufacturer_data(
+        b"\x4c\x00\x02\x15"
+    )
+
+    for virtual_device in virtual_devices:
+        device_class = virtual_device.device_class
+        name = device_class.__name__
+        scan_entry = SimulatedScanEntry(virtual_device, -60)
+
+        def determine(scan_entry=scan_entry):
+            return determine_device(scan_entry)
+
+        yield "determine_device[{}]".format(name), determine
+
+        payloads = itertools.cycle(raw_payloads(virtual_device))
+        device = device_class(virtual_device.mac_address, virtual_device.serial_number)
+
+        def parse_raw_data(device=device, payloads=payloads):
+            return device._parse_raw_data(next(payloads))
+
+        def set_measurements(device=device, payloads=payloads):
+            device._set_measurements(next(payloads))
+
+        def decode(device=device, payloads=payloads):
+            device._set_measurements(next(payloads))
+            return device.measurements
+
+        yield "{}._parse_raw_data".format(name), parse_raw_data
+        yield "{}._set_measurements".format(name), set_measurements
+        yield "{}.decode".format(name), decode
+
+    for key, sensor_class in SENSOR_CLASSES.items():
+        values = itertools.cycle(SENSOR_VALUES[key])
+
+        def alarm_severity(alarm_rules=sensor_class.ALARM_RULES, values=values):
+            return determine_alarm_severity(alarm_rules, next(values))
+
+        def sensor(sensor_class=sensor_class, values=values):
+            return sensor_class(next(values))
+
+        if sensor_class.ALARM_RULES is not None:
+            yield "determine_alarm_severity[{}]".format(key), alarm_severity
+        yield "{}()".format(sensor_class.__name__), sensor
+
+
+def ops_per_second(function):
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return number / min(timer.repeat(number=number, repeat=REPEAT))
+
+
+def allocated_blocks_per_call(function):
+    results = [None] * ALLOCATION_CALLS
+    gc.collect()
+    gc.disable()
+    try:
+        before = sys.getallocatedblocks()
+        for index in range(ALLOCATION_CALLS):
+            results[index] = function()
+        after = sys.getallocatedblocks()
+    finally:
+        gc.enable()
+    return (after - before) / ALLOCATION_CALLS
+
+
+def peak_bytes_per_call(function):
+    peaks = []
+    for _ in range(PEAK_SAMPLES):
+        tracemalloc.start()
+        current = tracemalloc.get_traced_memory()[0]
+        function()
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        tracemalloc.stop()
+    return statistics.median(peaks)
+
+
+def run():
+    results = {}
+    for name, function in cases():
+        # Warm up the caches, so they do not count as allocations
+        for _ in range(PAYLOADS * 4):
+            function()
+        results[name] = {
+            "ops_per_second": round(ops_per_second(function)),
+            "allocated_blocks_per_call": round(allocated_blocks_per_call(function), 2),
+            "peak_bytes_per_call": peak_bytes_per_call(function),
+        }
+        print(
+            "{:<48} {:>12,.0f} ops/s {:>8.2f} blocks/call {:>8.0f} peak B/call".format(
+                name,
+                results[name]["ops_per_second"],
+                results[name]["allocated_blocks_per_call"],
+                results[name]["peak_bytes_per_call"],
+            )
+        )
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        expected = baseline["results"].get(name)
+        if expected is None:
+            continue
+        if result["ops_per_second"] < expected["ops_per_second"] * (1 - tolerance):
+            regressions.append(
+                "{}: {:,.0f} ops/s, baseline {:,.0f} ops/s".format(
+                    name, result["ops_per_second"], expected["ops_per_second"]
+                )
+            )
+        if (
+            result["allocated_blocks_per_call"]
+            > expected["allocated_blocks_per_call"] + 0.5
+        ):
+            regressions.append(
+                "{}: {} blocks/call, baseline {} blocks/call".format(
+                    name,
+                    result["allocated_blocks_per_call"],
+                    expected["allocated_blocks_per_call"],
+                )
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--save",
+        nargs="?",
+        const=BASELINE_PATH,
+        help="Write the results to a baseline file",
+    )
+    parser.add_argument(
+        "--compare",
+        nargs="?",
+        const=BASELINE_PATH,
+        help="Compare the results with a baseline file",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=TOLERANCE,
+        help="Fraction of the baseline ops/s a case may lose before it is a regression",
+    )
+    args = parser.parse_args(argv)
+
+    # The alarm rules do not cover every value, the warnings would dominate the timings
+    logging.disable(logging.WARNING)
+    set_measurement_cache(None)
+    set_identity_registry(None)
+    results = run()
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "implementation": platform.python_implementation(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                baseline_file,
+                indent=2,
+                sort_keys=True,
+            )
+            baseline_file.write("\n")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("Regression: {}".format(regression))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
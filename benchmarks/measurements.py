@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Measures setting the measurements of a Wave Plus from a raw payload, and reading them
+as every sensor, a single sensor, or plain values.
+"""
+import logging
+import random
+import struct
+import timeit
+
+from airthings import set_measurement_cache
+from airthings.devices import WavePlusGen1
+
+PAYLOADS = 1000
+REPEAT = 5
+
+
+def payload():
+    return struct.pack(
+        WavePlusGen1.RAW_DATA_FORMAT,
+        1,
+        random.randint(40, 160),
+        0,
+        0,
+        random.randint(0, 300),
+        random.randint(0, 300),
+        random.randint(1500, 2800),
+        random.randint(48000, 52000),
+        random.randint(400, 2000),
+        random.randint(0, 600),
+        0,
+        0,
+    )
+
+
+def every_sensor(device):
+    return [sensor.current_alarm for sensor in device.measurements.values()]
+
+
+def single_sensor(device):
+    return device.co2.value
+
+
+def values(device):
+    return device.measurement_values
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    random.seed(0)
+    set_measurement_cache(None)
+    payloads = [payload() for _ in range(PAYLOADS)]
+    device = WavePlusGen1("00:00:00:00:00:00", "2930000000")
+
+    for name, read in (
+        ("every sensor", every_sensor),
+        ("single sensor", single_sensor),
+        ("values", values),
+    ):
+
+        def run():
+            for raw_data in payloads:
+                device._set_measurements(raw_data)
+                read(device)
+
+        seconds = min(timeit.repeat(run, number=1, repeat=REPEAT))
+        print("{:<14} {:>8.2f} us per payload".format(name, seconds / PAYLOADS * 1e6))
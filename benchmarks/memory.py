@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Measures the memory kept per device, and per reading (the sensors and alarms of a Wave Plus
+reading), with tracemalloc.
+"""
+import gc
+import logging
+import random
+import struct
+import tracemalloc
+
+from airthings import set_measurement_cache
+from airthings.devices import WavePlusGen1
+
+DEVICES = 1000
+READINGS = 10000
+
+
+def allocated(create, count):
+    gc.collect()
+    tracemalloc.start()
+    kept = [create(index) for index in range(count)]
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size / count
+
+
+def create_device(index):
+    return WavePlusGen1(
+        "00:00:00:00:{:02x}:{:02x}".format(index // 256, index % 256),
+        "2930{:06d}".format(index),
+    )
+
+
+def create_reading(index):
+    device = create_device(0)
+    device._set_measurements(
+        struct.pack(
+            WavePlusGen1.RAW_DATA_FORMAT,
+            1,
+            random.randint(40, 160),
+            0,
+            0,
+            random.randint(0, 300),
+            random.randint(0, 300),
+            random.randint(1500, 2800),
+            random.randint(48000, 52000),
+            random.randint(400, 2000),
+            random.randint(0, 600),
+            0,
+            0,
+        )
+    )
+    return device.measurements
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    random.seed(0)
+    set_measurement_cache(None)
+    print("Device:  {:>8.0f} bytes".format(allocated(create_device, DEVICES)))
+    print("Reading: {:>8.0f} bytes".format(allocated(create_reading, READINGS)))
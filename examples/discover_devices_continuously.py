@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+from airthings import iter_discover_devices
+
+if __name__ == "__main__":
+    # Every device is yielded the moment its advertisement is received,
+    # so it can be connected to while the scan is still running
+    for device in iter_discover_devices(scan_timeout=30):
+        print("=" * 36)
+        print("\tMAC address:", device.mac_address)
+        print("\tIdentifier:", device.identifier)
+        print("\tModel:", device.label)
+        print("\tModel number:", device.model_number)
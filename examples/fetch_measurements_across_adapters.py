@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+from airthings import (
+    determine_bluetooth_interfaces,
+    discover_devices,
+    fetch_measurements_from_devices_sharded,
+)
+
+if __name__ == "__main__":
+    ifaces = determine_bluetooth_interfaces()
+    print("Found %s Bluetooth adapters: %s" % (len(ifaces), ifaces))
+    airthings_devices = discover_devices()
+    # Every adapter fetches its share of the devices in its own thread
+    airthings_devices = fetch_measurements_from_devices_sharded(
+        airthings_devices, ifaces=ifaces
+    )
+    print("Found %s Airthings devices:" % len(airthings_devices))
+    for device in airthings_devices:
+        print("=" * 36)
+        print("\tMAC address:", device.mac_address)
+        print("\tIdentifier:", device.identifier)
+        print("\tModel:", device.label)
+        print("\tHas measurements:", device.has_measurements)
+        print("+" * 11, "Measurements", "+" * 11)
+        for sensor in device.measurements.values():
+            print("\t", sensor.label, ":", sensor)
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+import asyncio
+
+from airthings.aio import discover_devices, fetch_measurements_from_devices
+
+
+async def main():
+    airthings_devices = await discover_devices()
+    # At most 2 devices are connected to at the same time
+    await fetch_measurements_from_devices(airthings_devices, max_concurrency=2)
+    print("Found %s Airthings devices:" % len(airthings_devices))
+    for device in airthings_devices:
+        print("=" * 36)
+        print("\tMAC address:", device.mac_address)
+        print("\tModel:", device.label)
+        print("+" * 11, "Measurements", "+" * 11)
+        for sensor in device.measurements.values():
+            print("\t", sensor.label, ":", sensor)
+
+    # A single device can also be fetched on its own
+    if airthings_devices:
+        await airthings_devices[0].fetch()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+from airthings import FetchFailure, iter_measurements
+
+if __name__ == "__main__":
+    # Devices are yielded one by one, as soon as their measurements are fetched
+    for device in iter_measurements():
+        print("=" * 36)
+        print("\tMAC address:", device.mac_address)
+        if isinstance(device, FetchFailure):
+            print("\tFailed to fetch measurements:", device.exception)
+            continue
+        print("\tModel:", device.label)
+        print("+" * 11, "Measurements", "+" * 11)
+        for sensor in device.measurements.values():
+            print("\t", sensor.label, ":", sensor)
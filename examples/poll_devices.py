@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+from airthings import FetchFailure, PollingScheduler, discover_devices
+
+
+def print_device(device):
+    print("=" * 36)
+    print("\tMAC address:", device.mac_address)
+    if isinstance(device, FetchFailure):
+        print("\tFailed to fetch measurements:", device.exception)
+        return
+    print("\tModel:", device.label)
+    print("+" * 11, "Measurements", "+" * 11)
+    for sensor in device.measurements.values():
+        print("\t", sensor.label, ":", sensor)
+
+
+if __name__ == "__main__":
+    # Every device is only polled when its sensors are expected to have been updated
+    scheduler = PollingScheduler(discover_devices())
+    try:
+        scheduler.run_forever(on_measurement=print_device)
+    except KeyboardInterrupt:
+        pass
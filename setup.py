@@ -19,6 +19,8 @@ setuptools.setup(
     url="https://github.com/kotlarz/airthings",
     packages=setuptools.find_packages(),
     install_requires=["bluepy==1.3.0"],
+    extras_require={"numpy": ["numpy"]},
+    entry_points={"console_scripts": ["airthings-collector=airthings.collector:main"]},
     classifiers=[
         "Development Status :: 4 - Beta",
         "Intended Audience :: Developers",